@@ -7,41 +7,53 @@ import os
 # Agregar el directorio raíz del proyecto a sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from transformers import pipeline
+from src.container import obtener_contenedor
+from src.controllers.cli_controller import CLIController
+from src.controllers.cli_daemon import ClienteCLI
 
-class ChatbotService:
-    def __init__(self):
-        self.chatbot = pipeline("conversational", model="microsoft/DialoGPT-medium")
 
-    def responder(self, usuario, mensaje):
-        # Simular una conversación sin usar la clase Conversation
-        respuesta = self.chatbot(mensaje)
-        return respuesta[0]["generated_text"]
-    
-from src.controllers.cli_controller import CLIController
-try:
-    from src.ui.gradio_app import GradioApp
-except ModuleNotFoundError:
-    print("Error: No se pudo encontrar el módulo 'src.ui.gradio_app'. Verifique la estructura del proyecto.")
-    sys.exit(1)
-except ImportError as e:
-    print(f"Error de importación: {e}")
-    sys.exit(1)
+def cargar_gradio_app():
+    """
+    Importa la interfaz web solo cuando se pide con --ui: gradio (y el
+    chatbot) tardan segundos en importarse y los comandos de CLI no los usan.
+    """
+    try:
+        from src.ui.gradio_app import GradioApp
+    except ModuleNotFoundError:
+        print("Error: No se pudo encontrar el módulo 'src.ui.gradio_app'. Verifique la estructura del proyecto.")
+        sys.exit(1)
+    except ImportError as e:
+        print(f"Error de importación: {e}")
+        sys.exit(1)
+    return GradioApp
 
 
 def main():
     parser = argparse.ArgumentParser(description="Aplicación de votaciones interactivas para streamers.")
     parser.add_argument("--ui", action="store_true", help="Iniciar interfaz web con Gradio")
-    args = parser.parse_args()
-
-    if args.ui:
-        print("Iniciando interfaz web en paralelo...")
-        gradio_app = GradioApp()
-        gradio_app.lanzar()
-    else:
-        print("Iniciando modo línea de comandos...")
-        cli = CLIController()
-        cli.iniciar()
+    args, resto = parser.parse_known_args()
+
+    # Una sola instancia de cada repositorio y servicio para todo el proceso
+    contenedor = obtener_contenedor()
+    cliente = ClienteCLI.desde_config(contenedor.config)
+    if not args.ui and resto[:1] != ['serve']:
+        # Con un demonio `serve` en marcha, el comando se ejecuta allí
+        try:
+            print(cliente.ejecutar(resto), end='')
+            return
+        except ConnectionError:
+            pass
+    try:
+        if args.ui:
+            print("Iniciando interfaz web en paralelo...")
+            gradio_app = cargar_gradio_app()(contenedor=contenedor)
+            gradio_app.lanzar()
+        else:
+            print("Iniciando modo línea de comandos...")
+            cli = CLIController(contenedor=contenedor)
+            cli.ejecutar_con_cliente(resto, cliente)
+    finally:
+        contenedor.cerrar()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+# src/container.py
+import threading
+from typing import Any, Callable, Dict, Optional
+from src.config import Config
+from src.patterns.factory import RepositoryFactory
+
+_contenedor: Optional["ServiceContainer"] = None
+_contenedor_lock = threading.Lock()
+
+
+class ServiceContainer:
+    """
+    Raíz de composición: crea una sola instancia de cada repositorio y
+    servicio por contenedor y la comparte entre CLI, UI y chatbot.
+
+    Todo se construye de forma perezosa la primera vez que se pide (y los
+    módulos de cada servicio se importan en ese momento), así que un comando
+    de CLI solo paga lo que usa. `cache(nombre)` ofrece cachés con nombre
+    compartidas por todo el proceso.
+    """
+
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or Config()
+        self.repositorios = RepositoryFactory(self.config)
+        self._instancias: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def _obtener(self, nombre: str, crear: Callable[[], Any]) -> Any:
+        """Devuelve la instancia `nombre`, creándola la primera vez."""
+        with self._lock:
+            if nombre not in self._instancias:
+                self._instancias[nombre] = crear()
+            return self._instancias[nombre]
+
+    # --- Repositorios --------------------------------------------------
+
+    @property
+    def usuario_repo(self):
+        return self._obtener('usuario_repo', self.repositorios.usuarios)
+
+    @property
+    def encuesta_repo(self):
+        return self._obtener('encuesta_repo', self.repositorios.encuestas)
+
+    @property
+    def nft_repo(self):
+        return self._obtener('nft_repo', self.repositorios.nfts)
+
+    # --- Servicios -----------------------------------------------------
+
+    @property
+    def user_service(self):
+        def crear():
+            from src.services.user_service import UserService
+            return UserService(self.config, repo=self.usuario_repo)
+        return self._obtener('user_service', crear)
+
+    @property
+    def nft_service(self):
+        def crear():
+            from src.services.nft_service import NFTService
+            return NFTService(self.config, nft_repo=self.nft_repo, usuario_repo=self.usuario_repo)
+        return self._obtener('nft_service', crear)
+
+    @property
+    def poll_service(self):
+        def crear():
+            from src.services.poll_service import PollService
+            return PollService(repo=self.encuesta_repo, config=self.config, nft_service=self.nft_service)
+        return self._obtener('poll_service', crear)
+
+    @property
+    def chatbot_service(self):
+        def crear():
+            from src.services.chatbot_service import ChatbotService
+            return ChatbotService(poll_service=self.poll_service, config=self.config)
+        return self._obtener('chatbot_service', crear)
+
+    @property
+    def live_results(self):
+        def crear():
+            from src.services.live_results import LiveResultsService
+            return LiveResultsService(self.poll_service)
+        return self._obtener('live_results', crear)
+
+    @property
+    def planificador(self):
+        """
+        Planificador de cierres, ya iniciado; relee las encuestas activas
+        cada 'expiry_rescan_seconds' segundos.
+        """
+        def crear():
+            from src.services.expiry_scheduler import PlanificadorExpiracion
+            planificador = PlanificadorExpiracion(
+                self.poll_service, intervalo_repaso=self.config.obtener('expiry_rescan_seconds', 30.0))
+            planificador.iniciar()
+            return planificador
+        return self._obtener('planificador', crear)
+
+    def cache(self, nombre: str, ttl_segundos: Optional[float] = None,
+              capacidad: Optional[int] = None):
+        """
+        Caché de respuestas con nombre, compartida por quien la pida en este
+        contenedor. Los parámetros solo se usan al crearla.
+        """
+        def crear():
+            from src.services.response_cache import CacheRespuestas
+            return CacheRespuestas(ttl_segundos=ttl_segundos, capacidad=capacidad)
+        return self._obtener(f'cache:{nombre}', crear)
+
+    def cerrar(self) -> None:
+        """
+        Detiene los hilos y pools de los servicios ya creados, entrega los
+        eventos pendientes y cierra los repositorios con recursos abiertos.
+        """
+        with self._lock:
+            instancias = dict(self._instancias)
+        if 'planificador' in instancias:
+            instancias['planificador'].detener()
+        if 'poll_service' in instancias:
+            instancias['poll_service'].cerrar_despachador()
+        if 'chatbot_service' in instancias and instancias['chatbot_service'].worker is not None:
+            instancias['chatbot_service'].worker.detener()
+        if 'user_service' in instancias:
+            instancias['user_service'].cerrar()
+        self.repositorios.cerrar()
+
+
+def obtener_contenedor(config: Optional[Config] = None) -> ServiceContainer:
+    """
+    Contenedor compartido por todo el proceso; se crea con la primera
+    llamada (y `config`, si se indica en ella).
+    """
+    global _contenedor
+    with _contenedor_lock:
+        if _contenedor is None:
+            _contenedor = ServiceContainer(config)
+        return _contenedor
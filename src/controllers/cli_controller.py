@@ -1,18 +1,68 @@
 import argparse
-from src.services.user_service import UserService
-from src.services.poll_service import PollService
-from src.services.nft_service import NFTService
+import io
+import os
+import threading
+from contextlib import redirect_stderr, redirect_stdout
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from uuid import UUID
+from src.container import ServiceContainer, obtener_contenedor
+
+if TYPE_CHECKING:
+    from src.services.user_service import UserService
+    from src.services.poll_service import PollService
+    from src.services.nft_service import NFTService
+    from src.controllers.cli_daemon import ClienteCLI
 
 
 class CLIController:
+    """
+    Interfaz de línea de comandos.
+
+    Los servicios se piden al contenedor la primera vez que un comando los
+    usa, de modo que cada invocación solo importa y construye lo necesario
+    (`register` no carga encuestas ni tokens, y nunca se importan gradio ni
+    transformers).
+
+    `sesion` guarda el token del último `login`; con `serve` el controlador
+    vive en un demonio (ver cli_daemon) y cada petición trae su sesión.
+    """
     POLL_TYPES = ['simple', 'multiple']
 
-    def __init__(self):
-        self.user_service = UserService()
-        self.poll_service = PollService()
-        self.nft_service = NFTService()
+    def __init__(self, user_service: Optional["UserService"] = None,
+                 poll_service: Optional["PollService"] = None,
+                 nft_service: Optional["NFTService"] = None,
+                 contenedor: Optional[ServiceContainer] = None):
+        self.contenedor = contenedor or obtener_contenedor()
+        self._user_service = user_service
+        self._poll_service = poll_service
+        self._nft_service = nft_service
+        self.sesion: Optional[str] = None
+        self._ejecucion_lock = threading.Lock()
         self.parser = self._setup_parser()
 
+    @property
+    def user_service(self) -> "UserService":
+        if self._user_service is None:
+            self._user_service = self.contenedor.user_service
+        return self._user_service
+
+    @property
+    def poll_service(self) -> "PollService":
+        if self._poll_service is None:
+            self._poll_service = self.contenedor.poll_service
+        return self._poll_service
+
+    @property
+    def nft_service(self) -> "NFTService":
+        if self._nft_service is None:
+            self._nft_service = self.contenedor.nft_service
+        return self._nft_service
+
+    @property
+    def usuario_actual(self) -> Optional[str]:
+        """Usuario de la sesión vigente, o None."""
+        return self.user_service.usuario_de_sesion(self.sesion) if self.sesion else None
+
     def _setup_parser(self):
         parser = argparse.ArgumentParser(
             prog="streamer-votes",
@@ -31,6 +81,12 @@ class CLIController:
         # Votos y tokens
         self._add_vote_parsers(subparsers)
 
+        # Almacenamiento
+        self._add_storage_parsers(subparsers)
+
+        # Demonio
+        self._add_serve_parser(subparsers)
+
         return parser
 
     def _add_register_parser(self, subparsers):
@@ -57,16 +113,16 @@ class CLIController:
         parser_list.set_defaults(func=self.list_polls)
 
         parser_close = subparsers.add_parser("close_poll", help="Cerrar una encuesta manualmente")
-        parser_close.add_argument("poll_id", help="ID de la encuesta a cerrar")
+        parser_close.add_argument("poll_id", type=UUID, help="ID de la encuesta a cerrar")
         parser_close.set_defaults(func=self.close_poll)
 
         parser_results = subparsers.add_parser("view_results", help="Ver resultados de una encuesta")
-        parser_results.add_argument("poll_id", help="ID de la encuesta")
+        parser_results.add_argument("poll_id", type=UUID, help="ID de la encuesta")
         parser_results.set_defaults(func=self.view_results)
 
     def _add_vote_parsers(self, subparsers):
         parser_vote = subparsers.add_parser("vote", help="Votar en una encuesta")
-        parser_vote.add_argument("poll_id", help="ID de la encuesta")
+        parser_vote.add_argument("poll_id", type=UUID, help="ID de la encuesta")
         parser_vote.add_argument("options", nargs='+', help="Opción(es) a votar")
         parser_vote.set_defaults(func=self.vote)
 
@@ -74,10 +130,21 @@ class CLIController:
         parser_tokens.set_defaults(func=self.list_tokens)
 
         parser_transfer = subparsers.add_parser("transfer_token", help="Transferir un token a otro usuario")
-        parser_transfer.add_argument("token_id", help="ID del token a transferir")
+        parser_transfer.add_argument("token_id", type=UUID, help="ID del token a transferir")
         parser_transfer.add_argument("new_owner", help="Username del nuevo propietario")
         parser_transfer.set_defaults(func=self.transfer_token)
 
+    def _add_storage_parsers(self, subparsers):
+        parser_migrate = subparsers.add_parser("migrate_sqlite", help="Migrar los archivos JSON a una base SQLite")
+        parser_migrate.add_argument("--data-dir", default="data", help="Directorio con los archivos JSON (por defecto: data)")
+        parser_migrate.add_argument("--db", help="Ruta de la base SQLite (por defecto: <data-dir>/streamer_votes.db)")
+        parser_migrate.set_defaults(func=self.migrate_sqlite)
+
+    def _add_serve_parser(self, subparsers):
+        parser = subparsers.add_parser("serve", help="Mantener los servicios en memoria y atender comandos por un socket Unix")
+        parser.add_argument("--socket", help="Ruta del socket (por defecto: 'cli_socket' o <data_dir>/streamer-votes.sock)")
+        parser.set_defaults(func=self.serve)
+
     def run(self, args=None):
         args = self.parser.parse_args(args)
         try:
@@ -89,6 +156,41 @@ class CLIController:
         except Exception as e:
             print(f"Error inesperado: {e}")
 
+    def ejecutar(self, argv: List[str], sesion: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        Ejecuta un subcomando capturando su salida, con la sesión indicada.
+
+        Las ejecuciones se serializan: la captura de stdout es global al
+        proceso.
+
+        :return: (salida, sesión tras el comando).
+        """
+        with self._ejecucion_lock:
+            self.sesion = sesion
+            salida = io.StringIO()
+            with redirect_stdout(salida), redirect_stderr(salida):
+                try:
+                    self.run(argv)
+                except SystemExit:
+                    # argparse ya escribió el uso o el error en la salida
+                    pass
+            return salida.getvalue(), self.sesion
+
+    def ejecutar_con_cliente(self, argv: List[str], cliente: "ClienteCLI") -> None:
+        """
+        Ejecuta un subcomando en este proceso conservando la sesión en el
+        archivo del cliente. Los tokens opacos solo valen en memoria, así que
+        se firman con el secreto local del cliente; `serve` usa el mismo
+        secreto y acepta las sesiones abiertas sin demonio.
+        """
+        if self.user_service.session_format == 'opaque':
+            secreto = cliente.secreto_sesiones()
+            if secreto:
+                self.user_service.usar_firma(secreto)
+        self.sesion = cliente.leer_sesion()
+        self.run(argv)
+        cliente.guardar_sesion(self.sesion)
+
     # Command handlers
     def register(self, args):
         success = self.user_service.register(args.username, args.password)
@@ -96,6 +198,7 @@ class CLIController:
 
     def login(self, args):
         token = self.user_service.login(args.username, args.password)
+        self.sesion = token
         print(f"Login exitoso. Token de sesión: {token}" if token else "Error: credenciales inválidas.")
 
     def create_poll(self, args):
@@ -108,10 +211,10 @@ class CLIController:
 
         try:
             poll = self.poll_service.create_poll(
-                question=args.question,
-                options=args.options,
-                duration_seconds=args.duration,
-                poll_type=args.type
+                pregunta=args.question,
+                opciones=args.options,
+                duracion_segundos=args.duration,
+                tipo=args.type
             )
             print(f"Encuesta creada con ID: {poll.id}")
         except Exception as e:
@@ -126,18 +229,19 @@ class CLIController:
         print("Encuesta cerrada." if closed else "Error: no se pudo cerrar encuesta.")
 
     def view_results(self, args):
-        results = self.poll_service.get_results(args.poll_id)
+        results = self.poll_service.get_partial_results(args.poll_id)
         self._print_results(results)
 
     def vote(self, args):
-        if not self.user_service.current_user:
+        username = self.usuario_actual
+        if not username:
             print("Error: Debes iniciar sesión primero.")
             return
 
         try:
             vote = self.poll_service.vote(
                 poll_id=args.poll_id,
-                username=self.user_service.current_user,
+                username=username,
                 options=args.options
             )
             print("Voto registrado. Token NFT generado con ID:", vote.token_id)
@@ -145,33 +249,51 @@ class CLIController:
             print(f"Error al registrar el voto: {e}")
 
     def list_tokens(self, args):
-        if not self.user_service.current_user:
+        username = self.usuario_actual
+        if not username:
             print("Error: Debes iniciar sesión primero.")
             return
 
-        tokens = self.nft_service.list_tokens(self.user_service.current_user)
+        tokens = self.nft_service.list_tokens(username)
         self._print_tokens(tokens)
 
     def transfer_token(self, args):
-        if not self.user_service.current_user:
+        username = self.usuario_actual
+        if not username:
             print("Error: Debes iniciar sesión primero.")
             return
 
         try:
             self.nft_service.transfer_token(
                 token_id=args.token_id,
-                current_owner=self.user_service.current_user,
+                current_owner=username,
                 new_owner=args.new_owner
             )
             print("Transferencia completada.")
         except Exception as e:
             print(f"Error al transferir el token: {e}")
 
+    def migrate_sqlite(self, args):
+        from src.repositories.sqlite_repo import SQLiteDatabase, migrar_json_a_sqlite
+        db = SQLiteDatabase(args.db or os.path.join(args.data_dir, "streamer_votes.db"))
+        conteo = migrar_json_a_sqlite(db, args.data_dir)
+        print(f"Migración completada: {conteo['usuarios']} usuario(s), {conteo['encuestas']} encuesta(s), "
+              f"{conteo['votos']} voto(s), {conteo['tokens']} token(s).")
+
+    def serve(self, args):
+        from src.controllers.cli_daemon import ServidorCLI, rutas_por_defecto
+        ruta = args.socket or rutas_por_defecto(self.contenedor.config)[0]
+        # Servicios en caliente y cierre de encuestas vencidas mientras dure
+        _ = (self.user_service, self.poll_service, self.nft_service)
+        self.contenedor.planificador
+        print(f"Atendiendo comandos en {ruta} (Ctrl+C para terminar).")
+        ServidorCLI(self, ruta).servir()
+
     # Helper methods
     def _print_polls(self, polls):
         for p in polls:
-            status = 'ACTIVA' if p.is_active else 'CERRADA'
-            print(f"{p.id}\t{p.question}\t{status}")
+            status = 'ACTIVA' if p.activa else 'CERRADA'
+            print(f"{p.id}\t{p.pregunta}\t{status}")
 
     def _print_results(self, results):
         for opt, count in results.items():
@@ -179,7 +301,7 @@ class CLIController:
 
     def _print_tokens(self, tokens):
         for t in tokens:
-            print(f"{t.token_id}\tEncuesta: {t.poll_id}\tOpción: {t.option}\tEmitido: {t.issued_at}")
+            print(f"{t.token_id}\tEncuesta: {t.encuesta_id}\tOpción: {t.opcion}\tEmitido: {t.emitido_en}")
 
 
 if __name__ == "__main__":
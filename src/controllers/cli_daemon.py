@@ -0,0 +1,213 @@
+# src/controllers/cli_daemon.py
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from src.config import Config
+
+if TYPE_CHECKING:
+    from src.controllers.cli_controller import CLIController
+
+
+def rutas_por_defecto(config: Config) -> Tuple[str, str]:
+    """
+    (socket del demonio, archivo de sesión del cliente) según la config:
+    'cli_socket' y 'cli_session_path', por defecto dentro de 'data_dir'.
+    """
+    data_dir = config.obtener('data_dir', 'data')
+    return (config.obtener('cli_socket', os.path.join(data_dir, 'streamer-votes.sock')),
+            config.obtener('cli_session_path', os.path.join(data_dir, '.cli_session')))
+
+
+class _ManejadorCLI(socketserver.StreamRequestHandler):
+    """
+    Atiende una conexión: una petición JSON por línea
+    (`{"argv": [...], "sesion": ...}`) y una respuesta JSON por línea
+    (`{"salida": ..., "sesion": ...}`). La conexión puede reutilizarse.
+    """
+
+    def handle(self) -> None:
+        for linea in self.rfile:
+            try:
+                peticion = json.loads(linea)
+                argv = [str(a) for a in peticion['argv']]
+            except (ValueError, KeyError, TypeError):
+                respuesta = {'salida': "Error: petición inválida.\n", 'sesion': None}
+            else:
+                salida, sesion = self.server.controlador.ejecutar(argv, peticion.get('sesion'))
+                respuesta = {'salida': salida, 'sesion': sesion}
+            self.wfile.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ServidorCLI:
+    """
+    Demonio de `streamer-votes serve`: mantiene un CLIController con sus
+    servicios, cachés y sesiones en memoria y ejecuta los subcomandos que
+    le llegan por un socket Unix, evitando arrancar un proceso por comando.
+
+    El socket se crea con permisos 0600 (solo el usuario que lanza el
+    demonio puede conectarse).
+    """
+
+    def __init__(self, controlador: "CLIController", ruta_socket: str):
+        self.controlador = controlador
+        self.ruta_socket = ruta_socket
+        self._servidor: Optional[_ServidorUnix] = None
+        self._hilo: Optional[threading.Thread] = None
+
+    def _crear_servidor(self) -> _ServidorUnix:
+        os.makedirs(os.path.dirname(self.ruta_socket) or '.', exist_ok=True)
+        if os.path.exists(self.ruta_socket):
+            if ClienteCLI(self.ruta_socket).disponible():
+                raise RuntimeError(f"Ya hay un demonio escuchando en {self.ruta_socket}")
+            # Socket huérfano de un demonio que no se cerró limpiamente
+            os.remove(self.ruta_socket)
+        servidor = _ServidorUnix(self.ruta_socket, _ManejadorCLI)
+        os.chmod(self.ruta_socket, 0o600)
+        servidor.controlador = self.controlador
+        return servidor
+
+    def servir(self) -> None:
+        """Atiende peticiones hasta recibir Ctrl+C, SIGTERM o `detener`."""
+        self._servidor = self._crear_servidor()
+        if threading.current_thread() is threading.main_thread():
+            # shutdown() espera a serve_forever, así que se llama desde otro hilo
+            servidor = self._servidor
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=servidor.shutdown).start())
+        try:
+            self._servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._cerrar()
+
+    def iniciar(self) -> None:
+        """Atiende peticiones en un hilo en segundo plano."""
+        self._servidor = self._crear_servidor()
+        self._hilo = threading.Thread(target=self._servidor.serve_forever,
+                                      name="cli-daemon", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Deja de aceptar peticiones y elimina el socket."""
+        if self._servidor is None:
+            return
+        self._servidor.shutdown()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self._cerrar()
+
+    def _cerrar(self) -> None:
+        if self._servidor is not None:
+            self._servidor.server_close()
+            self._servidor = None
+        try:
+            os.remove(self.ruta_socket)
+        except FileNotFoundError:
+            pass
+
+
+class ClienteCLI:
+    """
+    Cliente ligero del demonio. Guarda el token de sesión en `ruta_sesion`
+    para que `login` persista entre invocaciones.
+
+    Sin demonio, los tokens se firman con el secreto de `secreto_sesiones`
+    (junto al archivo de sesión), ya que un token opaco moriría con el
+    proceso que lo emitió.
+    """
+
+    def __init__(self, ruta_socket: str, ruta_sesion: Optional[str] = None, timeout: float = 30.0):
+        self.ruta_socket = ruta_socket
+        self.ruta_sesion = ruta_sesion
+        self.timeout = timeout
+
+    @classmethod
+    def desde_config(cls, config: Config) -> "ClienteCLI":
+        return cls(*rutas_por_defecto(config))
+
+    def disponible(self) -> bool:
+        """Indica si hay un demonio aceptando conexiones."""
+        try:
+            with self._conectar():
+                return True
+        except ConnectionError:
+            return False
+
+    def ejecutar(self, argv: List[str]) -> str:
+        """
+        Ejecuta un subcomando en el demonio y devuelve su salida.
+
+        :raises ConnectionError: si no hay demonio escuchando.
+        """
+        peticion = {'argv': list(argv), 'sesion': self.leer_sesion()}
+        with self._conectar() as conexion:
+            conexion.sendall(json.dumps(peticion, ensure_ascii=False).encode('utf-8') + b'\n')
+            with conexion.makefile('rb') as f:
+                linea = f.readline()
+        if not linea:
+            raise ConnectionError("El demonio cerró la conexión sin responder.")
+        respuesta = json.loads(linea)
+        self.guardar_sesion(respuesta.get('sesion'))
+        return respuesta['salida']
+
+    def leer_sesion(self) -> Optional[str]:
+        """Token de sesión guardado, o None."""
+        if not self.ruta_sesion:
+            return None
+        try:
+            with open(self.ruta_sesion, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def guardar_sesion(self, sesion: Optional[str]) -> None:
+        """Persiste el token de sesión (legible solo por el usuario)."""
+        if not self.ruta_sesion or sesion == self.leer_sesion():
+            return
+        if sesion is None:
+            os.remove(self.ruta_sesion)
+            return
+        os.makedirs(os.path.dirname(self.ruta_sesion) or '.', exist_ok=True)
+        descriptor = os.open(self.ruta_sesion, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(sesion)
+
+    def secreto_sesiones(self) -> Optional[bytes]:
+        """
+        Secreto local para firmar sesiones, creado (0600) la primera vez en
+        `<ruta_sesion>.secret`. None si no hay archivo de sesión.
+        """
+        if not self.ruta_sesion:
+            return None
+        ruta = self.ruta_sesion + '.secret'
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        try:
+            descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                return f.read().strip().encode('utf-8')
+        secreto = secrets.token_hex(32)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(secreto)
+        return secreto.encode('utf-8')
+
+    def _conectar(self) -> socket.socket:
+        conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexion.settimeout(self.timeout)
+        try:
+            conexion.connect(self.ruta_socket)
+        except OSError as e:
+            conexion.close()
+            raise ConnectionError(f"No hay demonio en {self.ruta_socket}: {e}") from e
+        return conexion
@@ -1,45 +1,94 @@
+import asyncio
 import gradio as gr
-from src.services.user_service import UserService
-from src.services.poll_service import PollService
-from src.services.nft_service import NFTService
-from src.services.chatbot_service import ChatbotService
+from typing import Optional
+from uuid import UUID
+from src.container import ServiceContainer, obtener_contenedor
 
 
 class UIController:
-    def __init__(self):
-        self.user_service = UserService()
-        self.poll_service = PollService()
-        self.nft_service = NFTService()
-        self.chatbot_service = ChatbotService()
-
-    def vote_fn(self, poll_full_id, options, username, password):
-        if not poll_full_id or not options:
-            return "Error: Debes seleccionar una encuesta y al menos una opción.", None
+    """
+    Controlador de la interfaz Gradio.
+
+    La UI registra las variantes `*_async` de los manejadores, que esperan a
+    los servicios sin ocupar un hilo del pool de Gradio; las síncronas las
+    ejecutan con `asyncio.run` para usos fuera del event loop.
+    """
+    TOKENS_POR_PAGINA = 50
+    # Segundos sin votos tras los que se repite el estado de la transmisión
+    LIVE_HEARTBEAT = 30
+
+    def __init__(self, contenedor: Optional[ServiceContainer] = None):
+        contenedor = contenedor or obtener_contenedor()
+        self.user_service = contenedor.user_service
+        self.poll_service = contenedor.poll_service
+        self.nft_service = contenedor.nft_service
+        self.chatbot_service = contenedor.chatbot_service
+        # Cierra las encuestas al vencer su plazo mientras la UI está en marcha
+        self.planificador = contenedor.planificador
+        self.live_results = contenedor.live_results
+
+    # Los manejadores síncronos ejecutan su variante async en un event loop
+    # propio; la lógica vive solo en las variantes async
+
+    def login_fn(self, username, password):
+        return asyncio.run(self.login_fn_async(username, password))
+
+    async def login_fn_async(self, username, password):
         if not username or not password:
             return "Error: Usuario y contraseña son obligatorios.", None
+        try:
+            token = await self.user_service.login_async(username, password)
+            return f"Sesión iniciada como {username}.", token
+        except Exception as e:
+            return f"Error al iniciar sesión: {e}", None
+
+    def vote_fn(self, poll_full_id, options, session_token):
+        return asyncio.run(self.vote_fn_async(poll_full_id, options, session_token))
 
-        token = self.user_service.login(username, password)
-        if not token:
-            return "Error: Credenciales inválidas.", None
+    async def vote_fn_async(self, poll_full_id, options, session_token):
+        if not poll_full_id or not options:
+            return "Error: Debes seleccionar una encuesta y al menos una opción.", None
+        username = self.user_service.usuario_de_sesion(session_token)
+        if not username:
+            return "Error: Debes iniciar sesión primero.", None
         try:
-            poll_id = poll_full_id.split(' - ')[0]
-            vote = self.poll_service.vote(
-                poll_id=poll_id,
-                username=username,
-                options=options
-            )
-            token_obj = self.nft_service.get_token(vote.token_id)
-            return "Voto registrado.", token_obj.metadata()
+            poll_id = UUID(poll_full_id.split(' - ')[0])
+            vote = await self.poll_service.vote_async(poll_id=poll_id, username=username, options=options)
+            token_obj = await self.nft_service.get_token_async(vote.token_id)
+            return "Voto registrado.", token_obj.metadatos()
         except Exception as e:
             return f"Error al votar: {e}", None
 
     def get_active_polls(self):
+        return asyncio.run(self.get_active_polls_async())
+
+    async def get_active_polls_async(self):
         try:
-            polls = self.poll_service.list_polls(active_only=True)
-            return [{"id": p.id, "question": p.question, "options": p.options} for p in polls]
+            polls = await self.poll_service.list_polls_async(active_only=True)
+            return [{"id": p.id, "question": p.pregunta, "options": p.opciones} for p in polls]
         except Exception:
             return []
 
+    async def live_results_fn(self, poll_full_id, latido=None):
+        """
+        Transmite los resultados de la encuesta seleccionada cada vez que
+        llega un voto (o su cierre), sin releer el repositorio. Espera en el
+        event loop, así que una pestaña abierta no retiene ningún hilo, y
+        sigue abierta hasta el cierre de la encuesta o la desconexión del
+        cliente, repitiendo el estado cada `latido` segundos sin cambios.
+        """
+        if not poll_full_id:
+            yield ""
+            return
+        try:
+            poll_id = UUID(poll_full_id.split(' - ')[0])
+            latido = self.LIVE_HEARTBEAT if latido is None else latido
+            async for conteo, cerrada in self.live_results.transmitir_async(poll_id, latido=latido):
+                texto = self.poll_service.presentacion_strategy.presentar(conteo)
+                yield texto + ("\n(Encuesta cerrada)" if cerrada else "")
+        except Exception as e:
+            yield f"Error al obtener resultados: {e}"
+
     def chatbot_fn(self, username, message):
         if not username or not message:
             return "Error: Usuario y mensaje son obligatorios."
@@ -48,26 +97,39 @@ class UIController:
         except Exception as e:
             return f"Error en chatbot: {e}"
 
-    def list_tokens_fn(self, username, password):
-        if not username or not password:
-            return []
-        token = self.user_service.login(username, password)
-        if not token:
+    def list_tokens_fn(self, session_token, pagina=1):
+        return asyncio.run(self.list_tokens_fn_async(session_token, pagina))
+
+    async def list_tokens_fn_async(self, session_token, pagina=1):
+        username = self.user_service.usuario_de_sesion(session_token)
+        if not username:
             return []
         try:
-            tokens = self.nft_service.list_tokens(username)
-            return [{"token_id": t.token_id, "poll_id": t.poll_id, "option": t.option, "issued_at": str(t.issued_at)} for t in tokens]
+            pagina = max(int(pagina or 1), 1)
+            tokens = await self.nft_service.list_tokens_async(username,
+                                                              offset=(pagina - 1) * self.TOKENS_POR_PAGINA,
+                                                              limit=self.TOKENS_POR_PAGINA)
+            return self._filas_tokens(tokens)
         except Exception:
             return []
 
-    def transfer_fn(self, token_id, current_owner, password, new_owner):
-        if not token_id or not current_owner or not password or not new_owner:
+    @staticmethod
+    def _filas_tokens(tokens):
+        return [{"token_id": str(t.token_id), "poll_id": str(t.encuesta_id), "option": t.opcion,
+                 "issued_at": str(t.emitido_en)} for t in tokens]
+
+    def transfer_fn(self, token_id, session_token, new_owner):
+        return asyncio.run(self.transfer_fn_async(token_id, session_token, new_owner))
+
+    async def transfer_fn_async(self, token_id, session_token, new_owner):
+        if not token_id or not new_owner:
             return "Error: Todos los campos son obligatorios."
-        token = self.user_service.login(current_owner, password)
-        if not token:
-            return "Error: Credenciales inválidas."
+        current_owner = self.user_service.usuario_de_sesion(session_token)
+        if not current_owner:
+            return "Error: Debes iniciar sesión primero."
         try:
-            self.nft_service.transfer_token(token_id=token_id, current_owner=current_owner, new_owner=new_owner)
+            await self.nft_service.transfer_token_async(token_id=UUID(token_id), current_owner=current_owner,
+                                                        new_owner=new_owner)
             return "Transferencia completada."
         except Exception as e:
             return f"Error en transferencia: {e}"
@@ -80,33 +142,44 @@ class UIController:
                 polls = gr.Dropdown(choices=[], label="Encuesta activa", interactive=True)
                 options = gr.CheckboxGroup(choices=[], label="Opciones")
 
+            session_token = gr.State(None)
             with gr.Row():
                 username = gr.Textbox(label="Usuario")
                 password = gr.Textbox(label="Contraseña", type="password")
+                login_btn = gr.Button("Iniciar sesión")
+                login_output = gr.Textbox(label="Sesión")
+            login_btn.click(
+                fn=self.login_fn_async,
+                inputs=[username, password],
+                outputs=[login_output, session_token]
+            )
+
+            live_box = gr.Textbox(label="Resultados en vivo", lines=4, interactive=False)
 
             with gr.Row():
                 vote_btn = gr.Button("Votar")
                 vote_output = gr.Textbox(label="Estado de voto")
                 token_info = gr.JSON(label="Token NFT generado")
 
-            def update_poll_choices():
-                data = self.get_active_polls()
+            async def update_poll_choices():
+                data = await self.get_active_polls_async()
                 return gr.update(choices=[f"{p['id']} - {p['question']}" for p in data])
 
-            def update_poll_options(poll_selection):
+            async def update_poll_options(poll_selection):
                 if not poll_selection:
                     return gr.update(choices=[])
                 poll_id = poll_selection.split(' - ')[0]
-                data = self.get_active_polls()
+                data = await self.get_active_polls_async()
                 selected_poll = next((p for p in data if str(p['id']) == poll_id), None)
                 return gr.update(choices=selected_poll['options']) if selected_poll else gr.update(choices=[])
 
             polls.change(fn=update_poll_choices, inputs=[], outputs=[polls])
             polls.change(fn=update_poll_options, inputs=[polls], outputs=[options])
+            polls.change(fn=self.live_results_fn, inputs=[polls], outputs=[live_box])
 
             vote_btn.click(
-                fn=self.vote_fn,
-                inputs=[polls, options, username, password],
+                fn=self.vote_fn_async,
+                inputs=[polls, options, session_token],
                 outputs=[vote_output, token_info]
             )
 
@@ -124,10 +197,11 @@ class UIController:
             tokens_table = gr.Dataframe(headers=["token_id", "poll_id", "option", "issued_at"],
                                         datatype=["str", "str", "str", "str"],
                                         interactive=False)
+            tokens_page = gr.Number(label="Página", value=1, precision=0)
             load_btn = gr.Button("Cargar mis tokens")
             load_btn.click(
-                fn=self.list_tokens_fn,
-                inputs=[username, password],
+                fn=self.list_tokens_fn_async,
+                inputs=[session_token, tokens_page],
                 outputs=[tokens_table]
             )
 
@@ -135,12 +209,11 @@ class UIController:
             with gr.Row():
                 transfer_token_id = gr.Textbox(label="ID del Token")
                 new_owner = gr.Textbox(label="Nuevo dueño")
-            transfer_pass = gr.Textbox(label="Contraseña", type="password")
             transfer_btn = gr.Button("Transferir token")
             transfer_output = gr.Textbox(label="Resultado")
             transfer_btn.click(
-                fn=self.transfer_fn,
-                inputs=[transfer_token_id, username, transfer_pass, new_owner],
+                fn=self.transfer_fn_async,
+                inputs=[transfer_token_id, session_token, new_owner],
                 outputs=[transfer_output]
             )
 
@@ -1,12 +1,15 @@
 # src/models/encuesta.py
 from __future__ import annotations
-from typing import List, Dict, Union
+from typing import Iterable, List, Dict, Union
 from uuid import uuid4, UUID
 from datetime import datetime, timedelta
 from src.models.voto import Voto
 
 
 class Encuesta:
+    __slots__ = ('id', 'pregunta', 'opciones', 'duracion_segundos', 'tipo', 'creado_en',
+                 'expira_en', 'activa', 'votos', 'conteo', 'version')
+
     def __init__(self, pregunta: str, opciones: List[str], duracion_segundos: int, tipo: str = 'simple'):
         """
         Inicializa una nueva encuesta.
@@ -25,6 +28,42 @@ class Encuesta:
         self.expira_en: datetime = self.creado_en + timedelta(seconds=duracion_segundos)
         self.activa: bool = True
         self.votos: Dict[str, Union[Voto, List[Voto]]] = {}
+        # Conteo incremental por opción, mantenido por agregar_voto
+        self.conteo: Dict[str, int] = {opt: 0 for opt in opciones}
+        # Versión persistida; el repositorio la usa para detectar escrituras concurrentes
+        self.version: int = 0
+
+    @classmethod
+    def rehidratar(cls, id: UUID, pregunta: str, opciones: List[str], duracion_segundos: int,
+                   tipo: str, creado_en: datetime, expira_en: datetime, activa: bool,
+                   votos: Iterable[Voto] = (), version: int = 0) -> Encuesta:
+        """
+        Reconstruye una encuesta persistida con sus votos.
+
+        No genera id ni fechas y no revalida los votos (ya se aceptaron al
+        emitirse), aunque la encuesta esté cerrada; solo rehace el conteo.
+        """
+        encuesta = cls.__new__(cls)
+        encuesta.id = id
+        encuesta.pregunta = pregunta
+        encuesta.opciones = opciones
+        encuesta.duracion_segundos = duracion_segundos
+        encuesta.tipo = tipo
+        encuesta.creado_en = creado_en
+        encuesta.expira_en = expira_en
+        encuesta.activa = activa
+        encuesta.version = version
+        encuesta.votos = {}
+        conteo = encuesta.conteo = {opt: 0 for opt in opciones}
+        if tipo == 'simple':
+            for voto in votos:
+                encuesta.votos[voto.usuario] = voto
+                conteo[voto.opcion] = conteo.get(voto.opcion, 0) + 1
+        else:
+            for voto in votos:
+                encuesta.votos.setdefault(voto.usuario, []).append(voto)
+                conteo[voto.opcion] = conteo.get(voto.opcion, 0) + 1
+        return encuesta
 
     def agregar_voto(self, voto: Voto) -> Union[None, str]:
         """
@@ -48,6 +87,7 @@ class Encuesta:
             if votos_usuario is None:
                 self.votos[voto.usuario] = []
             self.votos[voto.usuario].append(voto)
+        self.conteo[voto.opcion] += 1
 
     def comprobar_expiracion(self) -> bool:
         """
@@ -61,17 +101,8 @@ class Encuesta:
 
     def obtener_resultados(self) -> Dict[str, int]:
         """
-        Calcula el conteo de votos por opción.
+        Devuelve el conteo de votos por opción en O(opciones).
 
         :return: Diccionario opción -> número de votos.
         """
-        conteo: Dict[str, int] = {opt: 0 for opt in self.opciones}
-        lista_votos = []
-        for v in self.votos.values():
-            if isinstance(v, list):
-                lista_votos.extend(v)
-            else:
-                lista_votos.append(v)
-        for voto in lista_votos:
-            conteo[voto.opcion] += 1
-        return conteo
+        return dict(self.conteo)
@@ -3,6 +3,8 @@ from uuid import uuid4, UUID
 from datetime import datetime
 
 class TokenNFT:
+    __slots__ = ('encuesta_id', 'opcion', 'propietario', 'emitido_en', 'token_id')
+
     def __init__(self, encuesta_id: UUID, opcion: str, propietario: str):
         self.encuesta_id = encuesta_id
         self.opcion = opcion
@@ -10,6 +12,20 @@ class TokenNFT:
         self.emitido_en = datetime.utcnow()
         self.token_id = uuid4()
 
+    @classmethod
+    def rehidratar(cls, token_id: UUID, encuesta_id: UUID, opcion: str,
+                   propietario: str, emitido_en: datetime) -> 'TokenNFT':
+        """
+        Reconstruye un token ya persistido sin generar un id ni una fecha nuevos.
+        """
+        token = cls.__new__(cls)
+        token.token_id = token_id
+        token.encuesta_id = encuesta_id
+        token.opcion = opcion
+        token.propietario = propietario
+        token.emitido_en = emitido_en
+        return token
+
     def metadatos(self) -> dict:
         """
         Devuelve un diccionario con los metadatos del token.
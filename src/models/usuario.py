@@ -1,14 +1,49 @@
 # src/models/usuario.py
+from collections.abc import MutableSet
 from uuid import uuid4, UUID
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class ConjuntoTokens(MutableSet):
+    """
+    Conjunto de IDs de token que conserva el orden de inserción.
+
+    Se apoya en un dict, así que pertenencia, alta y baja son O(1).
+    """
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids: Optional[Iterable[UUID]] = None):
+        self._ids: Dict[UUID, None] = dict.fromkeys(ids or ())
+
+    def __contains__(self, token_id: object) -> bool:
+        return token_id in self._ids
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, token_id: UUID) -> None:
+        self._ids[token_id] = None
+
+    def discard(self, token_id: UUID) -> None:
+        self._ids.pop(token_id, None)
+
+    def __repr__(self) -> str:
+        return f"ConjuntoTokens({list(self._ids)!r})"
+
 
 class Usuario:
-    def __init__(self, nombre: str, password_hash: str):
+    __slots__ = ('id', 'nombre', 'password_hash', 'salt', 'tokens')
+
+    def __init__(self, nombre: str, password_hash: str, salt: str = ''):
         """
         Inicializa un nuevo usuario.
 
         :param nombre: Nombre del usuario.
         :param password_hash: Hash de la contraseña del usuario.
+        :param salt: Sal (en hexadecimal) usada para calcular el hash.
         """
         if not nombre or not isinstance(nombre, str):
             raise ValueError("El nombre debe ser una cadena no vacía.")
@@ -18,7 +53,8 @@ class Usuario:
         self.id: UUID = uuid4()
         self.nombre: str = nombre
         self.password_hash: str = password_hash
-        self.tokens: List[UUID] = []
+        self.salt: str = salt
+        self.tokens: ConjuntoTokens = ConjuntoTokens()
 
     def agregar_token(self, token_id: UUID) -> None:
         """
@@ -30,7 +66,7 @@ class Usuario:
             raise ValueError("El token_id debe ser una instancia de UUID.")
         if token_id in self.tokens:
             raise ValueError("El token ya está asociado a este usuario.")
-        self.tokens.append(token_id)
+        self.tokens.add(token_id)
 
     def remover_token(self, token_id: UUID) -> None:
         """
@@ -43,7 +79,7 @@ class Usuario:
             raise ValueError("El token_id debe ser una instancia de UUID.")
         try:
             self.tokens.remove(token_id)
-        except ValueError:
+        except KeyError:
             raise ValueError("El token no pertenece a este usuario.")
 
     def listar_tokens(self) -> List[UUID]:
@@ -52,7 +88,7 @@ class Usuario:
 
         :return: Lista de UUIDs de los tokens.
         """
-        return self.tokens.copy()
+        return list(self.tokens)
 
     def __repr__(self) -> str:
         """
@@ -3,6 +3,8 @@ from uuid import uuid4, UUID
 from datetime import datetime
 
 class Voto:
+    __slots__ = ('encuesta_id', 'usuario', 'opcion', 'realizado_en', 'token_id', 'id')
+
     def __init__(self, encuesta_id, usuario, opcion, realizado_en=None, token_id=None, id=None):
         if not isinstance(encuesta_id, UUID):
             raise ValueError("El 'encuesta_id' debe ser un UUID válido.")
@@ -18,6 +20,23 @@ class Voto:
         self.token_id = token_id or uuid4()
         self.id = id or uuid4()
 
+    @classmethod
+    def rehidratar(cls, encuesta_id: UUID, usuario: str, opcion: str,
+                   realizado_en: datetime, token_id: UUID, id: UUID) -> 'Voto':
+        """
+        Reconstruye un voto ya persistido sin validar ni generar id/fecha.
+
+        Pensado para los repositorios: los datos ya se validaron al votar.
+        """
+        voto = cls.__new__(cls)
+        voto.encuesta_id = encuesta_id
+        voto.usuario = usuario
+        voto.opcion = opcion
+        voto.realizado_en = realizado_en
+        voto.token_id = token_id
+        voto.id = id
+        return voto
+
     def metadatos(self):
         """
         Devuelve los metadatos del voto.
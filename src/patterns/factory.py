@@ -1,7 +1,16 @@
+import os
+from typing import TYPE_CHECKING, Optional
 from uuid import uuid4
+from src.config import Config
 from src.models.encuesta import Encuesta
 from src.models.voto import Voto
 from src.models.token_nft import TokenNFT
+from src.repositories.encuesta_repo import EncuestaRepository
+from src.repositories.nft_repo import NFTRepository
+from src.repositories.usuario_repo import UsuarioRepository
+
+if TYPE_CHECKING:
+    from src.repositories.sqlite_repo import SQLiteDatabase
 
 class PollFactory:
     """
@@ -39,3 +48,96 @@ class TokenFactory:
         )
         # Podríamos envolver lógica adicional según 'limitado'
         return token
+
+class RepositoryFactory:
+    """
+    Fábrica de repositorios según el backend configurado en `Config`.
+    Backends soportados: 'json' (por defecto), 'journal' y 'sqlite'.
+
+    Claves de configuración: 'backend', 'data_dir', 'sqlite_path' y
+    'json_format' ('json' o 'jsonl'). Con 'jsonl' los archivos se leen en
+    streaming, un registro por línea, y se importan del `.json` la primera vez.
+
+    Los módulos de cada backend (y sqlite3) se importan solo al construir
+    un repositorio de ese backend.
+
+    El diario del backend 'journal' y la base SQLite se comparten dentro del
+    proceso; `cerrar()` cierra los que haya entregado esta fábrica.
+    """
+    BACKENDS = ('json', 'journal', 'sqlite')
+    FORMATOS = ('json', 'jsonl')
+    # Recursos que no deben duplicarse dentro de un proceso (ruta -> instancia)
+    _compartidos: dict = {}
+
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or Config()
+        self.backend = self.config.obtener('backend', 'json')
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Backend de almacenamiento inválido: {self.backend}")
+        self.data_dir = self.config.obtener('data_dir', 'data')
+        self.formato = self.config.obtener('json_format', 'json')
+        if self.formato not in self.FORMATOS:
+            raise ValueError(f"Formato de archivo inválido: {self.formato}")
+        # Claves de los recursos compartidos entregados por esta fábrica
+        self._usados: set = set()
+
+    def usuarios(self) -> UsuarioRepository:
+        if self.backend == 'sqlite':
+            from src.repositories.sqlite_repo import UsuarioSQLiteRepository
+            return UsuarioSQLiteRepository(self.sqlite_db())
+        if self.formato == 'jsonl':
+            from src.repositories.jsonl_repo import UsuarioJSONLRepository
+            return UsuarioJSONLRepository(*self._rutas_jsonl('usuarios'))
+        return UsuarioRepository(os.path.join(self.data_dir, 'usuarios.json'))
+
+    def encuestas(self) -> EncuestaRepository:
+        if self.backend == 'sqlite':
+            from src.repositories.sqlite_repo import EncuestaSQLiteRepository
+            return EncuestaSQLiteRepository(self.sqlite_db())
+        ruta_json = os.path.join(self.data_dir, 'encuestas.json')
+        if self.backend == 'journal':
+            from src.repositories.encuesta_journal_repo import EncuestaJournalRepository
+            return self._compartido(
+                ('journal', os.path.abspath(self.data_dir)),
+                lambda: EncuestaJournalRepository(directorio=self.data_dir, importar_desde=ruta_json)
+            )
+        if self.formato == 'jsonl':
+            from src.repositories.jsonl_repo import EncuestaJSONLRepository
+            return EncuestaJSONLRepository(*self._rutas_jsonl('encuestas'))
+        return EncuestaRepository(ruta_json)
+
+    def nfts(self) -> NFTRepository:
+        if self.backend == 'sqlite':
+            from src.repositories.sqlite_repo import NFTSQLiteRepository
+            return NFTSQLiteRepository(self.sqlite_db())
+        if self.formato == 'jsonl':
+            from src.repositories.jsonl_repo import NFTJSONLRepository
+            return NFTJSONLRepository(*self._rutas_jsonl('nfts'))
+        return NFTRepository(os.path.join(self.data_dir, 'nfts.json'))
+
+    def _rutas_jsonl(self, nombre: str) -> tuple:
+        """(ruta .jsonl, ruta .json desde la que importar la primera vez)."""
+        base = os.path.join(self.data_dir, nombre)
+        return base + '.jsonl', base + '.json'
+
+    def sqlite_db(self) -> "SQLiteDatabase":
+        from src.repositories.sqlite_repo import SQLiteDatabase
+        ruta = self.config.obtener('sqlite_path', os.path.join(self.data_dir, 'streamer_votes.db'))
+        return self._compartido(('sqlite', os.path.abspath(ruta)), lambda: SQLiteDatabase(ruta))
+
+    def _compartido(self, clave: tuple, crear):
+        if clave not in self._compartidos:
+            self._compartidos[clave] = crear()
+        self._usados.add(clave)
+        return self._compartidos[clave]
+
+    def cerrar(self) -> None:
+        """
+        Cierra el diario y la base SQLite entregados por esta fábrica y los
+        olvida, de modo que una petición posterior los vuelve a abrir.
+        """
+        for clave in self._usados:
+            recurso = self._compartidos.pop(clave, None)
+            if recurso is not None:
+                recurso.cerrar()
+        self._usados.clear()
@@ -1,5 +1,12 @@
 # src/patterns/observer.py
+import logging
+import queue
+import threading
 from abc import ABC
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 class Observador(ABC):
     """
@@ -11,6 +18,228 @@ class Observador(ABC):
 class SujetoObservable:
     """
     Clase base para objetos que pueden ser observados.
+
+    Es seguro entre hilos: la lista de observadores se reemplaza entera al
+    suscribir o cancelar (copy-on-write), de modo que notificar recorre una
+    instantánea sin bloquear. El fallo de un observador no impide notificar
+    al resto ni interrumpe la operación que emitió el evento.
+
+    Con `usar_despachador` las notificaciones se encolan en un
+    DespachadorAsincrono en lugar de ejecutarse en el hilo del emisor.
     """
     def __init__(self):
-        self._observadores: list[Observador] = []
+        self._observadores: tuple[Observador, ...] = ()
+        self._observadores_lock = threading.Lock()
+        self._despachador: Optional["DespachadorAsincrono"] = None
+
+    def agregar_observador(self, observador: Observador) -> None:
+        """Suscribe un observador a los eventos del sujeto."""
+        with self._observadores_lock:
+            if observador not in self._observadores:
+                self._observadores = self._observadores + (observador,)
+
+    def eliminar_observador(self, observador: Observador) -> None:
+        """Cancela la suscripción de un observador."""
+        with self._observadores_lock:
+            self._observadores = tuple(o for o in self._observadores if o is not observador)
+
+    def notificar_observadores(self, evento: str, datos: dict) -> None:
+        """Notifica un evento a todos los observadores suscritos."""
+        if self._despachador is not None:
+            self._despachador.enviar(self._observadores, evento, datos)
+            return
+        for observador in self._observadores:
+            try:
+                observador.actualizar(evento, datos)
+            except Exception:
+                logger.exception("Error en el observador %r al procesar '%s'", observador, evento)
+
+    def usar_despachador(self, despachador: Optional["DespachadorAsincrono"]) -> None:
+        """Envía las notificaciones a través de un despachador asíncrono (None = síncrono)."""
+        self._despachador = despachador
+
+    def cerrar_despachador(self) -> None:
+        """
+        Entrega los eventos aún encolados y detiene el despachador; a partir
+        de ahí las notificaciones vuelven a ser síncronas.
+        """
+        despachador, self._despachador = self._despachador, None
+        if despachador is not None:
+            despachador.vaciar()
+            despachador.detener()
+
+
+class DespachadorAsincrono:
+    """
+    Despacha eventos a los observadores desde hilos trabajadores, de modo que
+    un observador lento no añade su latencia a la operación que emite.
+
+    - Cola acotada a `max_cola` eventos. Con política 'descartar' el evento se
+      pierde si la cola está llena; con 'bloquear' el emisor espera hasta
+      `timeout_bloqueo` segundos (None = sin límite) antes de descartarlo.
+    - Los 'voto_emitido' pendientes de una misma encuesta se agrupan en uno
+      solo con `datos['delta']` (opción -> votos) y `datos['coalescidos']`.
+    - Cada observador se ejecuta en su propio hilo y se le espera como mucho
+      `timeout_observador` segundos. Mientras siga ocupado con un evento
+      anterior, los nuevos eventos esperan en su cola; los 'voto_emitido' se
+      suman al que ya espera para esa encuesta, y solo con 'descartar' se
+      pierden los demás eventos. Un delta de votos nunca se descarta.
+    """
+    POLITICAS = ('descartar', 'bloquear')
+
+    def __init__(self, max_cola: int = 10000, hilos: int = 1, politica: str = 'descartar',
+                 timeout_bloqueo: Optional[float] = None, timeout_observador: float = 1.0,
+                 coalescer: bool = True):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de despacho inválida: {politica}")
+        self.max_cola = max_cola
+        self.politica = politica
+        self.timeout_bloqueo = timeout_bloqueo
+        self.timeout_observador = timeout_observador
+        self.coalescer = coalescer
+        self._cola: "queue.Queue[Optional[list]]" = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        # encuesta_id -> evento 'voto_emitido' aún en cola (mutable para agrupar)
+        self._votos_pendientes: Dict[str, list] = {}
+        self._ejecutores: Dict[Observador, ThreadPoolExecutor] = {}
+        self._en_curso: Dict[Observador, Future] = {}
+        # (observador, encuesta_id) -> 'voto_emitido' entregado pero aún sin empezar
+        self._por_entregar: Dict[Tuple[Observador, Optional[str]], dict] = {}
+        self._contadores = {'encolados': 0, 'despachados': 0, 'coalescidos': 0,
+                            'descartados': 0, 'timeouts': 0, 'errores': 0}
+        self._hilos = [
+            threading.Thread(target=self._bucle, name=f"observer-dispatch-{i}", daemon=True)
+            for i in range(hilos)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, observadores: Tuple[Observador, ...], evento: str, datos: dict) -> bool:
+        """
+        Encola un evento para los observadores dados.
+
+        :return: False si el evento se descartó por cola llena.
+        """
+        encuesta_id = datos.get('encuesta_id')
+        agrupable = self.coalescer and evento == 'voto_emitido' and encuesta_id is not None
+        datos = dict(datos)
+        if agrupable:
+            datos['delta'] = {datos.get('opcion'): 1}
+            datos['coalescidos'] = 1
+        item = [observadores, evento, datos]
+        with self._lock:
+            if agrupable:
+                pendiente = self._votos_pendientes.get(encuesta_id)
+                if pendiente is not None:
+                    self._agrupar(pendiente[2], datos)
+                    self._contadores['coalescidos'] += 1
+                    return True
+                # Se registra antes de encolarlo: un trabajador puede sacarlo
+                # en cuanto entra en la cola
+                self._votos_pendientes[encuesta_id] = item
+        try:
+            if self.politica == 'bloquear':
+                self._cola.put(item, timeout=self.timeout_bloqueo)
+            else:
+                self._cola.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                if agrupable and self._votos_pendientes.get(encuesta_id) is item:
+                    del self._votos_pendientes[encuesta_id]
+                self._contadores['descartados'] += datos.get('coalescidos', 1)
+            return False
+        with self._lock:
+            self._contadores['encolados'] += 1
+        return True
+
+    @staticmethod
+    def _agrupar(pendiente: dict, datos: dict) -> None:
+        """Suma el delta de `datos` al evento 'voto_emitido' `pendiente`."""
+        for opcion, votos in datos['delta'].items():
+            pendiente['delta'][opcion] = pendiente['delta'].get(opcion, 0) + votos
+        pendiente['coalescidos'] += datos['coalescidos']
+        pendiente.update({k: v for k, v in datos.items() if k not in ('delta', 'coalescidos')})
+
+    def vaciar(self) -> None:
+        """Espera a que se procesen todos los eventos encolados."""
+        self._cola.join()
+
+    def detener(self) -> None:
+        """Procesa lo pendiente y termina los hilos trabajadores."""
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+        with self._lock:
+            ejecutores = list(self._ejecutores.values())
+            self._ejecutores.clear()
+        for ejecutor in ejecutores:
+            ejecutor.shutdown(wait=False)
+
+    def metricas(self) -> Dict[str, int]:
+        """Profundidad de la cola y contadores de eventos."""
+        with self._lock:
+            return dict(self._contadores, en_cola=self._cola.qsize(), max_cola=self.max_cola)
+
+    def _bucle(self) -> None:
+        """Bucle de un hilo trabajador."""
+        while True:
+            item = self._cola.get()
+            try:
+                if item is None:
+                    return
+                observadores, evento, datos = item
+                with self._lock:
+                    encuesta_id = datos.get('encuesta_id')
+                    if self._votos_pendientes.get(encuesta_id) is item:
+                        del self._votos_pendientes[encuesta_id]
+                    datos = dict(datos, delta=dict(datos['delta'])) if 'delta' in datos else dict(datos)
+                for observador in observadores:
+                    self._entregar(observador, evento, datos)
+                with self._lock:
+                    self._contadores['despachados'] += 1
+            finally:
+                self._cola.task_done()
+
+    def _entregar(self, observador: Observador, evento: str, datos: dict) -> None:
+        """Ejecuta un observador en su hilo, esperando como mucho timeout_observador."""
+        with self._lock:
+            anterior = self._en_curso.get(observador)
+            ocupado = anterior is not None and not anterior.done()
+            clave = (observador, datos.get('encuesta_id'))
+            if 'delta' in datos:
+                pendiente = self._por_entregar.get(clave)
+                if pendiente is not None:
+                    self._agrupar(pendiente, datos)
+                    return
+            elif ocupado and self.politica == 'descartar':
+                self._contadores['descartados'] += 1
+                return
+            ejecutor = self._ejecutores.get(observador)
+            if ejecutor is None:
+                ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="observer")
+                self._ejecutores[observador] = ejecutor
+            if 'delta' in datos:
+                datos = dict(datos, delta=dict(datos['delta']))
+                self._por_entregar[clave] = datos
+            futuro = ejecutor.submit(self._ejecutar, observador, evento, datos, clave)
+            self._en_curso[observador] = futuro
+        try:
+            futuro.result(timeout=self.timeout_observador)
+        except FutureTimeoutError:
+            with self._lock:
+                self._contadores['timeouts'] += 1
+        except Exception:
+            logger.exception("Error en el observador %r al procesar '%s'", observador, evento)
+            with self._lock:
+                self._contadores['errores'] += 1
+
+    def _ejecutar(self, observador: Observador, evento: str, datos: dict,
+                  clave: Tuple[Observador, Optional[str]]) -> None:
+        """Llama al observador; a partir de aquí su evento ya no admite más votos."""
+        with self._lock:
+            if self._por_entregar.get(clave) is datos:
+                del self._por_entregar[clave]
+            if 'delta' in datos:
+                datos = dict(datos, delta=dict(datos['delta']))
+        observador.actualizar(evento, datos)
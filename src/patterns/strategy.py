@@ -1,6 +1,6 @@
 # src/patterns/strategy.py
 from abc import ABC
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 import random
 from src.models.encuesta import Encuesta
@@ -38,7 +38,12 @@ class AleatorioStrategy(DesempateStrategy):
 class ProrrogaStrategy(DesempateStrategy):
     """
     Indica que la encuesta debe extenderse (prórroga) en caso de empate.
+
+    :param segundos: Duración de la prórroga; None usa la duración original.
     """
+    def __init__(self, segundos: Optional[int] = None):
+        self.segundos = segundos
+
     def resolver(self, encuesta: Encuesta) -> Dict[str, Any]:
         resultados = encuesta.obtener_resultados()
         max_votos = max(resultados.values())
@@ -46,7 +51,8 @@ class ProrrogaStrategy(DesempateStrategy):
         # Devolver datos para prórroga: opciones a repetir
         return {
             "accion": "prorroga",
-            "opciones_empate": opciones_empate
+            "opciones_empate": opciones_empate,
+            "segundos": self.segundos
         }
 
 class PresentacionStrategy(ABC):
@@ -0,0 +1,296 @@
+# src/repositories/encuesta_journal_repo.py
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+from uuid import UUID
+from src.models.encuesta import Encuesta
+from src.repositories.encuesta_repo import EncuestaRepository, IndiceActivas
+from src.repositories.json_repo import ConflictoDeVersion
+
+try:
+    import fcntl
+except ImportError:  # Windows: no se puede impedir un segundo proceso
+    fcntl = None
+
+# Diarios abiertos en este proceso; se cierran todos al salir
+_abiertos: "weakref.WeakSet[EncuestaJournalRepository]" = weakref.WeakSet()
+
+
+def _cerrar_abiertos() -> None:
+    for repo in list(_abiertos):
+        repo.cerrar()
+
+
+atexit.register(_cerrar_abiertos)
+
+
+class EncuestaJournalRepository(EncuestaRepository):
+    """
+    Repositorio de encuestas basado en un diario (journal) de solo anexado.
+
+    Cada alta de encuesta, cambio de estado o voto se añade como un evento JSON
+    por línea en lugar de reescribir todo el archivo. El fsync se agrupa cada
+    `fsync_cada` eventos (o `fsync_intervalo` segundos) y, cada `compactar_cada`
+    eventos, el diario se compacta en una instantánea.
+
+    El estado vive en memoria de un único proceso: mientras el repositorio
+    está abierto mantiene un flock exclusivo sobre `encuestas.journal.lock`,
+    y abrirlo desde otro proceso falla de inmediato. Para compartir datos
+    entre procesos (demonio y UI) se usan los backends 'json' o 'sqlite'.
+    """
+
+    def __init__(self, directorio: str = 'data',
+                 fsync_cada: int = 100,
+                 fsync_intervalo: float = 1.0,
+                 compactar_cada: int = 10000,
+                 importar_desde: Optional[str] = 'data/encuestas.json'):
+        self.snapshot_path = os.path.join(directorio, 'encuestas.snapshot.json')
+        self.journal_path = os.path.join(directorio, 'encuestas.journal')
+        self.file_path = self.snapshot_path
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+        self.compactar_cada = compactar_cada
+        os.makedirs(directorio, exist_ok=True)
+        self._bloqueo_fd = self._bloquear_diario()
+
+        self._lock = threading.RLock()
+        # id -> encuesta serializada; los votos se guardan como id_voto -> voto
+        self._encuestas: Dict[str, dict] = {}
+        self._activas = IndiceActivas()
+        self._eventos_sin_fsync = 0
+        self._eventos_desde_snapshot = 0
+        self._ultimo_fsync = time.monotonic()
+
+        if os.path.exists(self.snapshot_path):
+            self._cargar_snapshot(self.snapshot_path)
+        elif importar_desde and os.path.exists(importar_desde):
+            self.importar_json(importar_desde)
+        self._reproducir_journal()
+
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        _abiertos.add(self)
+
+    # --- API del repositorio -------------------------------------------
+
+    def agregar(self, encuesta: Encuesta) -> None:
+        """Agrega una nueva encuesta al repositorio."""
+        with self._lock:
+            registro = self._serialize_encuesta(encuesta)
+            self._aplicar_encuesta(registro)
+            self._anexar({'e': 'encuesta', 'd': registro})
+
+    def obtener_por_id(self, encuesta_id: UUID) -> Optional[Encuesta]:
+        """Recupera una encuesta por su ID."""
+        with self._lock:
+            registro = self._encuestas.get(str(encuesta_id))
+            return self._deserialize_encuesta(registro) if registro else None
+
+    def listar(self, activas_solo: bool = False) -> List[Encuesta]:
+        """
+        Lista todas las encuestas, o solo las activas ordenadas por vencimiento.
+        """
+        with self._lock:
+            if activas_solo:
+                return [self._deserialize_encuesta(self._encuestas[i]) for i in self._activas.ids()]
+            return [self._deserialize_encuesta(r) for r in self._encuestas.values()]
+
+    def actualizar(self, encuesta: Encuesta) -> None:
+        """
+        Actualiza una encuesta existente anexando solo lo que cambió:
+        un evento por cada voto nuevo y uno de estado si cambiaron sus datos.
+        Como el resto de repositorios de encuestas, comprueba e incrementa
+        la versión.
+
+        :raises ConflictoDeVersion: si se guardó otra copia entre medias.
+        """
+        with self._lock:
+            actual = self._encuestas.get(str(encuesta.id))
+            if actual is None:
+                raise KeyError(f"Encuesta no encontrada: {encuesta.id}")
+            self._comprobar_version(actual, encuesta.version)
+            registro = self._serialize_encuesta(encuesta)
+            registro['version'] = encuesta.version + 1
+            votos = registro.pop('votos')
+            if any(id_voto not in votos for id_voto in actual['votos']):
+                # Se quitaron votos: se registra el estado completo
+                registro['votos'] = votos
+                self._aplicar_encuesta(registro)
+                self._anexar({'e': 'encuesta', 'd': registro})
+            else:
+                # La versión sola no justifica un evento de estado por voto
+                datos_actuales = {k: v for k, v in actual.items() if k not in ('votos', 'version')}
+                if {k: v for k, v in registro.items() if k != 'version'} != datos_actuales:
+                    self._aplicar_encuesta(registro)
+                    self._anexar({'e': 'encuesta', 'd': registro})
+                for id_voto, voto in votos.items():
+                    if id_voto not in actual['votos']:
+                        actual['votos'][id_voto] = voto
+                        self._anexar({'e': 'voto', 'id': registro['id'], 'd': voto})
+                self._encuestas[registro['id']]['version'] = registro['version']
+            encuesta.version += 1
+
+    def transaccion(self) -> threading.RLock:
+        """
+        El diario es de un solo proceso (lo garantiza su flock): basta con
+        su lock.
+        """
+        return self._lock
+
+    # --- Durabilidad ---------------------------------------------------
+
+    def flush(self) -> None:
+        """Fuerza la escritura a disco (fsync) de los eventos pendientes."""
+        with self._lock:
+            if self._journal.closed:
+                return
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._eventos_sin_fsync = 0
+            self._ultimo_fsync = time.monotonic()
+
+    def compactar(self) -> None:
+        """
+        Escribe una instantánea con el estado actual y vacía el diario.
+
+        La instantánea se reemplaza de forma atómica; si el proceso cae antes
+        de vaciar el diario, reproducirlo de nuevo es idempotente.
+        """
+        with self._lock:
+            self.flush()
+            self._escribir_snapshot()
+            self._journal.close()
+            self._journal = open(self.journal_path, 'w', encoding='utf-8')
+            self._eventos_desde_snapshot = 0
+
+    def cerrar(self) -> None:
+        """Vacía los eventos pendientes, cierra el diario y lo libera para otros procesos."""
+        with self._lock:
+            if not self._journal.closed:
+                self.flush()
+                self._journal.close()
+            if self._bloqueo_fd is not None:
+                os.close(self._bloqueo_fd)
+                self._bloqueo_fd = None
+            _abiertos.discard(self)
+
+    def importar_json(self, ruta: str) -> int:
+        """
+        Importa las encuestas de un archivo `encuestas.json` clásico y
+        escribe una instantánea con ellas.
+
+        :return: número de encuestas importadas.
+        """
+        with self._lock:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for enc in data.get('encuestas', []):
+                registro = dict(enc)
+                registro.setdefault('votos', [])
+                self._aplicar_encuesta(registro)
+            self._escribir_snapshot()
+            return len(data.get('encuestas', []))
+
+    # --- Serialización -------------------------------------------------
+
+    def _serialize_encuesta(self, encuesta: Encuesta) -> dict:
+        """Convierte una Encuesta a dict, indexando sus votos por id."""
+        registro = super()._serialize_encuesta(encuesta)
+        registro['votos'] = {v['id']: v for v in registro['votos']}
+        return registro
+
+    def _deserialize_encuesta(self, data: dict) -> Encuesta:
+        """Convierte un dict (con votos por id) a Encuesta."""
+        return super()._deserialize_encuesta(dict(data, votos=data['votos'].values()))
+
+    # --- Internos ------------------------------------------------------
+
+    def _bloquear_diario(self) -> Optional[int]:
+        """
+        Toma el flock exclusivo del diario sin esperar.
+
+        :raises RuntimeError: si otro proceso (u otra instancia) ya lo tiene abierto.
+        """
+        if fcntl is None:
+            return None
+        fd = os.open(self.journal_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise RuntimeError(
+                f"El diario {self.journal_path} ya está abierto en otro proceso; el backend "
+                f"'journal' es de un solo proceso (use 'json' o 'sqlite' para compartir datos)")
+        return fd
+
+    def _aplicar_encuesta(self, registro: dict) -> None:
+        """Inserta o actualiza los datos de una encuesta en memoria."""
+        votos = registro.get('votos')
+        if isinstance(votos, list):
+            votos = {v['id']: v for v in votos}
+        existente = self._encuestas.get(registro['id'])
+        nuevo = {k: v for k, v in registro.items() if k != 'votos'}
+        if votos is not None:
+            nuevo['votos'] = dict(votos)
+        else:
+            nuevo['votos'] = existente['votos'] if existente else {}
+        self._encuestas[registro['id']] = nuevo
+        self._activas.actualizar(nuevo)
+
+    def _aplicar_evento(self, evento: dict) -> None:
+        """Aplica un evento del diario al estado en memoria."""
+        if evento['e'] == 'encuesta':
+            self._aplicar_encuesta(evento['d'])
+        elif evento['e'] == 'voto':
+            registro = self._encuestas.get(evento['id'])
+            if registro is not None:
+                registro['votos'][evento['d']['id']] = evento['d']
+
+    def _anexar(self, evento: dict) -> None:
+        """Añade un evento al diario, agrupando fsync y compactaciones."""
+        self._journal.write(json.dumps(evento, ensure_ascii=False) + '\n')
+        self._eventos_sin_fsync += 1
+        self._eventos_desde_snapshot += 1
+        if (self._eventos_sin_fsync >= self.fsync_cada
+                or time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo):
+            self.flush()
+        if self._eventos_desde_snapshot >= self.compactar_cada:
+            self.compactar()
+
+    def _cargar_snapshot(self, ruta: str) -> None:
+        """Carga el estado desde una instantánea."""
+        with open(ruta, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for registro in data.get('encuestas', []):
+            self._aplicar_encuesta(registro)
+
+    def _reproducir_journal(self) -> None:
+        """Reproduce los eventos del diario sobre la instantánea cargada."""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    evento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Última línea truncada por una caída: se descarta
+                    continue
+                self._aplicar_evento(evento)
+                self._eventos_desde_snapshot += 1
+
+    def _escribir_snapshot(self) -> None:
+        """Escribe la instantánea de forma atómica (archivo temporal + os.replace)."""
+        tmp = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'encuestas': [
+                    dict(r, votos=list(r['votos'].values())) for r in self._encuestas.values()
+                ]}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+        except IOError as e:
+            raise RuntimeError(f"Error al guardar la instantánea: {e}")
@@ -1,24 +1,65 @@
 # src/repositories/encuesta_repo.py
+import bisect
 import json
-import os
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 from src.models.encuesta import Encuesta
+from src.models.voto import Voto
+from src.repositories.json_repo import JSONRepository
 
 
-class EncuestaRepository:
+class IndiceActivas:
+    """
+    Índice secundario de las encuestas activas, ordenado por `expira_en`.
+
+    Guarda solo (expira_en, id) de las activas, así que recorrerlo cuesta
+    O(activas) aunque el histórico de encuestas cerradas sea enorme.
+    """
+
+    def __init__(self):
+        self._orden: List[Tuple[datetime, str]] = []
+        self._claves: Dict[str, Tuple[datetime, str]] = {}
+
+    def actualizar(self, registro: dict) -> None:
+        """Refleja el estado (activa, expira_en) de una encuesta serializada."""
+        encuesta_id = registro['id']
+        self.eliminar(encuesta_id)
+        if registro['activa']:
+            clave = (datetime.fromisoformat(registro['expira_en']), encuesta_id)
+            bisect.insort(self._orden, clave)
+            self._claves[encuesta_id] = clave
+
+    def eliminar(self, encuesta_id: str) -> None:
+        """Quita una encuesta del índice si estaba."""
+        clave = self._claves.pop(encuesta_id, None)
+        if clave is not None:
+            del self._orden[bisect.bisect_left(self._orden, clave)]
+
+    def ids(self) -> List[str]:
+        """IDs de las encuestas activas, de la que vence antes a la última."""
+        return [encuesta_id for _, encuesta_id in self._orden]
+
+    def __len__(self) -> int:
+        return len(self._orden)
+
+
+class EncuestaRepository(JSONRepository):
     """
     Repositorio para persistir encuestas y votos en un archivo JSON.
+
+    Además del índice por id mantiene un IndiceActivas, de modo que
+    `listar(activas_solo=True)` solo deserializa las encuestas activas y las
+    devuelve ordenadas por vencimiento.
     """
+    coleccion = 'encuestas'
+    clave = 'id'
+
     def __init__(self, file_path: str = 'data/encuestas.json'):
-        self.file_path = file_path
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump({'encuestas': []}, f, ensure_ascii=False, indent=2)
+        self._activas = IndiceActivas()
+        super().__init__(file_path)
 
-    def _load(self) -> dict:
+    def _leer_archivo(self) -> dict:
         """Carga los datos del archivo JSON."""
         try:
             with open(self.file_path, 'r', encoding='utf-8') as f:
@@ -26,45 +67,55 @@ class EncuestaRepository:
         except (FileNotFoundError, json.JSONDecodeError):
             return {'encuestas': []}
 
-    def _save(self, data: dict) -> None:
-        """Guarda los datos en el archivo JSON."""
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except IOError as e:
-            raise RuntimeError(f"Error al guardar los datos: {e}")
-
     def agregar(self, encuesta: Encuesta) -> None:
         """Agrega una nueva encuesta al repositorio."""
-        data = self._load()
-        data['encuestas'].append(self._serialize_encuesta(encuesta))
-        self._save(data)
+        with self.transaccion():
+            data = self._load()
+            data['encuestas'].append(self._serialize_encuesta(encuesta))
+            self._save(data)
 
     def obtener_por_id(self, encuesta_id: UUID) -> Optional[Encuesta]:
         """Recupera una encuesta por su ID."""
-        data = self._load()
-        for enc in data['encuestas']:
-            if enc['id'] == str(encuesta_id):
-                return self._deserialize_encuesta(enc)
-        return None
+        enc = self._buscar(str(encuesta_id))
+        return self._deserialize_encuesta(enc) if enc else None
 
     def listar(self, activas_solo: bool = False) -> List[Encuesta]:
-        """Lista todas las encuestas, opcionalmente solo las activas."""
-        data = self._load()
-        encuestas = [self._deserialize_encuesta(enc) for enc in data['encuestas']]
-        if activas_solo:
-            return [e for e in encuestas if e.activa]
-        return encuestas
+        """
+        Lista todas las encuestas, o solo las activas ordenadas por vencimiento.
+        """
+        with self._lock:
+            data = self._load()
+            if activas_solo:
+                return [self._deserialize_encuesta(self._indice[i]) for i in self._activas.ids()]
+            return [self._deserialize_encuesta(enc) for enc in data['encuestas']]
 
     def actualizar(self, encuesta: Encuesta) -> None:
-        """Actualiza una encuesta existente en el repositorio."""
-        data = self._load()
-        for i, enc in enumerate(data['encuestas']):
-            if enc['id'] == str(encuesta.id):
-                data['encuestas'][i] = self._serialize_encuesta(encuesta)
-                self._save(data)
-                return
-        raise KeyError(f"Encuesta no encontrada: {encuesta.id}")
+        """
+        Actualiza una encuesta existente en el repositorio si nadie la ha
+        guardado desde que se leyó, e incrementa su versión.
+
+        :raises ConflictoDeVersion: si la versión en disco es otra; hay que
+                                    releer la encuesta y reintentar.
+        """
+        with self.transaccion():
+            enc = self._buscar(str(encuesta.id))
+            if enc is None:
+                raise KeyError(f"Encuesta no encontrada: {encuesta.id}")
+            self._comprobar_version(enc, encuesta.version)
+            nuevo = self._serialize_encuesta(encuesta)
+            nuevo['version'] = encuesta.version + 1
+            enc.clear()
+            enc.update(nuevo)
+            self._save(self._cache)
+            encuesta.version += 1
+
+    def _indexar(self, data: dict) -> None:
+        """Reconstruye el índice por id y el de encuestas activas."""
+        super()._indexar(data)
+        self._activas = IndiceActivas()
+        for enc in data.get(self.coleccion, []):
+            if enc['activa']:
+                self._activas.actualizar(enc)
 
     def _serialize_encuesta(self, encuesta: Encuesta) -> dict:
         """Convierte una Encuesta a un dict serializable."""
@@ -77,21 +128,59 @@ class EncuestaRepository:
             'creado_en': encuesta.creado_en.isoformat(),
             'expira_en': encuesta.expira_en.isoformat(),
             'activa': encuesta.activa,
+            'votos': [self._serialize_voto(v) for v in self._listar_votos(encuesta)],
+            'version': encuesta.version,
         }
 
     def _deserialize_encuesta(self, data: dict) -> Encuesta:
         """Convierte un dict a una instancia de Encuesta."""
         try:
-            encuesta = Encuesta(
+            encuesta_id = UUID(data['id'])
+            return Encuesta.rehidratar(
+                id=encuesta_id,
                 pregunta=data['pregunta'],
                 opciones=data['opciones'],
                 duracion_segundos=data['duracion_segundos'],
-                tipo=data.get('tipo', 'simple')
+                tipo=data.get('tipo', 'simple'),
+                creado_en=datetime.fromisoformat(data['creado_en']),
+                expira_en=datetime.fromisoformat(data['expira_en']),
+                activa=data['activa'],
+                votos=[self._deserialize_voto(encuesta_id, v) for v in data.get('votos', [])],
+                version=data.get('version', 0)
             )
-            encuesta.id = UUID(data['id'])
-            encuesta.creado_en = datetime.fromisoformat(data['creado_en'])
-            encuesta.expira_en = datetime.fromisoformat(data['expira_en'])
-            encuesta.activa = data['activa']
-            return encuesta
         except (KeyError, ValueError) as e:
             raise ValueError(f"Error al deserializar la encuesta: {e}")
+
+    def _serialize_voto(self, voto: Voto) -> dict:
+        """Convierte un Voto a un dict serializable (sin el id de la encuesta)."""
+        return {
+            'id': str(voto.id),
+            'usuario': voto.usuario,
+            'opcion': voto.opcion,
+            'realizado_en': voto.realizado_en.isoformat(),
+            'token_id': str(voto.token_id),
+        }
+
+    def _deserialize_voto(self, encuesta_id: UUID, data: dict) -> Voto:
+        """Convierte un dict a una instancia de Voto de la encuesta indicada."""
+        try:
+            return Voto.rehidratar(
+                encuesta_id=encuesta_id,
+                usuario=data['usuario'],
+                opcion=data['opcion'],
+                realizado_en=datetime.fromisoformat(data['realizado_en']),
+                token_id=UUID(data['token_id']),
+                id=UUID(data['id'])
+            )
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Error al deserializar el voto: {e}")
+
+    def _listar_votos(self, encuesta: Encuesta) -> List[Voto]:
+        """Aplana los votos de una encuesta (simple o múltiple) en una lista."""
+        votos: List[Voto] = []
+        for v in encuesta.votos.values():
+            if isinstance(v, list):
+                votos.extend(v)
+            else:
+                votos.append(v)
+        return votos
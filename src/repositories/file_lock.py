@@ -0,0 +1,95 @@
+# src/repositories/file_lock.py
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo hay exclusión entre hilos
+    fcntl = None
+
+
+class BloqueoArchivo:
+    """
+    Bloqueo lector/escritor entre procesos sobre `<ruta>.lock` (flock).
+
+    Hay una instancia por archivo y proceso (`para`), compartida por todos
+    los repositorios que lo usan. Es reentrante dentro de un hilo, y entre
+    hilos del mismo proceso lo serializa un RLock (flock no distingue hilos).
+    Un hilo que ya escribe puede leer, pero no pasar de lectura a escritura.
+    """
+    _instancias: Dict[str, "BloqueoArchivo"] = {}
+    _registro_lock = threading.Lock()
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta + '.lock'
+        self._reiniciar()
+
+    @classmethod
+    def para(cls, ruta: str) -> "BloqueoArchivo":
+        """Bloqueo compartido del archivo `ruta` en este proceso."""
+        clave = os.path.abspath(ruta)
+        with cls._registro_lock:
+            if clave not in cls._instancias:
+                cls._instancias[clave] = cls(ruta)
+            return cls._instancias[clave]
+
+    @contextmanager
+    def lectura(self) -> Iterator[None]:
+        """Bloqueo compartido: otros lectores pueden entrar, los escritores esperan."""
+        with self._bloquear(exclusivo=False):
+            yield
+
+    @contextmanager
+    def escritura(self) -> Iterator[None]:
+        """Bloqueo exclusivo frente a lectores y escritores de cualquier proceso."""
+        with self._bloquear(exclusivo=True):
+            yield
+
+    @contextmanager
+    def _bloquear(self, exclusivo: bool) -> Iterator[None]:
+        with self._lock:
+            if self._profundidad == 0:
+                self._adquirir(exclusivo)
+            elif exclusivo and not self._exclusivo:
+                raise RuntimeError(f"No se puede pasar de lectura a escritura en {self.ruta}")
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    self._liberar()
+
+    def _adquirir(self, exclusivo: bool) -> None:
+        self._exclusivo = exclusivo
+        if fcntl is None:
+            return
+        if self._fd is None:
+            self._fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+
+    def _liberar(self) -> None:
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reiniciar(self) -> None:
+        if getattr(self, '_fd', None) is not None:
+            os.close(self._fd)
+        self._lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._profundidad = 0
+        self._exclusivo = False
+
+    @classmethod
+    def _tras_fork(cls) -> None:
+        # El hijo hereda el descriptor (y con él el flock del padre) y quizá
+        # un RLock tomado por otro hilo: cada proceso abre el suyo
+        for bloqueo in cls._instancias.values():
+            bloqueo._reiniciar()
+        cls._registro_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=BloqueoArchivo._tras_fork)
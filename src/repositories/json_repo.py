@@ -0,0 +1,173 @@
+# src/repositories/json_repo.py
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from src.repositories.file_lock import BloqueoArchivo
+
+_decodificador = json.JSONDecoder()
+
+
+class ConflictoDeVersion(Exception):
+    """El registro cambió en disco desde que se leyó (otro hilo o proceso lo guardó antes)."""
+
+
+def iterar_json(ruta: str, coleccion: str, tam_bloque: int = 1 << 16) -> Iterator[dict]:
+    """
+    Recorre los registros de `{"<coleccion>": [...]}` sin cargar el archivo
+    entero: lee bloques y decodifica cada elemento con `raw_decode` conforme
+    llega, de modo que la memoria es la de un registro y un bloque.
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+
+        def leer_mas() -> bool:
+            nonlocal buffer, pos
+            bloque = f.read(tam_bloque)
+            if not bloque:
+                return False
+            buffer = buffer[pos:] + bloque
+            pos = 0
+            return True
+
+        # Localizar el inicio de la lista de la colección
+        clave = json.dumps(coleccion)
+        while True:
+            inicio = buffer.find(clave)
+            corchete = buffer.find('[', inicio + len(clave)) if inicio >= 0 else -1
+            if corchete >= 0:
+                pos = corchete + 1
+                break
+            if not leer_mas():
+                return
+        while True:
+            # Saltar espacios y comas entre elementos
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or not leer_mas():
+                    break
+            if pos >= len(buffer) or buffer[pos] == ']':
+                return
+            try:
+                registro, fin = _decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento partido entre bloques: leer más y reintentar
+                if not leer_mas():
+                    raise
+                continue
+            pos = fin
+            yield registro
+
+
+class JSONRepository:
+    """
+    Base para repositorios persistidos en un archivo JSON.
+
+    Mantiene el documento ya parseado en memoria junto con un índice
+    `clave -> registro`, de modo que las búsquedas son O(1). La caché se
+    invalida cuando cambian el mtime, el tamaño o el inode del archivo, así
+    que otros procesos siguen viendo las escrituras ajenas.
+
+    Entre procesos, las lecturas toman un flock compartido sobre
+    `<archivo>.lock` y las modificaciones se hacen dentro de `transaccion()`,
+    que lo toma en exclusiva desde la carga hasta el guardado. Los registros
+    con campo 'version' admiten además compare-and-swap (`_comprobar_version`).
+    """
+    coleccion: str = ''
+    clave: str = ''
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self._bloqueo = BloqueoArchivo.para(file_path)
+        self._cache: Optional[dict] = None
+        self._firma: Optional[Tuple[int, int, int]] = None
+        self._indice: Dict[str, dict] = {}
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with self._bloqueo.escritura():
+            if not os.path.exists(self.file_path):
+                with open(self.file_path, 'w', encoding='utf-8') as f:
+                    json.dump({self.coleccion: []}, f, ensure_ascii=False, indent=2)
+
+    @contextmanager
+    def transaccion(self) -> Iterator[None]:
+        """
+        Bloquea el archivo en exclusiva (entre hilos y procesos) durante el
+        bloque, de modo que leer, modificar y guardar no se intercale con
+        otro escritor. Las transacciones anidadas se unen a la exterior.
+        """
+        with self._lock, self._bloqueo.escritura():
+            yield
+
+    @staticmethod
+    def _comprobar_version(registro: dict, esperada: int) -> None:
+        """
+        Compare-and-swap: falla si el registro en disco ya no tiene la
+        versión con la que se leyó.
+
+        :raises ConflictoDeVersion: si otro escritor lo guardó entre medias.
+        """
+        actual = registro.get('version', 0)
+        if actual != esperada:
+            raise ConflictoDeVersion(f"Versión {esperada} obsoleta (en disco: {actual})")
+
+    def _firma_archivo(self) -> Optional[Tuple[int, int, int]]:
+        """Devuelve (mtime_ns, tamaño, inode) del archivo o None si no existe."""
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _leer_archivo(self) -> dict:
+        """Lee y parsea el archivo JSON completo."""
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            raise RuntimeError(f"Error al cargar el archivo: {e}")
+
+    def _load(self) -> dict:
+        """Devuelve los datos en caché, releyendo el archivo solo si cambió."""
+        with self._lock, self._bloqueo.lectura():
+            firma = self._firma_archivo()
+            if self._cache is None or firma != self._firma:
+                self._cache = self._leer_archivo()
+                self._firma = firma
+                self._indexar(self._cache)
+            return self._cache
+
+    def _save(self, data: dict, reindexar: bool = True) -> None:
+        """
+        Guarda los datos en el archivo JSON y actualiza la caché.
+
+        :param reindexar: False si quien llama ya actualizó los índices.
+        """
+        with self.transaccion():
+            # Se escribe en un temporal y se reemplaza de forma atómica, así
+            # una caída a mitad de escritura nunca deja el archivo a medias
+            tmp = self.file_path + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.file_path)
+            except IOError as e:
+                self._cache = None
+                raise RuntimeError(f"Error al guardar el archivo: {e}")
+            self._cache = data
+            self._firma = self._firma_archivo()
+            if reindexar:
+                self._indexar(data)
+
+    def _indexar(self, data: dict) -> None:
+        """Reconstruye el índice por clave de la colección."""
+        self._indice = {r[self.clave]: r for r in data.get(self.coleccion, [])}
+
+    def _buscar(self, valor: str) -> Optional[dict]:
+        """Busca un registro por su clave en O(1)."""
+        with self._lock:
+            self._load()
+            return self._indice.get(valor)
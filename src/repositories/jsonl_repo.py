@@ -0,0 +1,297 @@
+# src/repositories/jsonl_repo.py
+import json
+import os
+import threading
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+from src.models.encuesta import Encuesta
+from src.models.token_nft import TokenNFT
+from src.models.usuario import Usuario
+from src.repositories.encuesta_repo import EncuestaRepository, IndiceActivas
+from src.repositories.file_lock import BloqueoArchivo
+from src.repositories.json_repo import iterar_json
+from src.repositories.nft_repo import NFTRepository
+from src.repositories.usuario_repo import UsuarioRepository
+
+
+class ArchivoJSONL:
+    """
+    Archivo con un registro JSON por línea, leído siempre en streaming.
+
+    Nada se mantiene en memoria: las búsquedas paran en la primera
+    coincidencia, las altas se anexan al final y las modificaciones
+    reescriben el archivo línea a línea en un temporal que sustituye al
+    original con `os.replace`.
+
+    Las escrituras toman en exclusiva el BloqueoArchivo del archivo, así que
+    varios procesos pueden compartirlo. Los lectores no bloquean: el archivo
+    solo se sustituye entero o crece por el final, y una última línea aún
+    sin '\n' (un anexo a medias) se ignora.
+    """
+
+    def __init__(self, ruta: str, coleccion: str, importar_desde: Optional[str] = None):
+        self.ruta = ruta
+        self.lock = threading.RLock()
+        self.bloqueo = BloqueoArchivo.para(ruta)
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with self.lock, self.bloqueo.escritura():
+            if not os.path.exists(ruta):
+                if importar_desde and os.path.exists(importar_desde):
+                    self.escribir(iterar_json(importar_desde, coleccion))
+                else:
+                    open(ruta, 'a', encoding='utf-8').close()
+
+    def iterar(self) -> Iterator[dict]:
+        """Recorre los registros en orden, uno a uno."""
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                if linea.endswith('\n') and linea.strip():
+                    yield json.loads(linea)
+
+    def buscar(self, campo: str, valor: str) -> Optional[dict]:
+        """Devuelve el primer registro con `campo == valor`."""
+        return next((r for r in self.iterar() if r[campo] == valor), None)
+
+    def anexar(self, registros: Iterable[dict]) -> None:
+        """Añade registros al final del archivo."""
+        with self.lock, self.bloqueo.escritura():
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in registros)
+
+    def escribir(self, registros: Iterable[dict]) -> None:
+        """Sustituye el contenido de forma atómica (temporal + os.replace)."""
+        with self.lock, self.bloqueo.escritura():
+            self._escribir_tmp(registros)
+            os.replace(self.ruta + '.tmp', self.ruta)
+
+    def reescribir(self, campo: str, cambios: Dict[str, Union[dict, Callable[[dict], dict]]]) -> None:
+        """
+        Reescribe el archivo en una pasada aplicando `cambios` (valor de
+        `campo` -> registro nuevo, o función que lo calcula a partir del
+        actual). Si alguno no existe, o una función lanza una excepción, no
+        se modifica nada.
+        """
+        with self.lock, self.bloqueo.escritura():
+            encontrados = set()
+
+            def aplicar() -> Iterator[dict]:
+                for r in self.iterar():
+                    cambio = cambios.get(r[campo])
+                    if cambio is not None:
+                        encontrados.add(r[campo])
+                        r = cambio(r) if callable(cambio) else cambio
+                    yield r
+
+            try:
+                self._escribir_tmp(aplicar())
+            except BaseException:
+                os.remove(self.ruta + '.tmp')
+                raise
+            faltan = set(cambios) - encontrados
+            if faltan:
+                os.remove(self.ruta + '.tmp')
+                raise KeyError(f"Registro no encontrado: {next(iter(faltan))}")
+            os.replace(self.ruta + '.tmp', self.ruta)
+
+    def _escribir_tmp(self, registros: Iterable[dict]) -> None:
+        try:
+            with open(self.ruta + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in registros)
+        except IOError as e:
+            raise RuntimeError(f"Error al guardar el archivo: {e}")
+
+
+class UsuarioJSONLRepository(UsuarioRepository):
+    """Repositorio de usuarios sobre `usuarios.jsonl`, leído en streaming."""
+
+    def __init__(self, file_path: str = 'data/usuarios.jsonl', importar_desde: Optional[str] = None):
+        self.file_path = file_path
+        self.archivo = ArchivoJSONL(file_path, self.coleccion, importar_desde)
+        self._lock = self.archivo.lock
+        self._bloqueo = self.archivo.bloqueo
+
+    def agregar(self, usuario: Usuario) -> None:
+        """Agrega un nuevo usuario al repositorio."""
+        self.archivo.anexar([self._serialize_usuario(usuario)])
+
+    def obtener_por_nombre(self, nombre: str) -> Optional[Usuario]:
+        """Recupera un usuario por su nombre."""
+        u = self.archivo.buscar('nombre', nombre)
+        return self._deserialize_usuario(u) if u else None
+
+    def listar(self) -> List[Usuario]:
+        """Lista todos los usuarios registrados."""
+        return list(self.iterar())
+
+    def iterar(self) -> Iterator[Usuario]:
+        """Genera los usuarios de uno en uno."""
+        return (self._deserialize_usuario(u) for u in self.archivo.iterar())
+
+    def actualizar(self, usuario: Usuario) -> None:
+        """Actualiza los datos de un usuario existente."""
+        self.actualizar_muchos([usuario])
+
+    def actualizar_muchos(self, usuarios: List[Usuario]) -> None:
+        """Actualiza varios usuarios existentes con una sola reescritura."""
+        self.archivo.reescribir('nombre', {u.nombre: self._serialize_usuario(u) for u in usuarios})
+
+
+class EncuestaJSONLRepository(EncuestaRepository):
+    """
+    Repositorio de encuestas sobre `encuestas.jsonl`, leído en streaming.
+
+    Solo las encuestas activas se guardan en memoria, en un IndiceActivas
+    con sus registros, así que `listar/iterar(activas_solo=True)` no recorre
+    el histórico. El índice se invalida cuando cambian el mtime, el tamaño o
+    el inode del archivo (escrituras de otro proceso) y se reconstruye con
+    una pasada; las escrituras propias lo actualizan sin releer.
+    """
+
+    def __init__(self, file_path: str = 'data/encuestas.jsonl', importar_desde: Optional[str] = None):
+        self.file_path = file_path
+        self.archivo = ArchivoJSONL(file_path, self.coleccion, importar_desde)
+        self._lock = self.archivo.lock
+        self._bloqueo = self.archivo.bloqueo
+        self._activas = IndiceActivas()
+        # id -> registro de cada encuesta activa
+        self._registros_activos: Dict[str, dict] = {}
+        self._firma: Optional[Tuple[int, int, int]] = None
+
+    def agregar(self, encuesta: Encuesta) -> None:
+        """Agrega una nueva encuesta al repositorio."""
+        registro = self._serialize_encuesta(encuesta)
+        with self._lock, self._bloqueo.escritura():
+            al_dia = self._firma == self._firma_archivo()
+            self.archivo.anexar([registro])
+            self._tras_escribir(registro if al_dia else None)
+
+    def obtener_por_id(self, encuesta_id: UUID) -> Optional[Encuesta]:
+        """Recupera una encuesta por su ID."""
+        enc = self.archivo.buscar('id', str(encuesta_id))
+        return self._deserialize_encuesta(enc) if enc else None
+
+    def listar(self, activas_solo: bool = False) -> List[Encuesta]:
+        """
+        Lista todas las encuestas, o solo las activas ordenadas por vencimiento.
+        """
+        return list(self.iterar(activas_solo))
+
+    def iterar(self, activas_solo: bool = False) -> Iterator[Encuesta]:
+        """
+        Genera las encuestas en orden de alta, o solo las activas (desde el
+        índice) ordenadas por vencimiento.
+        """
+        if activas_solo:
+            return (self._deserialize_encuesta(enc) for enc in self._registros_activas())
+        return (self._deserialize_encuesta(enc) for enc in self.archivo.iterar())
+
+    def actualizar(self, encuesta: Encuesta) -> None:
+        """
+        Actualiza una encuesta existente si su versión en disco sigue siendo
+        la leída, e incrementa la versión.
+
+        :raises ConflictoDeVersion: si otro escritor la guardó entre medias.
+        """
+        nuevo = self._serialize_encuesta(encuesta)
+        nuevo['version'] = encuesta.version + 1
+
+        def cambio(actual: dict) -> dict:
+            self._comprobar_version(actual, encuesta.version)
+            return nuevo
+
+        with self._lock, self._bloqueo.escritura():
+            al_dia = self._firma == self._firma_archivo()
+            self.archivo.reescribir('id', {str(encuesta.id): cambio})
+            self._tras_escribir(nuevo if al_dia else None)
+        encuesta.version += 1
+
+    def _registros_activas(self) -> List[dict]:
+        """Registros de las encuestas activas por vencimiento; relee el archivo solo si cambió."""
+        with self._lock, self._bloqueo.lectura():
+            firma = self._firma_archivo()
+            if firma != self._firma:
+                self._activas = IndiceActivas()
+                self._registros_activos = {}
+                for enc in self.archivo.iterar():
+                    self._indexar_activa(enc)
+                self._firma = firma
+            return [self._registros_activos[i] for i in self._activas.ids()]
+
+    def _tras_escribir(self, registro: Optional[dict]) -> None:
+        """
+        Refleja una escritura propia en el índice. Con None (el índice ya
+        estaba desfasado) se deja invalidado para la próxima lectura.
+        """
+        if registro is None:
+            return
+        self._indexar_activa(registro)
+        self._firma = self._firma_archivo()
+
+    def _indexar_activa(self, registro: dict) -> None:
+        self._activas.actualizar(registro)
+        if registro['activa']:
+            self._registros_activos[registro['id']] = registro
+        else:
+            self._registros_activos.pop(registro['id'], None)
+
+
+class NFTJSONLRepository(NFTRepository):
+    """Repositorio de tokens NFT sobre `nfts.jsonl`, leído en streaming."""
+
+    def __init__(self, file_path: str = 'data/nfts.jsonl', importar_desde: Optional[str] = None):
+        self.file_path = file_path
+        self.archivo = ArchivoJSONL(file_path, self.coleccion, importar_desde)
+        self._lock = self.archivo.lock
+        self._bloqueo = self.archivo.bloqueo
+
+    def agregar(self, token: TokenNFT) -> None:
+        """Agrega un nuevo token NFT al repositorio."""
+        self.agregar_muchos([token])
+
+    def agregar_muchos(self, tokens: List[TokenNFT]) -> None:
+        """Agrega varios tokens NFT anexándolos al final del archivo."""
+        if not all(isinstance(t, TokenNFT) for t in tokens):
+            raise ValueError("Todos los objetos deben ser instancias de TokenNFT.")
+        self.archivo.anexar(self._serialize_token(t) for t in tokens)
+
+    def obtener_por_id(self, token_id: UUID) -> Optional[TokenNFT]:
+        """Recupera un token por su ID."""
+        if not isinstance(token_id, UUID):
+            raise ValueError("El token_id debe ser una instancia de UUID.")
+        t = self.archivo.buscar('token_id', str(token_id))
+        return self._deserialize_token(t) if t else None
+
+    def listar_por_usuario(self, usuario: str, offset: int = 0,
+                           limit: Optional[int] = None) -> List[TokenNFT]:
+        """
+        Lista una página de los tokens de un usuario; deja de leer en cuanto
+        la completa.
+        """
+        if not isinstance(usuario, str):
+            raise ValueError("El usuario debe ser una cadena de texto.")
+        fin = offset + limit if limit is not None else None
+        return list(islice(self.iterar_por_usuario(usuario), offset, fin))
+
+    def iterar_por_usuario(self, usuario: str) -> Iterator[TokenNFT]:
+        """Genera los tokens de un usuario de uno en uno."""
+        return (self._deserialize_token(t) for t in self.archivo.iterar() if t['propietario'] == usuario)
+
+    def contar_por_usuario(self, usuario: str) -> int:
+        """Número de tokens de un usuario."""
+        return sum(1 for t in self.archivo.iterar() if t['propietario'] == usuario)
+
+    def transferir(self, token_id: UUID, nuevo_propietario: str) -> None:
+        """Transfiere la propiedad de un token."""
+        if not isinstance(token_id, UUID):
+            raise ValueError("El token_id debe ser una instancia de UUID.")
+        if not isinstance(nuevo_propietario, str):
+            raise ValueError("El nuevo propietario debe ser una cadena de texto.")
+        self.transferir_muchos([(token_id, nuevo_propietario)])
+
+    def transferir_muchos(self, transferencias: List[Tuple[UUID, str]]) -> None:
+        """Transfiere varios tokens con una sola reescritura del archivo."""
+        self.archivo.reescribir('token_id', {
+            str(token_id): (lambda t, p=propietario: dict(t, propietario=p))
+            for token_id, propietario in transferencias
+        })
@@ -1,67 +1,80 @@
 # src/repositories/nft_repo.py
-import json
-import os
-from typing import List, Optional
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from src.models.token_nft import TokenNFT
+from src.repositories.json_repo import JSONRepository
 from datetime import datetime
 
 
-class NFTRepository:
+class NFTRepository(JSONRepository):
     """
     Repositorio para persistir tokens NFT en un archivo JSON.
+
+    Mantiene un índice propietario -> tokens (en orden de llegada) que
+    `agregar` y `transferir` actualizan de forma incremental, de modo que
+    listar los tokens de un usuario no recorre todos los emitidos.
     """
+    coleccion = 'tokens'
+    clave = 'token_id'
 
     def __init__(self, file_path: str = 'data/nfts.json'):
-        self.file_path = file_path
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump({'tokens': []}, f, ensure_ascii=False, indent=2)
-
-    def _load(self) -> dict:
-        """Carga los datos desde el archivo JSON."""
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            raise RuntimeError(f"Error al cargar el archivo: {e}")
-
-    def _save(self, data: dict) -> None:
-        """Guarda los datos en el archivo JSON."""
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except IOError as e:
-            raise RuntimeError(f"Error al guardar el archivo: {e}")
+        # propietario -> {token_id: registro}
+        self._por_propietario: Dict[str, Dict[str, dict]] = {}
+        super().__init__(file_path)
 
     def agregar(self, token: TokenNFT) -> None:
         """Agrega un nuevo token NFT al repositorio."""
         if not isinstance(token, TokenNFT):
             raise ValueError("El objeto proporcionado no es una instancia de TokenNFT.")
-        data = self._load()
-        data['tokens'].append(self._serialize_token(token))
-        self._save(data)
+        with self.transaccion():
+            data = self._load()
+            registro = self._serialize_token(token)
+            data['tokens'].append(registro)
+            self._indexar_token(registro)
+            self._save(data, reindexar=False)
+
+    def agregar_muchos(self, tokens: List[TokenNFT]) -> None:
+        """Agrega varios tokens NFT con una sola escritura."""
+        if not all(isinstance(t, TokenNFT) for t in tokens):
+            raise ValueError("Todos los objetos deben ser instancias de TokenNFT.")
+        with self.transaccion():
+            data = self._load()
+            for token in tokens:
+                registro = self._serialize_token(token)
+                data['tokens'].append(registro)
+                self._indexar_token(registro)
+            self._save(data, reindexar=False)
 
     def obtener_por_id(self, token_id: UUID) -> Optional[TokenNFT]:
         """Recupera un token por su ID."""
         if not isinstance(token_id, UUID):
             raise ValueError("El token_id debe ser una instancia de UUID.")
-        data = self._load()
-        for t in data['tokens']:
-            if t['token_id'] == str(token_id):
-                return self._deserialize_token(t)
-        return None
-
-    def listar_por_usuario(self, usuario: str) -> List[TokenNFT]:
-        """Lista todos los tokens de un usuario."""
+        t = self._buscar(str(token_id))
+        return self._deserialize_token(t) if t else None
+
+    def listar_por_usuario(self, usuario: str, offset: int = 0,
+                           limit: Optional[int] = None) -> List[TokenNFT]:
+        """
+        Lista los tokens de un usuario en orden de llegada.
+
+        :param offset: número de tokens a saltar.
+        :param limit: máximo de tokens a devolver (None = todos).
+        """
         if not isinstance(usuario, str):
             raise ValueError("El usuario debe ser una cadena de texto.")
-        data = self._load()
-        tokens = [
-            self._deserialize_token(t) for t in data['tokens'] if t['propietario'] == usuario
-        ]
-        return tokens
+        with self._lock:
+            self._load()
+            registros = self._por_propietario.get(usuario, {}).values()
+            fin = offset + limit if limit is not None else None
+            pagina = list(islice(registros, offset, fin))
+        return [self._deserialize_token(t) for t in pagina]
+
+    def contar_por_usuario(self, usuario: str) -> int:
+        """Número de tokens de un usuario."""
+        with self._lock:
+            self._load()
+            return len(self._por_propietario.get(usuario, {}))
 
     def transferir(self, token_id: UUID, nuevo_propietario: str) -> None:
         """Transfiere la propiedad de un token."""
@@ -69,13 +82,52 @@ class NFTRepository:
             raise ValueError("El token_id debe ser una instancia de UUID.")
         if not isinstance(nuevo_propietario, str):
             raise ValueError("El nuevo propietario debe ser una cadena de texto.")
-        data = self._load()
-        for i, t in enumerate(data['tokens']):
-            if t['token_id'] == str(token_id):
-                data['tokens'][i]['propietario'] = nuevo_propietario
-                self._save(data)
-                return
-        raise KeyError(f"Token no encontrado: {token_id}")
+        with self.transaccion():
+            t = self._buscar(str(token_id))
+            if t is None:
+                raise KeyError(f"Token no encontrado: {token_id}")
+            self._desindexar_token(t)
+            t['propietario'] = nuevo_propietario
+            self._indexar_token(t)
+            self._save(self._cache, reindexar=False)
+
+    def transferir_muchos(self, transferencias: List[Tuple[UUID, str]]) -> None:
+        """
+        Transfiere varios tokens `(token_id, nuevo_propietario)` con una sola
+        escritura. Si algún token no existe no se aplica ninguna.
+        """
+        with self.transaccion():
+            registros = []
+            for token_id, nuevo_propietario in transferencias:
+                t = self._buscar(str(token_id))
+                if t is None:
+                    raise KeyError(f"Token no encontrado: {token_id}")
+                registros.append((t, nuevo_propietario))
+            for t, nuevo_propietario in registros:
+                self._desindexar_token(t)
+                t['propietario'] = nuevo_propietario
+                self._indexar_token(t)
+            self._save(self._cache, reindexar=False)
+
+    def _indexar(self, data: dict) -> None:
+        """Reconstruye los índices por token y por propietario."""
+        super()._indexar(data)
+        self._por_propietario = {}
+        for t in data.get(self.coleccion, []):
+            self._por_propietario.setdefault(t['propietario'], {})[t['token_id']] = t
+
+    def _indexar_token(self, registro: dict) -> None:
+        """Añade un token a los índices."""
+        self._indice[registro['token_id']] = registro
+        self._por_propietario.setdefault(registro['propietario'], {})[registro['token_id']] = registro
+
+    def _desindexar_token(self, registro: dict) -> None:
+        """Quita un token del índice de su propietario actual."""
+        tokens = self._por_propietario.get(registro['propietario'])
+        if tokens is not None:
+            tokens.pop(registro['token_id'], None)
+            if not tokens:
+                del self._por_propietario[registro['propietario']]
 
     def _serialize_token(self, token: TokenNFT) -> dict:
         """Convierte un TokenNFT a dict serializable."""
@@ -90,13 +142,12 @@ class NFTRepository:
     def _deserialize_token(self, data: dict) -> TokenNFT:
         """Convierte un dict a instancia TokenNFT."""
         try:
-            token = TokenNFT(
+            return TokenNFT.rehidratar(
+                token_id=UUID(data['token_id']),
                 encuesta_id=UUID(data['encuesta_id']),
                 opcion=data['opcion'],
-                propietario=data['propietario']
+                propietario=data['propietario'],
+                emitido_en=datetime.fromisoformat(data['emitido_en'])
             )
-            token.token_id = UUID(data['token_id'])
-            token.emitido_en = datetime.fromisoformat(data['emitido_en'])
-            return token
         except (KeyError, ValueError) as e:
             raise ValueError(f"Error al deserializar el token: {e}")
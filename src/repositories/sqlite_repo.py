@@ -0,0 +1,455 @@
+# src/repositories/sqlite_repo.py
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+from src.models.encuesta import Encuesta
+from src.models.token_nft import TokenNFT
+from src.models.usuario import Usuario
+from src.repositories.encuesta_repo import EncuestaRepository
+from src.repositories.json_repo import ConflictoDeVersion, iterar_json
+from src.repositories.nft_repo import NFTRepository
+from src.repositories.usuario_repo import UsuarioRepository, codificar_tokens, decodificar_tokens
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    nombre TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    salt TEXT NOT NULL DEFAULT '',
+    tokens BLOB NOT NULL DEFAULT X''
+);
+CREATE TABLE IF NOT EXISTS encuestas (
+    id TEXT PRIMARY KEY,
+    pregunta TEXT NOT NULL,
+    opciones TEXT NOT NULL,
+    duracion_segundos INTEGER NOT NULL,
+    tipo TEXT NOT NULL,
+    creado_en TEXT NOT NULL,
+    expira_en TEXT NOT NULL,
+    activa INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_encuestas_activas ON encuestas(activa, expira_en);
+CREATE TABLE IF NOT EXISTS votos (
+    id TEXT PRIMARY KEY,
+    encuesta_id TEXT NOT NULL REFERENCES encuestas(id),
+    usuario TEXT NOT NULL,
+    opcion TEXT NOT NULL,
+    realizado_en TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    unico INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_votos_encuesta ON votos(encuesta_id);
+CREATE TABLE IF NOT EXISTS tokens (
+    token_id TEXT PRIMARY KEY,
+    encuesta_id TEXT NOT NULL,
+    opcion TEXT NOT NULL,
+    propietario TEXT NOT NULL,
+    emitido_en TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tokens_propietario ON tokens(propietario);
+"""
+
+# Columnas añadidas después de la primera versión del esquema: (tabla, columna, definición)
+COLUMNAS_NUEVAS = [
+    ('encuestas', 'version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('votos', 'unico', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+# Se crean tras añadir COLUMNAS_NUEVAS. `unico` marca los votos de
+# encuestas simples: un solo voto por usuario y encuesta
+INDICES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_votos_usuario_unico ON votos(encuesta_id, usuario) WHERE unico = 1;
+"""
+
+
+class SQLiteDatabase:
+    """
+    Base de datos SQLite (modo WAL) compartida por los repositorios SQLite.
+
+    Usa una conexión por hilo; las escrituras se hacen dentro de
+    `transaccion()`, que abre `BEGIN IMMEDIATE` para serializar escritores
+    entre procesos sin perder actualizaciones.
+    """
+
+    def __init__(self, ruta: str = 'data/streamer_votes.db', timeout: float = 30.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.conexion.executescript(ESQUEMA)
+        self._actualizar_esquema()
+
+    @property
+    def conexion(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea la primera vez)."""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conn
+            self._local.profundidad = 0
+        return conn
+
+    def _actualizar_esquema(self) -> None:
+        """Añade a una base creada con un esquema anterior las columnas e índices que le faltan."""
+        conn = self.conexion
+        for tabla, columna, definicion in COLUMNAS_NUEVAS:
+            existentes = {f['name'] for f in conn.execute(f'PRAGMA table_info({tabla})')}
+            if columna not in existentes:
+                conn.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}')
+        conn.executescript(INDICES)
+
+    @contextmanager
+    def transaccion(self) -> Iterator[sqlite3.Connection]:
+        """
+        Ejecuta el bloque dentro de una transacción de escritura.
+
+        Las transacciones anidadas se unen a la exterior.
+        """
+        conn = self.conexion
+        if self._local.profundidad:
+            self._local.profundidad += 1
+            try:
+                yield conn
+            finally:
+                self._local.profundidad -= 1
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.profundidad = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+        finally:
+            self._local.profundidad = 0
+
+    def cerrar(self) -> None:
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None:
+            conn.close()
+            self._local.conexion = None
+
+
+class UsuarioSQLiteRepository(UsuarioRepository):
+    """
+    Repositorio de usuarios sobre SQLite.
+    """
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def transaccion(self):
+        """Transacción de escritura de la base (BEGIN IMMEDIATE)."""
+        return self.db.transaccion()
+
+    def agregar(self, usuario: Usuario) -> None:
+        """Agrega un nuevo usuario al repositorio."""
+        u = self._serialize_usuario(usuario)
+        with self.db.transaccion() as conn:
+            conn.execute(
+                'INSERT INTO usuarios (nombre, id, password_hash, salt, tokens) VALUES (?, ?, ?, ?, ?)',
+                (u['nombre'], u['id'], u['password_hash'], u['salt'], codificar_tokens(usuario.tokens))
+            )
+
+    def obtener_por_nombre(self, nombre: str) -> Optional[Usuario]:
+        """Recupera un usuario por su nombre."""
+        fila = self.db.conexion.execute(
+            'SELECT * FROM usuarios WHERE nombre = ?', (nombre,)
+        ).fetchone()
+        return self._fila_a_usuario(fila) if fila else None
+
+    def listar(self) -> List[Usuario]:
+        """Lista todos los usuarios registrados."""
+        filas = self.db.conexion.execute('SELECT * FROM usuarios ORDER BY rowid')
+        return [self._fila_a_usuario(f) for f in filas]
+
+    def actualizar(self, usuario: Usuario) -> None:
+        """Actualiza los datos de un usuario existente."""
+        u = self._serialize_usuario(usuario)
+        with self.db.transaccion() as conn:
+            cursor = conn.execute(
+                'UPDATE usuarios SET id = ?, password_hash = ?, salt = ?, tokens = ? WHERE nombre = ?',
+                (u['id'], u['password_hash'], u['salt'], codificar_tokens(usuario.tokens), u['nombre'])
+            )
+            if cursor.rowcount == 0:
+                raise KeyError(f"Usuario no encontrado: {usuario.nombre}")
+
+    def actualizar_muchos(self, usuarios: List[Usuario]) -> None:
+        """Actualiza varios usuarios existentes en una sola transacción."""
+        with self.db.transaccion():
+            for usuario in usuarios:
+                self.actualizar(usuario)
+
+    def _fila_a_usuario(self, fila: sqlite3.Row) -> Usuario:
+        """Convierte una fila de la tabla usuarios en Usuario."""
+        datos = dict(fila)
+        # BLOB de UUIDs concatenados; las bases antiguas guardan una lista JSON
+        if isinstance(datos['tokens'], str):
+            datos['tokens'] = json.loads(datos['tokens'])
+        return self._deserialize_usuario(datos)
+
+
+class EncuestaSQLiteRepository(EncuestaRepository):
+    """
+    Repositorio de encuestas y votos sobre SQLite.
+
+    Los votos viven en su propia tabla; `actualizar` solo inserta los votos
+    que este repositorio aún no ha persistido. Como en el backend JSON,
+    `actualizar` es un compare-and-swap sobre la columna `version`.
+    """
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self._lock = threading.Lock()
+        # encuesta_id -> ids de votos que ya sabemos persistidos
+        self._votos_persistidos: Dict[str, Set[str]] = {}
+
+    def transaccion(self):
+        """Transacción de escritura de la base (BEGIN IMMEDIATE)."""
+        return self.db.transaccion()
+
+    def agregar(self, encuesta: Encuesta) -> None:
+        """Agrega una nueva encuesta al repositorio."""
+        with self.db.transaccion() as conn:
+            conn.execute(
+                'INSERT INTO encuestas (id, pregunta, opciones, duracion_segundos, tipo, '
+                'creado_en, expira_en, activa) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                self._fila_encuesta(encuesta)
+            )
+            self._insertar_votos(conn, encuesta)
+
+    def obtener_por_id(self, encuesta_id: UUID) -> Optional[Encuesta]:
+        """Recupera una encuesta por su ID."""
+        conn = self.db.conexion
+        fila = conn.execute('SELECT * FROM encuestas WHERE id = ?', (str(encuesta_id),)).fetchone()
+        if fila is None:
+            return None
+        votos = conn.execute(
+            'SELECT * FROM votos WHERE encuesta_id = ? ORDER BY rowid', (str(encuesta_id),)
+        ).fetchall()
+        return self._filas_a_encuesta(fila, votos)
+
+    def listar(self, activas_solo: bool = False) -> List[Encuesta]:
+        """
+        Lista todas las encuestas, o solo las activas ordenadas por vencimiento
+        (resuelto con el índice idx_encuestas_activas).
+        """
+        conn = self.db.conexion
+        if activas_solo:
+            consulta = 'SELECT * FROM encuestas WHERE activa = 1 ORDER BY expira_en'
+        else:
+            consulta = 'SELECT * FROM encuestas ORDER BY rowid'
+        encuestas = []
+        for fila in conn.execute(consulta).fetchall():
+            votos = conn.execute(
+                'SELECT * FROM votos WHERE encuesta_id = ? ORDER BY rowid', (fila['id'],)
+            ).fetchall()
+            encuestas.append(self._filas_a_encuesta(fila, votos))
+        return encuestas
+
+    def actualizar(self, encuesta: Encuesta) -> None:
+        """
+        Actualiza una encuesta existente y persiste sus votos nuevos si su
+        versión en la base sigue siendo la leída, e incrementa la versión.
+
+        :raises ConflictoDeVersion: si otro escritor la guardó entre medias.
+        :raises ValueError: si un usuario ya tiene voto en una encuesta simple.
+        """
+        fila = self._fila_encuesta(encuesta)
+        with self.db.transaccion() as conn:
+            cursor = conn.execute(
+                'UPDATE encuestas SET pregunta = ?, opciones = ?, duracion_segundos = ?, tipo = ?, '
+                'creado_en = ?, expira_en = ?, activa = ?, version = version + 1 '
+                'WHERE id = ? AND version = ?',
+                fila[1:] + fila[:1] + (encuesta.version,)
+            )
+            if cursor.rowcount == 0:
+                if conn.execute('SELECT 1 FROM encuestas WHERE id = ?', fila[:1]).fetchone() is None:
+                    raise KeyError(f"Encuesta no encontrada: {encuesta.id}")
+                raise ConflictoDeVersion(f"La encuesta {encuesta.id} cambió desde la versión {encuesta.version}")
+            self._insertar_votos(conn, encuesta)
+        encuesta.version += 1
+
+    def _insertar_votos(self, conn: sqlite3.Connection, encuesta: Encuesta) -> None:
+        """Inserta los votos de la encuesta que no se sabe que estén persistidos."""
+        with self._lock:
+            conocidos = self._votos_persistidos.setdefault(str(encuesta.id), set())
+            nuevos = [v for v in self._listar_votos(encuesta) if str(v.id) not in conocidos]
+        unico = int(encuesta.tipo == 'simple')
+        try:
+            conn.executemany(
+                'INSERT INTO votos (id, encuesta_id, usuario, opcion, realizado_en, token_id, unico) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO NOTHING',
+                [(str(v.id), str(encuesta.id), v.usuario, v.opcion,
+                  v.realizado_en.isoformat(), str(v.token_id), unico) for v in nuevos]
+            )
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"El usuario ya votó: {e}")
+        with self._lock:
+            conocidos.update(str(v.id) for v in nuevos)
+
+    def _fila_encuesta(self, encuesta: Encuesta) -> tuple:
+        """Convierte una Encuesta en la tupla de columnas de la tabla encuestas."""
+        e = super()._serialize_encuesta(encuesta)
+        return (e['id'], e['pregunta'], json.dumps(e['opciones'], ensure_ascii=False),
+                e['duracion_segundos'], e['tipo'], e['creado_en'], e['expira_en'], int(e['activa']))
+
+    def _filas_a_encuesta(self, fila: sqlite3.Row, votos: List[sqlite3.Row]) -> Encuesta:
+        """Reconstruye una Encuesta con sus votos a partir de filas SQLite."""
+        datos = dict(fila)
+        datos['opciones'] = json.loads(datos['opciones'])
+        datos['activa'] = bool(datos['activa'])
+        datos['votos'] = [dict(v) for v in votos]
+        encuesta = self._deserialize_encuesta(datos)
+        with self._lock:
+            self._votos_persistidos[datos['id']] = {v['id'] for v in votos}
+        return encuesta
+
+
+class NFTSQLiteRepository(NFTRepository):
+    """
+    Repositorio de tokens NFT sobre SQLite, indexado por token y propietario.
+    """
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def transaccion(self):
+        """Transacción de escritura de la base (BEGIN IMMEDIATE)."""
+        return self.db.transaccion()
+
+    def agregar(self, token: TokenNFT) -> None:
+        """Agrega un nuevo token NFT al repositorio."""
+        if not isinstance(token, TokenNFT):
+            raise ValueError("El objeto proporcionado no es una instancia de TokenNFT.")
+        t = self._serialize_token(token)
+        with self.db.transaccion() as conn:
+            conn.execute(
+                'INSERT INTO tokens (token_id, encuesta_id, opcion, propietario, emitido_en) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (t['token_id'], t['encuesta_id'], t['opcion'], t['propietario'], t['emitido_en'])
+            )
+
+    def agregar_muchos(self, tokens: List[TokenNFT]) -> None:
+        """Agrega varios tokens NFT en una sola transacción."""
+        if not all(isinstance(t, TokenNFT) for t in tokens):
+            raise ValueError("Todos los objetos deben ser instancias de TokenNFT.")
+        filas = [self._serialize_token(t) for t in tokens]
+        with self.db.transaccion() as conn:
+            conn.executemany(
+                'INSERT INTO tokens (token_id, encuesta_id, opcion, propietario, emitido_en) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(t['token_id'], t['encuesta_id'], t['opcion'], t['propietario'], t['emitido_en'])
+                 for t in filas]
+            )
+
+    def obtener_por_id(self, token_id: UUID) -> Optional[TokenNFT]:
+        """Recupera un token por su ID."""
+        if not isinstance(token_id, UUID):
+            raise ValueError("El token_id debe ser una instancia de UUID.")
+        fila = self.db.conexion.execute(
+            'SELECT * FROM tokens WHERE token_id = ?', (str(token_id),)
+        ).fetchone()
+        return self._deserialize_token(dict(fila)) if fila else None
+
+    def listar_por_usuario(self, usuario: str, offset: int = 0,
+                           limit: Optional[int] = None) -> List[TokenNFT]:
+        """Lista una página de los tokens de un usuario en orden de llegada."""
+        if not isinstance(usuario, str):
+            raise ValueError("El usuario debe ser una cadena de texto.")
+        filas = self.db.conexion.execute(
+            'SELECT * FROM tokens WHERE propietario = ? ORDER BY rowid LIMIT ? OFFSET ?',
+            (usuario, -1 if limit is None else limit, offset)
+        )
+        return [self._deserialize_token(dict(f)) for f in filas]
+
+    def contar_por_usuario(self, usuario: str) -> int:
+        """Número de tokens de un usuario."""
+        return self.db.conexion.execute(
+            'SELECT COUNT(*) FROM tokens WHERE propietario = ?', (usuario,)
+        ).fetchone()[0]
+
+    def transferir(self, token_id: UUID, nuevo_propietario: str) -> None:
+        """Transfiere la propiedad de un token."""
+        if not isinstance(token_id, UUID):
+            raise ValueError("El token_id debe ser una instancia de UUID.")
+        if not isinstance(nuevo_propietario, str):
+            raise ValueError("El nuevo propietario debe ser una cadena de texto.")
+        with self.db.transaccion() as conn:
+            cursor = conn.execute(
+                'UPDATE tokens SET propietario = ? WHERE token_id = ?',
+                (nuevo_propietario, str(token_id))
+            )
+            if cursor.rowcount == 0:
+                raise KeyError(f"Token no encontrado: {token_id}")
+
+    def transferir_muchos(self, transferencias: List[Tuple[UUID, str]]) -> None:
+        """Transfiere varios tokens en una sola transacción."""
+        with self.db.transaccion():
+            for token_id, nuevo_propietario in transferencias:
+                self.transferir(token_id, nuevo_propietario)
+
+
+def migrar_json_a_sqlite(db: SQLiteDatabase, directorio: str = 'data') -> Dict[str, int]:
+    """
+    Copia los archivos `usuarios.json`, `encuestas.json` y `nfts.json` de
+    `directorio` a la base SQLite en una sola transacción. Los registros que
+    ya existen en la base se omiten, por lo que es seguro repetirla.
+
+    :return: número de registros leídos por tabla.
+    """
+    conteo = {'usuarios': 0, 'encuestas': 0, 'votos': 0, 'tokens': 0}
+
+    def leer(nombre: str, coleccion: str) -> Iterator[dict]:
+        ruta = os.path.join(directorio, nombre)
+        if not os.path.exists(ruta):
+            return iter(())
+        return iterar_json(ruta, coleccion)
+
+    with db.transaccion() as conn:
+        for u in leer('usuarios.json', 'usuarios'):
+            conn.execute(
+                'INSERT OR IGNORE INTO usuarios (nombre, id, password_hash, salt, tokens) VALUES (?, ?, ?, ?, ?)',
+                (u['nombre'], u['id'], u['password_hash'], u.get('salt', ''),
+                 codificar_tokens(decodificar_tokens(u.get('tokens'))))
+            )
+            conteo['usuarios'] += 1
+        for e in leer('encuestas.json', 'encuestas'):
+            conn.execute(
+                'INSERT OR IGNORE INTO encuestas (id, pregunta, opciones, duracion_segundos, tipo, '
+                'creado_en, expira_en, activa, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (e['id'], e['pregunta'], json.dumps(e['opciones'], ensure_ascii=False),
+                 e['duracion_segundos'], e.get('tipo', 'simple'), e['creado_en'],
+                 e['expira_en'], int(e['activa']), e.get('version', 0))
+            )
+            conteo['encuestas'] += 1
+            unico = int(e.get('tipo', 'simple') == 'simple')
+            for v in e.get('votos', []):
+                conn.execute(
+                    'INSERT OR IGNORE INTO votos (id, encuesta_id, usuario, opcion, realizado_en, token_id, unico) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (v['id'], e['id'], v['usuario'], v['opcion'], v['realizado_en'], v['token_id'], unico)
+                )
+                conteo['votos'] += 1
+        for t in leer('nfts.json', 'tokens'):
+            conn.execute(
+                'INSERT OR IGNORE INTO tokens (token_id, encuesta_id, opcion, propietario, emitido_en) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (t['token_id'], t['encuesta_id'], t['opcion'], t['propietario'], t['emitido_en'])
+            )
+            conteo['tokens'] += 1
+    return conteo
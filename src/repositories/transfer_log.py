@@ -0,0 +1,53 @@
+# src/repositories/transfer_log.py
+import json
+import os
+from typing import List, Tuple
+
+Transferencia = Tuple[str, str, str]
+
+
+class DiarioTransferencias:
+    """
+    Registro de intención para transferencias de tokens sobre archivos JSON.
+
+    Antes de reescribir `nfts.json` y `usuarios.json` se guarda el lote de
+    transferencias (token_id, origen, destino) con fsync. Si el proceso cae
+    entre ambas escrituras, el lote sigue en disco y `pendientes()` permite
+    volver a aplicarlo; aplicarlo de nuevo en orden es idempotente.
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+
+    def registrar(self, transferencias: List[Transferencia]) -> None:
+        """Persiste el lote de forma atómica (archivo temporal + os.replace)."""
+        tmp = self.ruta + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'transferencias': [list(t) for t in transferencias]}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.ruta)
+        except IOError as e:
+            raise RuntimeError(f"Error al registrar las transferencias: {e}")
+
+    def pendientes(self) -> List[Transferencia]:
+        """Devuelve el lote sin completar, o una lista vacía."""
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError:
+            # Solo puede estar truncado si se cayó antes de os.replace,
+            # es decir, antes de tocar ningún repositorio
+            return []
+        return [tuple(t) for t in data.get('transferencias', [])]
+
+    def completar(self) -> None:
+        """Marca el lote como aplicado."""
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
@@ -1,74 +1,101 @@
 # src/repositories/usuario_repo.py
-import json
-import os
-from typing import Optional, List  # Ensure 'Optional' and 'List' are imported for type hints
+import base64
+from typing import Iterable, Optional, List, Union  # Ensure 'Optional' and 'List' are imported for type hints
 from uuid import UUID
-from src.models.usuario import Usuario
+from src.models.usuario import ConjuntoTokens, Usuario
+from src.repositories.json_repo import JSONRepository
 # Removed unused import 'datetime'
 
-class UsuarioRepository:
+
+def codificar_tokens(tokens: Iterable[UUID]) -> bytes:
+    """Concatena los 16 bytes de cada UUID."""
+    return b''.join(t.bytes for t in tokens)
+
+
+def decodificar_tokens(valor: Union[bytes, str, list, None]) -> ConjuntoTokens:
     """
-    Repositorio para persistir usuarios en un archivo JSON.
+    Reconstruye los tokens de un usuario desde cualquiera de los formatos
+    guardados: bytes concatenados, esos bytes en base64 (JSON) o la lista
+    antigua de UUIDs en texto.
     """
-    def __init__(self, file_path: str = 'data/usuarios.json'):
-        self.file_path = file_path
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump({'usuarios': []}, f, ensure_ascii=False, indent=2)
+    if not valor:
+        return ConjuntoTokens()
+    if isinstance(valor, list):
+        return ConjuntoTokens(UUID(t) for t in valor)
+    if isinstance(valor, str):
+        valor = base64.b64decode(valor)
+    return ConjuntoTokens(UUID(bytes=valor[i:i + 16]) for i in range(0, len(valor), 16))
 
-    def _load(self) -> dict:
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+class UsuarioRepository(JSONRepository):
+    """
+    Repositorio para persistir usuarios en un archivo JSON.
+    """
+    coleccion = 'usuarios'
+    clave = 'nombre'
 
-    def _save(self, data: dict) -> None:
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def __init__(self, file_path: str = 'data/usuarios.json'):
+        super().__init__(file_path)
 
     def agregar(self, usuario: Usuario) -> None:
         """Agrega un nuevo usuario al repositorio."""
-        data = self._load()
-        data['usuarios'].append(self._serialize_usuario(usuario))
-        self._save(data)
+        with self.transaccion():
+            data = self._load()
+            data['usuarios'].append(self._serialize_usuario(usuario))
+            self._save(data)
 
     def obtener_por_nombre(self, nombre: str) -> Optional[Usuario]:
         """Recupera un usuario por su nombre."""
-        data = self._load()
-        for u in data['usuarios']:
-            if u['nombre'] == nombre:
-                return self._deserialize_usuario(u)
-        return None
+        u = self._buscar(nombre)
+        return self._deserialize_usuario(u) if u else None
 
     def listar(self) -> List[Usuario]:
         """Lista todos los usuarios registrados."""
-        data = self._load()
-        return [self._deserialize_usuario(u) for u in data['usuarios']]
+        with self._lock:
+            data = self._load()
+            return [self._deserialize_usuario(u) for u in data['usuarios']]
 
     def actualizar(self, usuario: Usuario) -> None:
         """Actualiza los datos de un usuario existente."""
-        data = self._load()
-        for i, u in enumerate(data['usuarios']):
-            if u['nombre'] == usuario.nombre:
-                data['usuarios'][i] = self._serialize_usuario(usuario)
-                self._save(data)
-                return
-        raise KeyError(f"Usuario no encontrado: {usuario.nombre}")
+        with self.transaccion():
+            u = self._buscar(usuario.nombre)
+            if u is None:
+                raise KeyError(f"Usuario no encontrado: {usuario.nombre}")
+            u.clear()
+            u.update(self._serialize_usuario(usuario))
+            self._save(self._cache)
+
+    def actualizar_muchos(self, usuarios: List[Usuario]) -> None:
+        """Actualiza varios usuarios existentes con una sola escritura."""
+        with self.transaccion():
+            registros = []
+            for usuario in usuarios:
+                u = self._buscar(usuario.nombre)
+                if u is None:
+                    raise KeyError(f"Usuario no encontrado: {usuario.nombre}")
+                registros.append((u, self._serialize_usuario(usuario)))
+            for u, nuevo in registros:
+                u.clear()
+                u.update(nuevo)
+            self._save(self._cache)
 
     def _serialize_usuario(self, usuario: Usuario) -> dict:
         """Convierte un Usuario a diccionario serializable."""
         return {
             'nombre': usuario.nombre,
             'password_hash': usuario.password_hash,
+            'salt': usuario.salt,
             'id': str(usuario.id),
-            'tokens': [str(t) for t in usuario.tokens]
+            # 16 bytes por token en base64 en lugar de 36 caracteres por UUID
+            'tokens': base64.b64encode(codificar_tokens(usuario.tokens)).decode('ascii')
         }
 
     def _deserialize_usuario(self, data: dict) -> Usuario:
         """Convierte un diccionario en instancia de Usuario."""
         usuario = Usuario(
             nombre=data['nombre'],
-            password_hash=data['password_hash']
+            password_hash=data['password_hash'],
+            salt=data.get('salt', '')
         )
         usuario.id = UUID(data['id'])
-        usuario.tokens = [UUID(t) for t in data.get('tokens', [])]
+        usuario.tokens = decodificar_tokens(data.get('tokens'))
         return usuario
\ No newline at end of file
@@ -1,20 +1,134 @@
 # src/services/chatbot_service.py
-from transformers import pipeline, Conversation
-from typing import Dict, List
+import re
+import threading
+from typing import Any, Dict, Optional
+from src.config import Config
+from src.patterns.observer import Observador
+from src.services.conversation_history import HistorialConversaciones
+from src.services.inference_worker import BatchInferenceWorker
 from src.services.poll_service import PollService
+from src.services.response_cache import CacheRespuestas
 from datetime import datetime
 
-class ChatbotService:
+MODELO_POR_DEFECTO = "facebook/blenderbot-400M-distill"
+
+# Pipelines cargados en este proceso (nombre de modelo -> pipeline)
+_modelos: Dict[str, Any] = {}
+_modelos_lock = threading.Lock()
+
+
+def _crear_pipeline(modelo: str) -> Any:
+    """
+    Importa transformers y construye el pipeline conversacional. Si el
+    tokenizador no tiene token de relleno se usa el de fin de secuencia,
+    necesario para inferir en lotes.
+    """
+    from transformers import pipeline
+    conversacional = pipeline("conversational", model=modelo)
+    tokenizador = getattr(conversacional, 'tokenizer', None)
+    if tokenizador is not None and tokenizador.pad_token is None and tokenizador.eos_token is not None:
+        tokenizador.pad_token = tokenizador.eos_token
+    return conversacional
+
+
+def obtener_modelo(modelo: str = MODELO_POR_DEFECTO) -> Any:
+    """
+    Devuelve el pipeline conversacional compartido por todo el proceso,
+    cargándolo la primera vez que se pide. Los hilos que lo pidan mientras
+    se carga esperan a esa misma carga.
+    """
+    with _modelos_lock:
+        if modelo not in _modelos:
+            _modelos[modelo] = _crear_pipeline(modelo)
+        return _modelos[modelo]
+
+
+class ChatbotService(Observador):
     """
     Servicio de chatbot que responde preguntas de los usuarios,
     integrando lógica de encuestas y modelo conversacional.
+
+    El modelo ('chatbot_model' en config) se carga de forma perezosa con el
+    primer mensaje que lo necesita; con 'chatbot_warmup' se precarga en un
+    hilo en segundo plano.
+
+    Con 'chatbot_max_batch' > 1 las respuestas del modelo se generan en
+    micro-lotes ('chatbot_max_wait_ms' de espera máxima) mediante un
+    BatchInferenceWorker.
+
+    El historial por usuario está acotado por 'chatbot_history_tokens',
+    'chatbot_history_users' (LRU) y 'chatbot_history_ttl' (segundos).
+
+    Las respuestas sobre encuestas se cachean 'chatbot_cache_ttl' segundos
+    por (intención, encuesta activa) y se invalidan con los eventos de
+    PollService. Con 'chatbot_prompt_cache_size' > 0, los mensajes generales
+    idénticos (normalizados) reutilizan la respuesta del modelo.
     """
-    def __init__(self):
-        # Inicializa pipeline de conversación
-        self.chatbot = pipeline("conversational", model="facebook/blenderbot-400M-distill")
-        self.poll_service = PollService()
-        # Historial de conversaciones por usuario
-        self.historial: Dict[str, List[Conversation]] = {}
+    def __init__(self, poll_service: Optional[PollService] = None, config: Optional[Config] = None):
+        config = config or Config()
+        self.modelo: str = config.obtener('chatbot_model', MODELO_POR_DEFECTO)
+        self.poll_service = poll_service or PollService(config=config)
+        # Historial acotado de conversaciones por usuario
+        self.historial = HistorialConversaciones(
+            max_tokens=config.obtener('chatbot_history_tokens', 512),
+            max_usuarios=config.obtener('chatbot_history_users', 1000),
+            ttl_segundos=config.obtener('chatbot_history_ttl', 1800)
+        )
+        self.worker: Optional[BatchInferenceWorker] = None
+        max_batch = config.obtener('chatbot_max_batch', 8)
+        if max_batch > 1:
+            self.worker = BatchInferenceWorker(
+                lambda: self.chatbot,
+                max_batch=max_batch,
+                max_espera_ms=config.obtener('chatbot_max_wait_ms', 10.0)
+            )
+        self.cache_encuestas = CacheRespuestas(ttl_segundos=config.obtener('chatbot_cache_ttl', 2.0))
+        self.cache_prompts: Optional[CacheRespuestas] = None
+        capacidad_prompts = config.obtener('chatbot_prompt_cache_size', 0)
+        if capacidad_prompts > 0:
+            self.cache_prompts = CacheRespuestas(
+                ttl_segundos=config.obtener('chatbot_prompt_cache_ttl', 300.0),
+                capacidad=capacidad_prompts
+            )
+        self.poll_service.agregar_observador(self)
+        if config.obtener('chatbot_warmup', False):
+            self.precalentar()
+
+    @property
+    def chatbot(self) -> Any:
+        """Pipeline conversacional compartido (se carga al primer uso)."""
+        return obtener_modelo(self.modelo)
+
+    def precalentar(self) -> threading.Thread:
+        """
+        Carga el modelo en un hilo en segundo plano.
+        """
+        hilo = threading.Thread(target=obtener_modelo, args=(self.modelo,),
+                                name="chatbot-warmup", daemon=True)
+        hilo.start()
+        return hilo
+
+    def actualizar(self, evento: str, datos: dict) -> None:
+        """
+        Invalida la caché de encuestas ante votos, cierres, prórrogas o nuevas
+        encuestas.
+        """
+        if evento == 'voto_emitido':
+            encuesta_id = datos.get('encuesta_id')
+            self.cache_encuestas.invalidar(lambda clave: clave[1] == encuesta_id)
+        elif evento in ('encuesta_cerrada', 'encuesta_creada', 'encuesta_prorrogada'):
+            self.cache_encuestas.invalidar()
+
+    @staticmethod
+    def _normalizar(texto: str) -> str:
+        """Normaliza un mensaje para usarlo como clave de caché."""
+        return re.sub(r"[\s¿?¡!.,]+", " ", texto.lower()).strip()
+
+    def metricas_inferencia(self) -> Dict[str, Any]:
+        """
+        Métricas del trabajador por lotes (vacío si el batching está desactivado).
+        """
+        return self.worker.metricas() if self.worker is not None else {}
 
     def ask(self, usuario: str, mensaje: str) -> str:
         """
@@ -28,38 +142,83 @@ class ChatbotService:
             return self._respuesta_encuestas(texto)
 
         # Lógica conversacional general
-        conv = Conversation(mensaje)
-        if usuario not in self.historial:
-            self.historial[usuario] = []
-        # Añadir contexto previo
-        for prev in self.historial[usuario]:
-            conv.add_user_input(prev.inputs[-1])
-            conv.append_response(prev.generated_responses[-1])
-        respuesta = self.chatbot(conv)
+        clave_prompt = self._normalizar(mensaje)
+        if self.cache_prompts is not None:
+            cacheada = self.cache_prompts.obtener(clave_prompt)
+            if cacheada is not None:
+                self.historial.agregar(usuario, mensaje, cacheada)
+                return cacheada
+
+        from transformers import Conversation
+        conv = Conversation()
+        # Añadir contexto previo (solo los turnos que caben en el presupuesto)
+        for entrada, salida in self.historial.turnos(usuario):
+            conv.add_user_input(entrada)
+            conv.mark_processed()
+            conv.append_response(salida)
+        conv.add_user_input(mensaje)
+        if self.worker is not None:
+            respuesta = self.worker.enviar(conv).result()
+        else:
+            respuesta = self.chatbot(conv)
+        texto_respuesta = respuesta.generated_responses[-1]
         # Guardar en historial
-        self.historial[usuario].append(conv)
-        return respuesta.generated_responses[-1]
+        self.historial.agregar(usuario, mensaje, texto_respuesta)
+        if self.cache_prompts is not None:
+            self.cache_prompts.guardar(clave_prompt, texto_respuesta)
+        return texto_respuesta
+
+    def estadisticas_historial(self) -> Dict[str, int]:
+        """
+        Tamaño residente del historial de conversaciones.
+        """
+        return self.historial.estadisticas()
 
     def _respuesta_encuestas(self, texto: str) -> str:
         """
         Procesa preguntas relacionadas con encuestas y devuelve la respuesta.
+
+        Usa la caché por (intención, encuesta activa) cuando está vigente.
         """
-        # Obtener la encuesta activa más reciente
-        encuestas = self.poll_service.list_polls(active_only=True)
-        if not encuestas:
-            return "No hay encuestas activas en este momento."
-        
-        poll = encuestas[0]
-        resultados = self.poll_service.get_partial_results(poll.id)
-        
         if "quién va ganando" in texto or "quien va ganando" in texto:
+            intencion = 'ganando'
+        elif "cuánto falta" in texto or "cuanto falta" in texto:
+            intencion = 'falta'
+        else:
+            intencion = None
+
+        # Obtener la encuesta activa más reciente
+        poll = self.cache_encuestas.obtener(('activa', None))
+        if poll is None:
+            encuestas = self.poll_service.list_polls(active_only=True)
+            if not encuestas:
+                return "No hay encuestas activas en este momento."
+            poll = encuestas[0]
+            self.cache_encuestas.guardar(('activa', None), poll)
+
+        if intencion == 'falta':
+            # Depende del reloj: se recalcula siempre sobre la encuesta cacheada
+            return self._responder_intencion(intencion, poll)
+        clave = (intencion, str(poll.id))
+        respuesta = self.cache_encuestas.obtener(clave)
+        if respuesta is None:
+            respuesta = self._responder_intencion(intencion, poll)
+            self.cache_encuestas.guardar(clave, respuesta)
+        return respuesta
+
+    def _responder_intencion(self, intencion: Optional[str], poll: Any) -> str:
+        """
+        Calcula la respuesta a una intención sobre la encuesta activa.
+        """
+        if intencion == 'ganando':
+            resultados = self.poll_service.get_partial_results(poll.id)
             # Determinar la opción con más votos
             if not resultados:
                 return "Aún no hay votos registrados en la encuesta."
             ganador = max(resultados, key=resultados.get)
             return f"La opción que va ganando es '{ganador}' con {resultados[ganador]} voto(s)."
-        
-        if "cuánto falta" in texto or "cuanto falta" in texto:
+
+        if intencion == 'falta':
             ahora = self.poll_service.now()
             if poll.expira_en <= ahora:
                 return "La encuesta ya ha cerrado."
@@ -67,7 +226,6 @@ class ChatbotService:
             minutos = int(faltan // 60)
             segundos = int(faltan % 60)
             return f"Faltan {minutos} minuto(s) y {segundos} segundo(s) para que cierre la encuesta."
-        
+
         # Fallback
         return "No entendí tu pregunta sobre las encuestas."
-
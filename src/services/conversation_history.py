@@ -0,0 +1,114 @@
+# src/services/conversation_history.py
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+Turno = Tuple[str, str]
+
+
+def contar_palabras(texto: str) -> int:
+    """Estimación barata de tokens: número de palabras separadas por espacios."""
+    return len(texto.split())
+
+
+class HistorialConversaciones:
+    """
+    Historial acotado de conversaciones por usuario.
+
+    - Cada usuario conserva solo los turnos (entrada, respuesta) más recientes
+      que caben en `max_tokens`.
+    - Como mucho se guardan `max_usuarios` usuarios; al superarlo se desaloja
+      el usado hace más tiempo (LRU).
+    - Los usuarios sin actividad durante `ttl_segundos` se eliminan.
+    """
+
+    def __init__(self, max_tokens: int = 512, max_usuarios: int = 1000,
+                 ttl_segundos: float = 1800.0,
+                 contar_tokens: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.max_usuarios = max_usuarios
+        self.ttl_segundos = ttl_segundos
+        self.contar_tokens = contar_tokens or contar_palabras
+        self._lock = threading.Lock()
+        # usuario -> [turnos, tokens totales, último acceso]; orden = LRU
+        self._usuarios: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._tokens_totales = 0
+        self._desalojados_lru = 0
+        self._desalojados_ttl = 0
+        self._turnos_truncados = 0
+
+    def turnos(self, usuario: str) -> List[Turno]:
+        """Devuelve los turnos vigentes del usuario, del más antiguo al más reciente."""
+        with self._lock:
+            self._purgar_inactivos(time.monotonic())
+            entrada = self._usuarios.get(usuario)
+            if entrada is None:
+                return []
+            self._usuarios.move_to_end(usuario)
+            entrada[2] = time.monotonic()
+            return [turno for turno, _ in entrada[0]]
+
+    def agregar(self, usuario: str, mensaje: str, respuesta: str) -> None:
+        """Añade un turno y aplica los límites de tokens, usuarios e inactividad."""
+        tokens = self.contar_tokens(mensaje) + self.contar_tokens(respuesta)
+        with self._lock:
+            ahora = time.monotonic()
+            self._purgar_inactivos(ahora)
+            entrada = self._usuarios.get(usuario)
+            if entrada is None:
+                entrada = [deque(), 0, ahora]
+                self._usuarios[usuario] = entrada
+            self._usuarios.move_to_end(usuario)
+            turnos: Deque[Tuple[Turno, int]] = entrada[0]
+            turnos.append(((mensaje, respuesta), tokens))
+            entrada[1] += tokens
+            entrada[2] = ahora
+            self._tokens_totales += tokens
+            while entrada[1] > self.max_tokens and turnos:
+                _, descartados = turnos.popleft()
+                entrada[1] -= descartados
+                self._tokens_totales -= descartados
+                self._turnos_truncados += 1
+            while len(self._usuarios) > self.max_usuarios:
+                self._eliminar(next(iter(self._usuarios)))
+                self._desalojados_lru += 1
+
+    def olvidar(self, usuario: str) -> None:
+        """Elimina el historial de un usuario."""
+        with self._lock:
+            if usuario in self._usuarios:
+                self._eliminar(usuario)
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Tamaño residente del historial y contadores de desalojo."""
+        with self._lock:
+            return {
+                'usuarios': len(self._usuarios),
+                'turnos': sum(len(e[0]) for e in self._usuarios.values()),
+                'tokens': self._tokens_totales,
+                'desalojados_lru': self._desalojados_lru,
+                'desalojados_ttl': self._desalojados_ttl,
+                'turnos_truncados': self._turnos_truncados,
+            }
+
+    def __contains__(self, usuario: str) -> bool:
+        with self._lock:
+            return usuario in self._usuarios
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._usuarios)
+
+    def _eliminar(self, usuario: str) -> None:
+        entrada = self._usuarios.pop(usuario)
+        self._tokens_totales -= entrada[1]
+
+    def _purgar_inactivos(self, ahora: float) -> None:
+        """Elimina usuarios inactivos; el orden LRU permite parar en el primero vigente."""
+        while self._usuarios:
+            usuario, entrada = next(iter(self._usuarios.items()))
+            if ahora - entrada[2] < self.ttl_segundos:
+                break
+            self._eliminar(usuario)
+            self._desalojados_ttl += 1
@@ -0,0 +1,129 @@
+# src/services/expiry_scheduler.py
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from src.patterns.observer import Observador
+from src.services.poll_service import PollService
+
+logger = logging.getLogger(__name__)
+
+
+class PlanificadorExpiracion(Observador):
+    """
+    Cierra las encuestas al vencer su plazo, en un hilo en segundo plano.
+
+    Los plazos se guardan en un montículo ordenado por `expira_en`; el hilo
+    duerme hasta el siguiente vencimiento (o hasta que se programa uno
+    anterior) en lugar de consultar periódicamente. El cierre en sí lo hace
+    `PollService.expire_poll`, que persiste el cambio, aplica la estrategia
+    de desempate y emite 'encuesta_cerrada'.
+
+    Las encuestas creadas en este proceso llegan por 'encuesta_creada'; las
+    creadas por otros (CLI, demonio, otro worker) se recogen releyendo el
+    índice de activas del repositorio al iniciar y cada `intervalo_repaso`
+    segundos.
+    """
+
+    def __init__(self, poll_service: PollService, intervalo_repaso: float = 30.0):
+        self.poll_service = poll_service
+        self.intervalo_repaso = timedelta(seconds=intervalo_repaso)
+        self._cond = threading.Condition()
+        # (expira_en, encuesta_id); puede haber entradas obsoletas, que
+        # expire_poll ignora al comprobar el estado real de la encuesta
+        self._monticulo: List[Tuple[datetime, str]] = []
+        # encuesta_id -> último plazo programado, para no duplicar entradas al repasar
+        self._programadas: Dict[str, datetime] = {}
+        self._proximo_repaso = datetime.min
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+        poll_service.agregar_observador(self)
+
+    def iniciar(self) -> None:
+        """Programa las encuestas activas del repositorio y arranca el hilo."""
+        self._repasar()
+        with self._cond:
+            if self._hilo is not None:
+                return
+            self._detenido = False
+            self._hilo = threading.Thread(target=self._bucle, name="poll-expiry", daemon=True)
+            self._hilo.start()
+
+    def detener(self) -> None:
+        """Termina el hilo planificador."""
+        with self._cond:
+            hilo, self._hilo = self._hilo, None
+            self._detenido = True
+            self._cond.notify_all()
+        if hilo is not None:
+            hilo.join()
+
+    def programar(self, poll_id: UUID, expira_en: datetime) -> None:
+        """Añade un plazo; despierta al hilo si pasa a ser el más próximo."""
+        clave = str(poll_id)
+        with self._cond:
+            if self._programadas.get(clave) == expira_en:
+                return
+            self._programadas[clave] = expira_en
+            heapq.heappush(self._monticulo, (expira_en, clave))
+            if self._monticulo[0][1] == clave:
+                self._cond.notify_all()
+
+    def pendientes(self) -> int:
+        """Número de plazos programados (incluidas entradas obsoletas)."""
+        with self._cond:
+            return len(self._monticulo)
+
+    def actualizar(self, evento: str, datos: dict) -> None:
+        """Programa las encuestas recién creadas."""
+        if evento != 'encuesta_creada':
+            return
+        encuesta = self.poll_service.repo.obtener_por_id(UUID(datos['encuesta_id']))
+        if encuesta is not None and encuesta.activa:
+            self.programar(encuesta.id, encuesta.expira_en)
+
+    def _repasar(self) -> None:
+        """Programa las encuestas activas del repositorio que aún no lo estén."""
+        try:
+            activas = self.poll_service.list_polls(active_only=True)
+        except Exception:
+            logger.exception("Error al releer las encuestas activas")
+            activas = []
+        for encuesta in activas:
+            self.programar(encuesta.id, encuesta.expira_en)
+        with self._cond:
+            self._proximo_repaso = self.poll_service.now() + self.intervalo_repaso
+
+    def _bucle(self) -> None:
+        """Espera al siguiente vencimiento (o repaso) y cierra las encuestas vencidas."""
+        while True:
+            with self._cond:
+                while not self._detenido:
+                    ahora = self.poll_service.now()
+                    if self._monticulo and self._monticulo[0][0] <= ahora:
+                        break
+                    if self._proximo_repaso <= ahora:
+                        break
+                    limite = min(self._monticulo[0][0], self._proximo_repaso) if self._monticulo \
+                        else self._proximo_repaso
+                    self._cond.wait((limite - ahora).total_seconds())
+                if self._detenido:
+                    return
+                vencida = bool(self._monticulo) and self._monticulo[0][0] <= self.poll_service.now()
+                if vencida:
+                    expira_en, encuesta_id = heapq.heappop(self._monticulo)
+                    if self._programadas.get(encuesta_id) == expira_en:
+                        del self._programadas[encuesta_id]
+            if not vencida:
+                self._repasar()
+                continue
+            # Fuera del lock: el cierre persiste y notifica a los observadores
+            try:
+                nuevo_plazo = self.poll_service.expire_poll(UUID(encuesta_id))
+            except Exception:
+                logger.exception("Error al cerrar la encuesta %s", encuesta_id)
+                continue
+            if nuevo_plazo is not None:
+                self.programar(UUID(encuesta_id), nuevo_plazo)
@@ -0,0 +1,130 @@
+# src/services/inference_worker.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class BatchInferenceWorker:
+    """
+    Trabajador de inferencia por micro-lotes.
+
+    Acumula las peticiones concurrentes durante como mucho `max_espera_ms`
+    milisegundos (o hasta reunir `max_batch`), ejecuta una sola llamada al
+    pipeline con todo el lote (`batch_size=len(lote)`) y entrega a cada llamador su respuesta a
+    través de un Future.
+    """
+
+    def __init__(self, obtener_pipeline: Callable[[], Any],
+                 max_batch: int = 8, max_espera_ms: float = 10.0):
+        if max_batch < 1:
+            raise ValueError("max_batch debe ser al menos 1.")
+        self.obtener_pipeline = obtener_pipeline
+        self.max_batch = max_batch
+        self.max_espera = max_espera_ms / 1000.0
+        self._cola: "queue.Queue[Optional[Tuple[Any, Future, float]]]" = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Métricas
+        self._lotes = 0
+        self._peticiones = 0
+        self._tamanos: Dict[int, int] = {}
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def enviar(self, entrada: Any) -> Future:
+        """
+        Encola una entrada para el siguiente lote.
+
+        :return: Future que se resuelve con la salida del pipeline para esa entrada.
+        """
+        futuro: Future = Future()
+        self._iniciar()
+        self._cola.put((entrada, futuro, time.monotonic()))
+        return futuro
+
+    def detener(self) -> None:
+        """Termina el hilo trabajador tras procesar lo ya encolado."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._cola.put(None)
+            hilo.join()
+
+    def metricas(self) -> Dict[str, Any]:
+        """
+        Devuelve métricas de tamaño de lote y latencia en cola.
+        """
+        with self._lock:
+            return {
+                'lotes': self._lotes,
+                'peticiones': self._peticiones,
+                'tamano_medio_lote': self._peticiones / self._lotes if self._lotes else 0.0,
+                'histograma_lotes': dict(self._tamanos),
+                'espera_media_ms': 1000.0 * self._espera_total / self._peticiones if self._peticiones else 0.0,
+                'espera_max_ms': 1000.0 * self._espera_max,
+                'en_cola': self._cola.qsize(),
+            }
+
+    def _iniciar(self) -> None:
+        """Arranca el hilo trabajador la primera vez que se necesita."""
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="chatbot-batcher", daemon=True)
+                self._hilo.start()
+
+    def _recoger_lote(self, primero: Tuple[Any, Future, float]) -> Tuple[List[Tuple[Any, Future, float]], bool]:
+        """
+        Completa un lote a partir de su primera petición.
+
+        :return: (lote, detener) donde `detener` indica que se pidió terminar.
+        """
+        lote = [primero]
+        limite = time.monotonic() + self.max_espera
+        while len(lote) < self.max_batch:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self._cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                return lote, True
+            lote.append(item)
+        return lote, False
+
+    def _bucle(self) -> None:
+        """Bucle del hilo trabajador."""
+        detener = False
+        while not detener:
+            primero = self._cola.get()
+            if primero is None:
+                return
+            lote, detener = self._recoger_lote(primero)
+            self._procesar(lote)
+
+    def _procesar(self, lote: List[Tuple[Any, Future, float]]) -> None:
+        """Ejecuta un lote en una sola llamada al pipeline y reparte los resultados."""
+        inicio = time.monotonic()
+        with self._lock:
+            self._lotes += 1
+            self._peticiones += len(lote)
+            self._tamanos[len(lote)] = self._tamanos.get(len(lote), 0) + 1
+            for _, _, encolado in lote:
+                espera = inicio - encolado
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+        try:
+            # Sin batch_size el pipeline recorre la lista de uno en uno
+            salidas = self.obtener_pipeline()([entrada for entrada, _, _ in lote], batch_size=len(lote))
+            if not isinstance(salidas, list):
+                # Los pipelines devuelven un objeto suelto para listas de un elemento
+                salidas = [salidas]
+        except Exception as e:
+            for _, futuro, _ in lote:
+                futuro.set_exception(e)
+            return
+        for (_, futuro, _), salida in zip(lote, salidas):
+            futuro.set_result(salida)
@@ -0,0 +1,176 @@
+# src/services/live_results.py
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set, Tuple
+from uuid import UUID
+from src.patterns.observer import Observador
+from src.services.poll_service import PollService
+
+
+class LiveResultsService(Observador):
+    """
+    Mantiene en memoria los conteos de las encuestas que se están mirando y
+    los actualiza con los eventos de PollService, sin releer el repositorio.
+
+    Los consumidores esperan cambios con `esperar_cambio` o reciben un flujo
+    de resultados con `transmitir`; la UI usa `transmitir_async`, que espera
+    en el event loop sin ocupar un hilo por cada espectador.
+
+    Una encuesta se olvida (`dejar_de_seguir`) cuando se va su último
+    suscriptor, o al cerrarse si nadie la está mirando.
+    """
+
+    def __init__(self, poll_service: PollService):
+        self.poll_service = poll_service
+        self._cond = threading.Condition()
+        # encuesta_id -> conteo por opción
+        self._conteos: Dict[str, Dict[str, int]] = {}
+        self._cerradas: set = set()
+        # Versión por encuesta; aumenta con cada cambio
+        self._versiones: Dict[str, int] = {}
+        # encuesta_id -> (loop, asyncio.Event) de cada flujo async abierto
+        self._avisos: Dict[str, Set[Tuple[Any, Any]]] = {}
+        # encuesta_id -> flujos y esperas en curso
+        self._suscriptores: Dict[str, int] = {}
+        poll_service.agregar_observador(self)
+
+    def actualizar(self, evento: str, datos: dict) -> None:
+        """Aplica un evento de PollService a los conteos seguidos."""
+        encuesta_id = datos.get('encuesta_id')
+        with self._cond:
+            if encuesta_id not in self._conteos:
+                return
+            if evento == 'voto_emitido':
+                conteo = self._conteos[encuesta_id]
+                # 'delta' agrupa varios votos cuando el despacho es asíncrono
+                for opcion, votos in (datos.get('delta') or {datos['opcion']: 1}).items():
+                    conteo[opcion] = conteo.get(opcion, 0) + votos
+            elif evento == 'encuesta_cerrada':
+                self._cerradas.add(encuesta_id)
+            else:
+                return
+            self._versiones[encuesta_id] += 1
+            self._cond.notify_all()
+            avisos = list(self._avisos.get(encuesta_id, ()))
+            if evento == 'encuesta_cerrada' and not self._suscriptores.get(encuesta_id):
+                self.dejar_de_seguir(encuesta_id)
+        for loop, aviso in avisos:
+            try:
+                loop.call_soon_threadsafe(aviso.set)
+            except RuntimeError:
+                # El loop de ese espectador ya se cerró
+                pass
+
+    def resultados(self, poll_id: UUID) -> Tuple[Dict[str, int], int, bool]:
+        """
+        Devuelve (conteo, versión, cerrada) de la encuesta, cargándola del
+        repositorio solo la primera vez que se sigue.
+        """
+        clave = str(poll_id)
+        with self._cond:
+            if clave not in self._conteos:
+                encuesta = self.poll_service.repo.obtener_por_id(
+                    poll_id if isinstance(poll_id, UUID) else UUID(clave))
+                if encuesta is None:
+                    raise ValueError(f"Encuesta no encontrada: {poll_id}")
+                self._conteos[clave] = encuesta.obtener_resultados()
+                self._versiones[clave] = 0
+                if not encuesta.activa:
+                    self._cerradas.add(clave)
+            return dict(self._conteos[clave]), self._versiones[clave], clave in self._cerradas
+
+    def _suscribir(self, poll_id: UUID) -> str:
+        """Empieza a seguir la encuesta y cuenta un suscriptor más."""
+        clave = str(poll_id)
+        with self._cond:
+            self.resultados(poll_id)
+            self._suscriptores[clave] = self._suscriptores.get(clave, 0) + 1
+        return clave
+
+    def _desuscribir(self, clave: str) -> None:
+        """Descuenta un suscriptor y olvida la encuesta si era el último."""
+        with self._cond:
+            restantes = self._suscriptores.get(clave, 0) - 1
+            if restantes > 0:
+                self._suscriptores[clave] = restantes
+            else:
+                self.dejar_de_seguir(clave)
+
+    def esperar_cambio(self, poll_id: UUID, version: int,
+                       timeout: Optional[float] = None) -> Tuple[Dict[str, int], int, bool]:
+        """
+        Bloquea hasta que la encuesta supere `version` (o venza `timeout`) y
+        devuelve el estado actual.
+        """
+        clave = self._suscribir(poll_id)
+        try:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._versiones[clave] > version or clave in self._cerradas,
+                    timeout=timeout
+                )
+                return dict(self._conteos[clave]), self._versiones[clave], clave in self._cerradas
+        finally:
+            self._desuscribir(clave)
+
+    def transmitir(self, poll_id: UUID, timeout: Optional[float] = None) -> Iterator[Tuple[Dict[str, int], bool]]:
+        """
+        Genera (conteo, cerrada) al inicio y tras cada cambio, hasta que la
+        encuesta se cierra o no hay cambios durante `timeout` segundos.
+        """
+        clave = self._suscribir(poll_id)
+        try:
+            conteo, version, cerrada = self.resultados(poll_id)
+            yield conteo, cerrada
+            while not cerrada:
+                conteo, nueva, cerrada = self.esperar_cambio(poll_id, version, timeout)
+                if nueva == version and not cerrada:
+                    return
+                version = nueva
+                yield conteo, cerrada
+        finally:
+            self._desuscribir(clave)
+
+    async def transmitir_async(self, poll_id: UUID,
+                               latido: Optional[float] = None) -> AsyncIterator[Tuple[Dict[str, int], bool]]:
+        """
+        Variante asíncrona de transmitir: cada cambio despierta al flujo a
+        través de un asyncio.Event, así que esperar no ocupa ningún hilo.
+
+        El flujo dura hasta que la encuesta se cierra o el consumidor lo
+        abandona (p. ej. se desconecta el cliente). Con `latido`, si pasan
+        esos segundos sin cambios se repite el último estado, lo que permite
+        detectar antes una conexión caída.
+        """
+        import asyncio
+        # La primera vez se lee el repositorio: fuera del event loop
+        clave = await asyncio.to_thread(self._suscribir, poll_id)
+        suscripcion = (asyncio.get_running_loop(), asyncio.Event())
+        try:
+            with self._cond:
+                self._avisos.setdefault(clave, set()).add(suscripcion)
+                conteo, cerrada = dict(self._conteos[clave]), clave in self._cerradas
+            yield conteo, cerrada
+            while not cerrada:
+                try:
+                    await asyncio.wait_for(suscripcion[1].wait(), latido)
+                except asyncio.TimeoutError:
+                    yield conteo, cerrada
+                    continue
+                suscripcion[1].clear()
+                with self._cond:
+                    conteo, cerrada = dict(self._conteos[clave]), clave in self._cerradas
+                yield conteo, cerrada
+        finally:
+            with self._cond:
+                self._avisos.get(clave, set()).discard(suscripcion)
+                self._desuscribir(clave)
+
+    def dejar_de_seguir(self, poll_id: UUID) -> None:
+        """Olvida los conteos de una encuesta."""
+        clave = str(poll_id)
+        with self._cond:
+            self._conteos.pop(clave, None)
+            self._versiones.pop(clave, None)
+            self._cerradas.discard(clave)
+            self._suscriptores.pop(clave, None)
+            self._avisos.pop(clave, None)
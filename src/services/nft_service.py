@@ -1,17 +1,37 @@
 # src/services/nft_service.py
-from typing import List, Optional
+import os
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from src.models.token_nft import TokenNFT
+from src.models.usuario import Usuario
+from src.models.voto import Voto
+from src.config import Config
+from src.patterns.factory import RepositoryFactory
 from src.repositories.nft_repo import NFTRepository
+from src.repositories.transfer_log import DiarioTransferencias
 from src.repositories.usuario_repo import UsuarioRepository
 
 class NFTService:
     """
     Servicio para generar, listar y transferir tokens NFT simulados.
+
+    Las transferencias se confirman de forma atómica: con el backend SQLite
+    en una sola transacción; con archivos JSON, registrando antes el lote en
+    un DiarioTransferencias que se vuelve a aplicar si el proceso cayó a
+    mitad, al arrancar y antes de cada nuevo lote.
     """
-    def __init__(self):
-        self.nft_repo = NFTRepository()
-        self.usuario_repo = UsuarioRepository()
+    def __init__(self, config: Optional[Config] = None,
+                 nft_repo: Optional[NFTRepository] = None,
+                 usuario_repo: Optional[UsuarioRepository] = None):
+        fabrica = RepositoryFactory(config)
+        self.nft_repo = nft_repo or fabrica.nfts()
+        self.usuario_repo = usuario_repo or fabrica.usuarios()
+        self._db = fabrica.sqlite_db() if fabrica.backend == 'sqlite' else None
+        self.diario: Optional[DiarioTransferencias] = None
+        if self._db is None:
+            self.diario = DiarioTransferencias(
+                os.path.join(fabrica.data_dir, 'transferencias.pendientes.json'))
+            self._recuperar_transferencias()
 
     def mint_token(self, encuesta_id: UUID, opcion: str, propietario: str) -> TokenNFT:
         """
@@ -23,28 +43,65 @@ class NFTService:
         :return: instancia de TokenNFT creada.
         :raises ValueError: si el usuario no existe.
         """
-        # Verificar que el usuario existe
-        usuario = self.usuario_repo.obtener_por_nombre(propietario)
-        if usuario is None:
-            raise ValueError(f"Usuario no encontrado: {propietario}")
-        
-        # Crear token
-        token = TokenNFT(encuesta_id=encuesta_id, opcion=opcion, propietario=propietario)
-        
-        # Persistir token
-        self.nft_repo.agregar(token)
-        
-        # Asociar token al usuario
-        usuario.tokens.append(token.token_id)
-        self.usuario_repo.actualizar(usuario)
+        # El usuario se relee y se guarda sin que otro escritor se intercale
+        with self.usuario_repo.transaccion():
+            # Verificar que el usuario existe
+            usuario = self.usuario_repo.obtener_por_nombre(propietario)
+            if usuario is None:
+                raise ValueError(f"Usuario no encontrado: {propietario}")
+
+            # Crear token
+            token = TokenNFT(encuesta_id=encuesta_id, opcion=opcion, propietario=propietario)
+
+            # Persistir token
+            self.nft_repo.agregar(token)
+
+            # Asociar token al usuario
+            usuario.tokens.add(token.token_id)
+            self.usuario_repo.actualizar(usuario)
         
         return token
 
-    def list_tokens(self, propietario: str) -> List[TokenNFT]:
+    def mint_many(self, encuesta_id: UUID, votos: List[Voto]) -> List[TokenNFT]:
         """
-        Recupera todos los tokens de un usuario.
+        Genera los tokens de un lote de votos con una escritura por repositorio.
+
+        Cada token reutiliza el `token_id` de su voto, de modo que la encuesta
+        puede persistirse antes que los tokens.
+
+        :param encuesta_id: ID de la encuesta votada.
+        :param votos: votos ya aceptados por la encuesta.
+        :return: lista de TokenNFT creados, en el mismo orden que los votos.
+        :raises ValueError: si algún usuario no existe.
+        """
+        with self.usuario_repo.transaccion():
+            usuarios: Dict[str, Usuario] = {}
+            for voto in votos:
+                if voto.usuario not in usuarios:
+                    usuario = self.usuario_repo.obtener_por_nombre(voto.usuario)
+                    if usuario is None:
+                        raise ValueError(f"Usuario no encontrado: {voto.usuario}")
+                    usuarios[voto.usuario] = usuario
+
+            tokens = []
+            for voto in votos:
+                token = TokenNFT(encuesta_id=encuesta_id, opcion=voto.opcion, propietario=voto.usuario)
+                token.token_id = voto.token_id
+                tokens.append(token)
+                usuarios[voto.usuario].tokens.add(token.token_id)
+
+            self.nft_repo.agregar_muchos(tokens)
+            self.usuario_repo.actualizar_muchos(list(usuarios.values()))
+        return tokens
+
+    def list_tokens(self, propietario: str, offset: int = 0,
+                    limit: Optional[int] = None) -> List[TokenNFT]:
+        """
+        Recupera los tokens de un usuario, opcionalmente paginados.
 
         :param propietario: nombre de usuario.
+        :param offset: número de tokens a saltar.
+        :param limit: máximo de tokens a devolver (None = todos).
         :return: lista de TokenNFT.
         :raises ValueError: si el usuario no existe.
         """
@@ -53,7 +110,16 @@ class NFTService:
         if usuario is None:
             raise ValueError(f"Usuario no encontrado: {propietario}")
         
-        return self.nft_repo.listar_por_usuario(propietario)
+        return self.nft_repo.listar_por_usuario(propietario, offset=offset, limit=limit)
+
+    async def list_tokens_async(self, propietario: str, offset: int = 0,
+                                limit: Optional[int] = None) -> List[TokenNFT]:
+        """
+        Variante asíncrona de list_tokens: la lectura se hace en un hilo del
+        executor del event loop.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.list_tokens, propietario, offset, limit)
 
     def transfer_token(self, token_id: UUID, current_owner: str, new_owner: str) -> None:
         """
@@ -64,26 +130,93 @@ class NFTService:
         :param new_owner: futuro propietario.
         :raises ValueError: si el token no pertenece al current_owner o si algún usuario no existe.
         """
-        # Verificar propietarios
-        usuario_actual = self.usuario_repo.obtener_por_nombre(current_owner)
-        if usuario_actual is None:
-            raise ValueError(f"Usuario no encontrado: {current_owner}")
-        
-        if token_id not in usuario_actual.tokens:
-            raise ValueError("El token no pertenece al usuario actual.")
-        
-        usuario_destino = self.usuario_repo.obtener_por_nombre(new_owner)
-        if usuario_destino is None:
-            raise ValueError(f"Usuario destinatario no encontrado: {new_owner}")
-        
-        # Actualizar repositorios
-        usuario_actual.tokens.remove(token_id)
-        self.usuario_repo.actualizar(usuario_actual)
-        
-        usuario_destino.tokens.append(token_id)
-        self.usuario_repo.actualizar(usuario_destino)
-        
-        self.nft_repo.transferir(token_id, new_owner)
+        self.transfer_many([(token_id, current_owner, new_owner)])
+
+    async def transfer_token_async(self, token_id: UUID, current_owner: str, new_owner: str) -> None:
+        """
+        Variante asíncrona de transfer_token: la transferencia se hace en un
+        hilo del executor del event loop.
+        """
+        import asyncio
+        await asyncio.to_thread(self.transfer_token, token_id, current_owner, new_owner)
+
+    def transfer_many(self, transferencias: List[Tuple[UUID, str, str]]) -> None:
+        """
+        Aplica un lote de transferencias `(token_id, current_owner, new_owner)`
+        (p. ej. un sorteo o airdrop) con una sola confirmación atómica.
+
+        Se validan en orden sobre una única carga de cada usuario; si alguna
+        no es válida no se aplica ninguna.
+
+        :raises ValueError: si un token no pertenece a su current_owner o si algún usuario no existe.
+        """
+        with self.usuario_repo.transaccion():
+            if self.diario is not None:
+                # Un lote que otro proceso dejó a medias se aplica antes de
+                # leer los usuarios y antes de que registrar() lo sobrescriba
+                self._recuperar_transferencias()
+            usuarios: Dict[str, Usuario] = {}
+
+            def cargar(nombre: str, mensaje: str) -> Usuario:
+                if nombre not in usuarios:
+                    usuario = self.usuario_repo.obtener_por_nombre(nombre)
+                    if usuario is None:
+                        raise ValueError(f"{mensaje}: {nombre}")
+                    usuarios[nombre] = usuario
+                return usuarios[nombre]
+
+            lote = []
+            for token_id, current_owner, new_owner in transferencias:
+                token_id = token_id if isinstance(token_id, UUID) else UUID(str(token_id))
+                usuario_actual = cargar(current_owner, "Usuario no encontrado")
+                if token_id not in usuario_actual.tokens:
+                    raise ValueError("El token no pertenece al usuario actual.")
+                usuario_destino = cargar(new_owner, "Usuario destinatario no encontrado")
+                usuario_actual.tokens.remove(token_id)
+                usuario_destino.tokens.add(token_id)
+                lote.append((str(token_id), current_owner, new_owner))
+            if lote:
+                self._confirmar_transferencias(lote, list(usuarios.values()))
+
+    def _confirmar_transferencias(self, lote: List[Tuple[str, str, str]], usuarios: List[Usuario]) -> None:
+        """Persiste los nuevos propietarios y los usuarios afectados como una unidad."""
+        pares = [(UUID(token_id), destino) for token_id, _, destino in lote]
+        if self._db is not None:
+            with self._db.transaccion():
+                self.nft_repo.transferir_muchos(pares)
+                self.usuario_repo.actualizar_muchos(usuarios)
+            return
+        self.diario.registrar(lote)
+        self.nft_repo.transferir_muchos(pares)
+        self.usuario_repo.actualizar_muchos(usuarios)
+        self.diario.completar()
+
+    def _recuperar_transferencias(self) -> None:
+        """
+        Vuelve a aplicar el lote de transferencias que quedó a medias.
+
+        Cada escritura de repositorio es atómica, así que cada archivo está
+        entero antes o después del lote; reaplicarlo en orden deja ambos en
+        el estado final.
+        """
+        # Bajo el bloqueo de usuarios: otro proceso puede estar escribiendo el lote
+        with self.usuario_repo.transaccion():
+            lote = self.diario.pendientes()
+            if not lote:
+                return
+            usuarios: Dict[str, Usuario] = {}
+            for token_id, origen, destino in lote:
+                for nombre in (origen, destino):
+                    if nombre not in usuarios:
+                        usuarios[nombre] = self.usuario_repo.obtener_por_nombre(nombre)
+                token = UUID(token_id)
+                if usuarios[origen] is not None:
+                    usuarios[origen].tokens.discard(token)
+                if usuarios[destino] is not None:
+                    usuarios[destino].tokens.add(token)
+            self.nft_repo.transferir_muchos([(UUID(t), destino) for t, _, destino in lote])
+            self.usuario_repo.actualizar_muchos([u for u in usuarios.values() if u is not None])
+            self.diario.completar()
 
     def get_token(self, token_id: UUID) -> Optional[TokenNFT]:
         """
@@ -93,3 +226,10 @@ class NFTService:
         :return: TokenNFT o None si no existe.
         """
         return self.nft_repo.obtener_por_id(token_id)
+
+    async def get_token_async(self, token_id: UUID) -> Optional[TokenNFT]:
+        """
+        Variante asíncrona de get_token.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.get_token, token_id)
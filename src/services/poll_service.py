@@ -1,30 +1,82 @@
 # src/services/poll_service.py
+import random
+import threading
+import time
 from uuid import UUID
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Dict, Optional, Tuple, TypeVar
 
 from src.models.encuesta import Encuesta
 from src.models.voto import Voto
 from src.repositories.encuesta_repo import EncuestaRepository
-from src.patterns.observer import SujetoObservable
-from src.patterns.factory import PollFactory
+from src.repositories.json_repo import ConflictoDeVersion
+from src.patterns.observer import DespachadorAsincrono, SujetoObservable
+from src.config import Config
+from src.patterns.factory import PollFactory, RepositoryFactory
 from src.patterns.strategy import DesempateStrategy, TextoStrategy
 from src.services.nft_service import NFTService
 
+T = TypeVar('T')
+
 
 class PollService(SujetoObservable):
     """
     Servicio para gestionar encuestas: creación, votación, cierre y resultados.
+
+    Con 'observer_async' en config los eventos se notifican desde un
+    DespachadorAsincrono ('observer_queue_size', 'observer_workers',
+    'observer_policy', 'observer_timeout') en lugar de en el hilo que vota.
+
+    Los métodos `*_async` ejecutan la variante síncrona en un hilo del
+    executor del event loop, de modo que la E/S de los repositorios no
+    bloquea al servidor ASGI.
+
+    Las modificaciones de una encuesta se guardan con compare-and-swap: si
+    otro proceso la guardó entre la lectura y el guardado, se relee y se
+    repite la operación (hasta 'cas_retries' veces, con espera aleatoria
+    creciente).
     """
 
     def __init__(self,
                 desempate_strategy: Optional[DesempateStrategy] = None,
-                presentacion_strategy: Optional[TextoStrategy] = None):
+                presentacion_strategy: Optional[TextoStrategy] = None,
+                repo: Optional[EncuestaRepository] = None,
+                config: Optional[Config] = None,
+                nft_service: Optional[NFTService] = None):
         super().__init__()
-        self.repo = EncuestaRepository()
-        self.nft_service = NFTService()
+        config = config or Config()
+        self.repo = repo or RepositoryFactory(config).encuestas()
+        self.nft_service = nft_service or NFTService(config)
         self.desempate_strategy = desempate_strategy or DesempateStrategy()
         self.presentacion_strategy = presentacion_strategy or TextoStrategy()
+        # Serializa la lectura-modificación-escritura de encuestas entre hilos
+        # (votos concurrentes desde la UI o desde las variantes async); entre
+        # procesos se resuelve con la versión de cada encuesta
+        self._encuestas_lock = threading.RLock()
+        self.cas_retries: int = config.obtener('cas_retries', 50)
+        if config.obtener('observer_async', False):
+            self.usar_despachador(DespachadorAsincrono(
+                max_cola=config.obtener('observer_queue_size', 10000),
+                hilos=config.obtener('observer_workers', 1),
+                politica=config.obtener('observer_policy', 'descartar'),
+                timeout_observador=config.obtener('observer_timeout', 1.0)
+            ))
+
+    def _reintentar(self, operacion: Callable[[], T]) -> T:
+        """
+        Ejecuta `operacion` (leer, modificar y guardar una encuesta) y la
+        repite desde la lectura si el guardado detecta un conflicto de versión.
+
+        :raises ConflictoDeVersion: si se agotan los reintentos.
+        """
+        for intento in range(self.cas_retries):
+            try:
+                with self._encuestas_lock:
+                    return operacion()
+            except ConflictoDeVersion:
+                time.sleep(random.uniform(0, 0.001 * 2 ** min(intento, 6)))
+        with self._encuestas_lock:
+            return operacion()
 
     def now(self) -> datetime:
         """Devuelve la hora actual en UTC."""
@@ -37,8 +89,9 @@ class PollService(SujetoObservable):
         """
         if not pregunta or not opciones or duracion_segundos <= 0:
             raise ValueError("Parámetros inválidos para crear la encuesta.")
-        encuesta = PollFactory.create_poll(pregunta, opciones, duracion_segundos, tipo)
+        encuesta = PollFactory().create_poll(pregunta, opciones, duracion_segundos, tipo)
         self.repo.agregar(encuesta)
+        self.notificar_observadores('encuesta_creada', {'encuesta_id': str(encuesta.id)})
         return encuesta
 
     def list_polls(self, active_only: bool = False) -> List[Encuesta]:
@@ -53,32 +106,158 @@ class PollService(SujetoObservable):
         """
         if not options or len(options) != 1:
             raise ValueError("Debe seleccionar exactamente una opción para votar.")
-        encuesta = self.repo.obtener_por_id(poll_id)
-        if not encuesta:
-            raise ValueError(f"Encuesta no encontrada: {poll_id}")
-        encuesta.comprobar_expiracion()
-        voto = Voto(encuesta_id=poll_id, usuario=username, opcion=options[0])
-        encuesta.agregar_voto(voto)
-        self.repo.actualizar(encuesta)
-        token = self.nft_service.mint_token(poll_id, options[0], username)
-        voto.token_id = token.token_id
+
+        def registrar() -> Voto:
+            encuesta = self.repo.obtener_por_id(poll_id)
+            if not encuesta:
+                raise ValueError(f"Encuesta no encontrada: {poll_id}")
+            encuesta.comprobar_expiracion()
+            voto = Voto(encuesta_id=poll_id, usuario=username, opcion=options[0])
+            if self.nft_service.usuario_repo.obtener_por_nombre(voto.usuario) is None:
+                raise ValueError(f"Usuario no encontrado: {voto.usuario}")
+            error = encuesta.agregar_voto(voto)
+            if error:
+                raise ValueError(error)
+            self.repo.actualizar(encuesta)
+            return voto
+
+        voto = self._reintentar(registrar)
+        # El token se acuña con el token_id que ya guarda el voto
+        self.nft_service.mint_many(poll_id, [voto])
         self.notificar_observadores('voto_emitido', {'encuesta_id': str(poll_id), 'usuario': username, 'opcion': options[0]})
         return voto
 
+    async def list_polls_async(self, active_only: bool = False) -> List[Encuesta]:
+        """
+        Variante asíncrona de list_polls.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.list_polls, active_only)
+
+    async def vote_async(self, poll_id: UUID, username: str, options: List[str]) -> Voto:
+        """
+        Variante asíncrona de vote.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.vote, poll_id, username, options)
+
+    def vote_many(self, poll_id: UUID, votos: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Registra un lote de votos `(username, opcion)` sobre una misma encuesta.
+
+        Todos se validan contra una única carga de la encuesta y se persisten
+        con una escritura de la encuesta, una de tokens y una de usuarios.
+
+        :return: un resultado por voto, en el mismo orden, con las claves
+                 'usuario', 'opcion', 'voto' (Voto o None) y 'error' (str o None).
+        """
+        usuarios_existentes: Dict[str, bool] = {}
+
+        def registrar() -> Tuple[List[Dict[str, Any]], List[Voto]]:
+            encuesta = self.repo.obtener_por_id(poll_id)
+            if not encuesta:
+                raise ValueError(f"Encuesta no encontrada: {poll_id}")
+            encuesta.comprobar_expiracion()
+
+            resultados: List[Dict[str, Any]] = []
+            aceptados: List[Voto] = []
+            for username, opcion in votos:
+                resultado = {'usuario': username, 'opcion': opcion, 'voto': None, 'error': None}
+                resultados.append(resultado)
+                try:
+                    voto = Voto(encuesta_id=encuesta.id, usuario=username, opcion=opcion)
+                except ValueError as e:
+                    resultado['error'] = str(e)
+                    continue
+                if voto.usuario not in usuarios_existentes:
+                    usuarios_existentes[voto.usuario] = \
+                        self.nft_service.usuario_repo.obtener_por_nombre(voto.usuario) is not None
+                if not usuarios_existentes[voto.usuario]:
+                    resultado['error'] = f"Usuario no encontrado: {voto.usuario}"
+                    continue
+                error = encuesta.agregar_voto(voto)
+                if error:
+                    resultado['error'] = error
+                    continue
+                resultado['voto'] = voto
+                aceptados.append(voto)
+
+            self.repo.actualizar(encuesta)
+            return resultados, aceptados
+
+        resultados, aceptados = self._reintentar(registrar)
+        if aceptados:
+            self.nft_service.mint_many(aceptados[0].encuesta_id, aceptados)
+        for voto in aceptados:
+            self.notificar_observadores('voto_emitido', {'encuesta_id': str(poll_id), 'usuario': voto.usuario, 'opcion': voto.opcion})
+        return resultados
+
     def close_poll(self, poll_id: UUID) -> bool:
         """
         Cierra manualmente una encuesta.
         """
-        encuesta = self.repo.obtener_por_id(poll_id)
-        if not encuesta:
-            raise ValueError(f"Encuesta no encontrada: {poll_id}")
-        if not encuesta.activa:
+        def cerrar() -> bool:
+            encuesta = self.repo.obtener_por_id(poll_id)
+            if not encuesta:
+                raise ValueError(f"Encuesta no encontrada: {poll_id}")
+            if not encuesta.activa:
+                return False
+            encuesta.activa = False
+            self.repo.actualizar(encuesta)
+            return True
+
+        if not self._reintentar(cerrar):
             return False
-        encuesta.activa = False
-        self.repo.actualizar(encuesta)
         self.notificar_observadores('encuesta_cerrada', {'encuesta_id': str(poll_id)})
         return True
 
+    def expire_poll(self, poll_id: UUID) -> Optional[datetime]:
+        """
+        Cierra una encuesta cuyo plazo ha vencido, aplicando la estrategia de
+        desempate si hay empate con votos.
+
+        Si la estrategia pide prórroga ({'accion': 'prorroga', ...}) la
+        encuesta sigue activa 'segundos' más (por defecto su duración original)
+        y se emite 'encuesta_prorrogada'; si no, se persiste el cierre y se
+        emite 'encuesta_cerrada' con el 'ganador'.
+
+        :return: El nuevo plazo si la encuesta sigue activa, None si no.
+        """
+        return self._reintentar(lambda: self._expirar(poll_id))
+
+    def _expirar(self, poll_id: UUID) -> Optional[datetime]:
+        encuesta = self.repo.obtener_por_id(poll_id)
+        if not encuesta or not encuesta.activa:
+            return None
+        ahora = self.now()
+        if encuesta.expira_en > ahora:
+            return encuesta.expira_en
+
+        resultados = encuesta.obtener_resultados()
+        max_votos = max(resultados.values(), default=0)
+        opciones_empate = [opt for opt, cnt in resultados.items() if cnt == max_votos]
+        ganador: Any = opciones_empate[0] if len(opciones_empate) == 1 else None
+        if len(opciones_empate) > 1 and max_votos > 0:
+            try:
+                ganador = self.desempate_strategy.resolver(encuesta)
+            except NotImplementedError:
+                ganador = None
+        if isinstance(ganador, dict) and ganador.get('accion') == 'prorroga':
+            segundos = ganador.get('segundos') or encuesta.duracion_segundos
+            encuesta.expira_en = ahora + timedelta(seconds=segundos)
+            self.repo.actualizar(encuesta)
+            self.notificar_observadores('encuesta_prorrogada', {
+                'encuesta_id': str(poll_id),
+                'expira_en': encuesta.expira_en.isoformat(),
+                'opciones_empate': ganador.get('opciones_empate', opciones_empate)
+            })
+            return encuesta.expira_en
+
+        encuesta.activa = False
+        self.repo.actualizar(encuesta)
+        self.notificar_observadores('encuesta_cerrada', {'encuesta_id': str(poll_id), 'ganador': ganador})
+        return None
+
     def get_partial_results(self, poll_id: UUID) -> Dict[str, int]:
         """
         Devuelve conteo parcial de votos.
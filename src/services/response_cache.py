@@ -0,0 +1,60 @@
+# src/services/response_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheRespuestas:
+    """
+    Caché de respuestas con expiración (TTL) y capacidad máxima opcional.
+
+    Al superar `capacidad` se desaloja la entrada usada hace más tiempo (LRU).
+    Con `ttl_segundos` = None las entradas no caducan.
+    """
+
+    def __init__(self, ttl_segundos: Optional[float] = None, capacidad: Optional[int] = None):
+        self.ttl_segundos = ttl_segundos
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        # clave -> (valor, expira_en)
+        self._entradas: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """Devuelve el valor vigente de la clave o None."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[1] <= time.monotonic():
+                if entrada is not None:
+                    del self._entradas[clave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        """Guarda un valor, desalojando la entrada LRU si se supera la capacidad."""
+        expira_en = time.monotonic() + self.ttl_segundos if self.ttl_segundos is not None else float('inf')
+        with self._lock:
+            self._entradas[clave] = (valor, expira_en)
+            self._entradas.move_to_end(clave)
+            if self.capacidad is not None:
+                while len(self._entradas) > self.capacidad:
+                    self._entradas.popitem(last=False)
+
+    def invalidar(self, predicado: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Elimina las claves que cumplen el predicado (todas si no se indica)."""
+        with self._lock:
+            if predicado is None:
+                self._entradas.clear()
+                return
+            for clave in [c for c in self._entradas if predicado(c)]:
+                del self._entradas[clave]
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Tamaño y aciertos/fallos de la caché."""
+        with self._lock:
+            return {'entradas': len(self._entradas), 'aciertos': self.aciertos, 'fallos': self.fallos}
@@ -1,9 +1,17 @@
 # src/services/user_service.py
 import uuid
+import base64
 import hashlib
-from typing import Optional
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Dict, Optional, Tuple
 
 from src.models.usuario import Usuario
+from src.config import Config
+from src.patterns.factory import RepositoryFactory
 from src.repositories.usuario_repo import UsuarioRepository
 
 
@@ -22,20 +30,130 @@ class UsernameAlreadyExistsError(Exception):
     pass
 
 
+class HashingQueueFullError(Exception):
+    """Excepción para cola de hashing de contraseñas llena."""
+    pass
+
+
+def _pbkdf2(password: str, salt: bytes) -> str:
+    """
+    Calcula el hash PBKDF2 de la contraseña. Es una función de módulo para
+    poder ejecutarse en los procesos del pool.
+    """
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000).hex()
+
+
 class UserService:
     """
     Servicio para registro, login y gestión de sesiones de usuarios.
+
+    Las sesiones caducan tras 'session_ttl' segundos (config). Con
+    'session_format' = 'signed' y un 'session_secret' compartido, los tokens
+    son firmados (HMAC) y cualquier proceso puede validarlos sin memoria
+    compartida; por defecto son opacos y viven en `sesiones`.
+
+    El hashing PBKDF2 se ejecuta en un ProcessPoolExecutor de 'hash_workers'
+    procesos (0 = en el propio hilo) para no retener el GIL del servidor. Como
+    mucho 'hash_max_pending' hashes pueden estar en cola; pasado
+    'hash_timeout' segundos esperando un hueco se lanza HashingQueueFullError.
     """
+    FORMATOS_SESION = ('opaque', 'signed')
+
+    def __init__(self, config: Optional[Config] = None, repo: Optional[UsuarioRepository] = None):
+        config = config or Config()
+        self.repo = repo or RepositoryFactory(config).usuarios()
+        self.session_ttl: int = config.obtener('session_ttl', 3600)
+        self.session_format: str = config.obtener('session_format', 'opaque')
+        if self.session_format not in self.FORMATOS_SESION:
+            raise ValueError(f"Formato de sesión inválido: {self.session_format}")
+        secreto = config.obtener('session_secret')
+        if self.session_format == 'signed' and not secreto:
+            raise ValueError("El formato de sesión 'signed' requiere 'session_secret'.")
+        self._secreto: bytes = (secreto or '').encode('utf-8')
+        # Diccionario session_token -> (username, expira_en)
+        self.sesiones: Dict[str, Tuple[str, float]] = {}
+        # Diccionario username -> session_token (una sesión activa por usuario)
+        self._token_por_usuario: Dict[str, str] = {}
+        # Tokens firmados revocados localmente por cerrar_sesion
+        self._revocados: Dict[str, float] = {}
 
-    def __init__(self):
-        self.repo = UsuarioRepository()
-        self.sesiones: dict[str, str] = {}  # Diccionario username -> session_token
+        self.hash_workers: int = config.obtener('hash_workers', os.cpu_count() or 1)
+        self.hash_timeout: float = config.obtener('hash_timeout', 5.0)
+        max_pendientes = config.obtener('hash_max_pending', max(self.hash_workers, 1) * 4)
+        self._cupos_hash = threading.BoundedSemaphore(max_pendientes)
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+
+    def usar_firma(self, secreto: bytes) -> None:
+        """
+        Pasa a emitir tokens firmados con `secreto`, para que las sesiones
+        sobrevivan al proceso (p. ej. la CLI sin demonio).
+        """
+        self.session_format = 'signed'
+        self._secreto = secreto
+
+    def _obtener_pool(self) -> Executor:
+        """
+        Crea el pool de procesos de hashing la primera vez que se necesita.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                # multiprocessing solo se importa si de verdad se hashea
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(max_workers=self.hash_workers)
+            return self._pool
+
+    def _enviar_hash(self, password: str, salt: bytes) -> Future:
+        """
+        Encola el cálculo del hash respetando el límite de pendientes.
+
+        Debe llamarse tras adquirir un cupo de `_cupos_hash`; el cupo se
+        libera al terminar el cálculo.
+        """
+        try:
+            if self.hash_workers > 0:
+                futuro = self._obtener_pool().submit(_pbkdf2, password, salt)
+            else:
+                futuro = Future()
+                futuro.set_result(_pbkdf2(password, salt))
+        except BaseException:
+            self._cupos_hash.release()
+            raise
+        futuro.add_done_callback(lambda _: self._cupos_hash.release())
+        return futuro
 
     def hash_password(self, password: str, salt: bytes) -> str:
         """
         Genera un hash seguro para la contraseña usando PBKDF2.
+
+        :raises HashingQueueFullError: si la cola de hashing sigue llena tras `hash_timeout`.
+        """
+        if not self._cupos_hash.acquire(timeout=self.hash_timeout):
+            raise HashingQueueFullError("Demasiadas solicitudes de autenticación en cola.")
+        return self._enviar_hash(password, salt).result()
+
+    async def hash_password_async(self, password: str, salt: bytes) -> str:
+        """
+        Variante asíncrona de hash_password: espera el resultado sin bloquear
+        el event loop.
+
+        :raises HashingQueueFullError: si la cola de hashing sigue llena tras `hash_timeout`.
         """
-        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000).hex()
+        import asyncio
+        if not self._cupos_hash.acquire(blocking=False):
+            adquirido = await asyncio.to_thread(self._cupos_hash.acquire, timeout=self.hash_timeout)
+            if not adquirido:
+                raise HashingQueueFullError("Demasiadas solicitudes de autenticación en cola.")
+        return await asyncio.wrap_future(self._enviar_hash(password, salt))
+
+    def cerrar(self) -> None:
+        """
+        Detiene el pool de procesos de hashing.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
 
     def generate_salt(self) -> bytes:
         """
@@ -47,12 +165,12 @@ class UserService:
         """
         Registra un nuevo usuario con username y contraseña.
         """
-        if self.repo.obtener_por_username(username):
+        if self.repo.obtener_por_nombre(username):
             raise UsernameAlreadyExistsError("El nombre de usuario ya existe.")
 
         salt = self.generate_salt()
         password_hash = self.hash_password(password, salt)
-        usuario = Usuario(username=username, password_hash=password_hash, salt=salt.hex())
+        usuario = Usuario(nombre=username, password_hash=password_hash, salt=salt.hex())
         self.repo.agregar(usuario)
         return True
 
@@ -60,7 +178,7 @@ class UserService:
         """
         Verifica credenciales y retorna un token de sesión.
         """
-        usuario = self.repo.obtener_por_username(username)
+        usuario = self.repo.obtener_por_nombre(username)
         if not usuario:
             raise UserNotFoundError("Usuario no encontrado.")
 
@@ -68,18 +186,120 @@ class UserService:
         if usuario.password_hash != self.hash_password(password, salt):
             raise InvalidPasswordError("Contraseña incorrecta.")
 
-        session_token = str(uuid.uuid4())
-        self.sesiones[username] = session_token
+        return self._crear_sesion(username)
+
+    async def register_async(self, username: str, password: str) -> bool:
+        """
+        Variante asíncrona de register: el hash se calcula en el pool y la
+        E/S del repositorio en un hilo del executor del event loop.
+        """
+        import asyncio
+        if await asyncio.to_thread(self.repo.obtener_por_nombre, username):
+            raise UsernameAlreadyExistsError("El nombre de usuario ya existe.")
+
+        salt = self.generate_salt()
+        password_hash = await self.hash_password_async(password, salt)
+        usuario = Usuario(nombre=username, password_hash=password_hash, salt=salt.hex())
+        await asyncio.to_thread(self.repo.agregar, usuario)
+        return True
+
+    async def login_async(self, username: str, password: str) -> str:
+        """
+        Variante asíncrona de login: el hash se calcula en el pool y la
+        lectura del repositorio en un hilo del executor del event loop.
+        """
+        import asyncio
+        usuario = await asyncio.to_thread(self.repo.obtener_por_nombre, username)
+        if not usuario:
+            raise UserNotFoundError("Usuario no encontrado.")
+
+        salt = bytes.fromhex(usuario.salt)
+        if usuario.password_hash != await self.hash_password_async(password, salt):
+            raise InvalidPasswordError("Contraseña incorrecta.")
+
+        return self._crear_sesion(username)
+
+    def _crear_sesion(self, username: str) -> str:
+        """
+        Emite un token de sesión para el usuario, reemplazando el anterior.
+        """
+        expira_en = time.time() + self.session_ttl
+        if self.session_format == 'signed':
+            session_token = self._firmar(username, expira_en)
+        else:
+            session_token = str(uuid.uuid4())
+        anterior = self._token_por_usuario.pop(username, None)
+        if anterior is not None:
+            self.sesiones.pop(anterior, None)
+        self.sesiones[session_token] = (username, expira_en)
+        self._token_por_usuario[username] = session_token
         return session_token
 
+    def _firmar(self, username: str, expira_en: float) -> str:
+        """
+        Genera un token firmado `base64(username:expira_en).firma`.
+        """
+        carga = f"{username}:{int(expira_en)}".encode('utf-8')
+        firma = hmac.new(self._secreto, carga, hashlib.sha256).hexdigest()
+        return base64.urlsafe_b64encode(carga).decode('ascii') + '.' + firma
+
+    def _verificar_firma(self, token: str) -> Optional[Tuple[str, float]]:
+        """
+        Valida un token firmado y devuelve (username, expira_en) o None.
+        """
+        try:
+            carga_b64, firma = token.rsplit('.', 1)
+            carga = base64.urlsafe_b64decode(carga_b64.encode('ascii'))
+        except (ValueError, UnicodeEncodeError):
+            return None
+        esperada = hmac.new(self._secreto, carga, hashlib.sha256).hexdigest()
+        # compare_digest solo admite str ASCII: se comparan bytes para que una
+        # firma falsificada con otros caracteres se rechace sin excepción
+        if not hmac.compare_digest(firma.encode('utf-8'), esperada.encode('ascii')):
+            return None
+        username, expira_en = carga.decode('utf-8').rsplit(':', 1)
+        return username, float(expira_en)
+
+    def usuario_de_sesion(self, token: str) -> Optional[str]:
+        """
+        Devuelve el usuario dueño de un token de sesión vigente, o None.
+
+        Es una comprobación O(1): un acceso al diccionario de sesiones o,
+        para tokens firmados, una verificación HMAC.
+        """
+        if not token:
+            return None
+        sesion = self.sesiones.get(token)
+        if sesion is None and self.session_format == 'signed' and token not in self._revocados:
+            sesion = self._verificar_firma(token)
+        if sesion is None:
+            return None
+        username, expira_en = sesion
+        if time.time() >= expira_en:
+            self.sesiones.pop(token, None)
+            if self._token_por_usuario.get(username) == token:
+                del self._token_por_usuario[username]
+            return None
+        return username
+
     def verificar_sesion(self, username: str, token: str) -> bool:
         """
-        Verifica que el token corresponde a la sesión activa del usuario.
+        Verifica que el token corresponde a una sesión vigente del usuario.
         """
-        return self.sesiones.get(username) == token
+        return self.usuario_de_sesion(token) == username
 
     def cerrar_sesion(self, username: str) -> None:
         """
         Cierra la sesión del usuario.
+
+        Un token firmado solo queda revocado en este proceso; en los demás
+        sigue siendo válido hasta su expiración.
         """
-        self.sesiones.pop(username, None)
+        token = self._token_por_usuario.pop(username, None)
+        if token is None:
+            return
+        _, expira_en = self.sesiones.pop(token, (username, time.time()))
+        if self.session_format == 'signed':
+            ahora = time.time()
+            self._revocados = {t: e for t, e in self._revocados.items() if e > ahora}
+            self._revocados[token] = expira_en
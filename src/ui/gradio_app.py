@@ -1,16 +1,17 @@
 # src/ui/gradio_app.py
 import gradio as gr
-from src.services.poll_service import PollService
-from src.services.user_service import UserService
-from src.services.nft_service import NFTService
-from src.services.chatbot_service import ChatbotService
+from typing import Optional
+from src.container import ServiceContainer, obtener_contenedor
 
 class GradioApp:
-    def __init__(self):
-        self.poll_service = PollService()
-        self.user_service = UserService()
-        self.nft_service = NFTService()
-        self.chatbot_service = ChatbotService()
+    def __init__(self, contenedor: Optional[ServiceContainer] = None):
+        contenedor = contenedor or obtener_contenedor()
+        self.poll_service = contenedor.poll_service
+        self.user_service = contenedor.user_service
+        self.nft_service = contenedor.nft_service
+        self.chatbot_service = contenedor.chatbot_service
+        # Cierra las encuestas al vencer su plazo mientras la UI está en marcha
+        self.planificador = contenedor.planificador
 
         self.usuario_actual = None
         self.token_sesion = None
@@ -95,7 +96,7 @@ class GradioApp:
         if not mensaje:
             return "El mensaje no puede estar vacío."
         try:
-            return self.chatbot_service.responder(self.usuario_actual, mensaje)
+            return self.chatbot_service.ask(self.usuario_actual, mensaje)
         except Exception:
             return "Error inesperado al procesar el mensaje del chatbot."
 
@@ -1,6 +1,14 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 from unittest.mock import patch
+from src.config import Config
+from src.container import ServiceContainer
 from src.controllers.cli_controller import CLIController
+from src.controllers.cli_daemon import ClienteCLI, ServidorCLI
 from src.services.user_service import UserService
 from src.services.poll_service import PollService
 
@@ -30,11 +38,151 @@ class TestCLIController(unittest.TestCase):
 
     def test_crear_encuesta(self):
         # Simular el comportamiento de la creación de encuestas
-        with patch.object(self.poll_service, 'create_poll', return_value=type('Poll', (object,), {'id': 1})()):
-            with patch('sys.argv', ['streamer-votes', 'create_poll', '¿Te gusta el stream?', 'Sí', 'No', '60', 'simple']):
+        with patch.object(self.poll_service, 'create_poll', return_value=type('Poll', (object,), {'id': 1})()) as crear:
+            with patch('sys.argv', ['streamer-votes', 'create_poll', '¿Te gusta el stream?', 'Sí', 'No', '60',
+                                    '--type', 'simple']):
                 with patch('builtins.print') as mock_print:
                     self.cli.run()
                     mock_print.assert_called_with("Encuesta creada con ID: 1")
+        crear.assert_called_once_with(pregunta='¿Te gusta el stream?', opciones=['Sí', 'No'],
+                                      duracion_segundos=60, tipo='simple')
+
+class TestDemonioCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        ruta_config = os.path.join(self.tmp.name, 'config.json')
+        with open(ruta_config, 'w', encoding='utf-8') as f:
+            json.dump({'data_dir': self.tmp.name, 'hash_workers': 0}, f)
+        self.contenedor = ServiceContainer(Config(ruta_config))
+        self.ruta_socket = os.path.join(self.tmp.name, 'cli.sock')
+        self.servidor = ServidorCLI(CLIController(contenedor=self.contenedor), self.ruta_socket)
+        self.servidor.iniciar()
+        self.cliente = ClienteCLI(self.ruta_socket, os.path.join(self.tmp.name, 'sesion'))
+
+    def tearDown(self):
+        self.servidor.detener()
+        self.contenedor.cerrar()
+        self.tmp.cleanup()
+
+    def test_sesion_persiste_entre_comandos(self):
+        self.assertEqual(self.cliente.ejecutar(['register', 'ana', 'clave']), "Registro exitoso.\n")
+        self.assertIn("Login exitoso.", self.cliente.ejecutar(['login', 'ana', 'clave']))
+        self.assertIsNotNone(self.cliente.leer_sesion())
+
+        salida = self.cliente.ejecutar(['create_poll', '¿Juego?', 'A', 'B', '60'])
+        poll_id = salida.strip().rsplit(' ', 1)[-1]
+        salida = self.cliente.ejecutar(['vote', poll_id, 'A'])
+        self.assertIn("Voto registrado.", salida)
+        token_id = salida.strip().rsplit(' ', 1)[-1]
+        self.assertIn(token_id, self.cliente.ejecutar(['mis_tokens']))
+
+        # Otro cliente sin sesión guardada no hereda la de ana
+        anonimo = ClienteCLI(self.ruta_socket)
+        self.assertEqual(anonimo.ejecutar(['mis_tokens']), "Error: Debes iniciar sesión primero.\n")
+
+    def test_errores_de_argumentos_vuelven_al_cliente(self):
+        self.assertIn("invalid int value", self.cliente.ejecutar(['create_poll', '¿Juego?', 'A', 'B', 'x']))
+        # El demonio sigue atendiendo
+        self.assertIn("invalid UUID value", self.cliente.ejecutar(['vote', 'x', 'A']))
+
+    def test_detener_elimina_el_socket(self):
+        self.servidor.detener()
+        self.assertFalse(os.path.exists(self.ruta_socket))
+        with self.assertRaises(ConnectionError):
+            self.cliente.ejecutar(['list_polls'])
+
+
+class TestCLISinDemonio(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta_config = os.path.join(self.tmp.name, 'config.json')
+        with open(self.ruta_config, 'w', encoding='utf-8') as f:
+            json.dump({'data_dir': self.tmp.name, 'hash_workers': 0}, f)
+        self.cliente = ClienteCLI(os.path.join(self.tmp.name, 'cli.sock'), os.path.join(self.tmp.name, 'sesion'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def invocar(self, *argv):
+        """Simula una invocación de la CLI: contenedor y controlador nuevos."""
+        contenedor = ServiceContainer(Config(self.ruta_config))
+        try:
+            with patch('builtins.print') as mock_print:
+                CLIController(contenedor=contenedor).ejecutar_con_cliente(list(argv), self.cliente)
+            return mock_print.call_args[0][0]
+        finally:
+            contenedor.cerrar()
+
+    def test_login_persiste_entre_invocaciones(self):
+        self.assertEqual(self.invocar('register', 'ana', 'clave'), "Registro exitoso.")
+        self.assertIn("Login exitoso.", self.invocar('login', 'ana', 'clave'))
+        poll_id = self.invocar('create_poll', '¿Juego?', 'A', 'B', '60').rsplit(' ', 1)[-1]
+
+        self.assertIn("Voto registrado.", self.invocar('vote', poll_id, 'A'))
+        secreto = self.cliente.ruta_sesion + '.secret'
+        self.assertEqual(os.stat(secreto).st_mode & 0o777, 0o600)
+
+    def test_sesion_ajena_al_secreto_local_no_vale(self):
+        self.invocar('register', 'ana', 'clave')
+        self.cliente.guardar_sesion('no-es-un-token')
+        self.assertEqual(self.invocar('mis_tokens'), "Error: Debes iniciar sesión primero.")
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Módulos que ningún comando de CLI debe importar
+PESADOS = ('gradio', 'transformers', 'torch', 'asyncio', 'multiprocessing')
+
+
+def informe_importacion(codigo, cwd=RAIZ):
+    """
+    Ejecuta `codigo` con `python -X importtime` y devuelve el tiempo
+    acumulado de importación (µs) de cada módulo de primer nivel.
+    """
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=cwd, env=entorno,
+                            capture_output=True, text=True, check=True)
+    tiempos = {}
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, modulo = linea[len('import time:'):].split('|')
+        raiz = modulo.strip().split('.')[0]
+        tiempos[raiz] = tiempos.get(raiz, 0) + int(acumulado)
+    return tiempos
+
+
+class TestArranqueCLI(unittest.TestCase):
+
+    def test_importar_cli_no_carga_modulos_pesados(self):
+        tiempos = informe_importacion("import src.controllers.cli_controller")
+        self.assertIn('src', tiempos)
+        self.assertEqual([m for m in PESADOS if m in tiempos], [])
+
+    def test_comando_list_polls_no_carga_modulos_pesados(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'config.json'), 'w', encoding='utf-8') as f:
+                json.dump({'data_dir': tmp}, f)
+            tiempos = informe_importacion(
+                "from src.controllers.cli_controller import CLIController; CLIController().run(['list_polls'])",
+                cwd=tmp
+            )
+        self.assertEqual([m for m in PESADOS if m in tiempos], [])
+
+    def test_backend_json_no_carga_otros_backends(self):
+        otros = ('src.repositories.sqlite_repo', 'src.repositories.jsonl_repo',
+                 'src.repositories.encuesta_journal_repo', 'sqlite3')
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'config.json'), 'w', encoding='utf-8') as f:
+                json.dump({'data_dir': tmp}, f)
+            codigo = ("import sys; from src.controllers.cli_controller import CLIController; "
+                      "CLIController().run(['list_polls']); "
+                      f"print([m for m in {otros!r} if m in sys.modules])")
+            salida = subprocess.run([sys.executable, '-c', codigo], cwd=tmp, env=dict(os.environ, PYTHONPATH=RAIZ),
+                                    capture_output=True, text=True, check=True)
+        self.assertEqual(salida.stdout.splitlines()[-1], '[]')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
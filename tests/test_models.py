@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from uuid import uuid4
+from src.models.encuesta import Encuesta
+from src.models.token_nft import TokenNFT
+from src.models.usuario import Usuario
+from src.models.voto import Voto
+
+
+class TestEncuesta(unittest.TestCase):
+
+    def test_conteo_incremental(self):
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60, tipo='multiple')
+        for opcion in ["A", "B", "A"]:
+            self.assertIsNone(encuesta.agregar_voto(Voto(encuesta_id=encuesta.id, usuario="ana", opcion=opcion)))
+        self.assertEqual(encuesta.conteo, {"A": 2, "B": 1})
+        self.assertEqual(encuesta.obtener_resultados(), {"A": 2, "B": 1})
+
+    def test_votos_rechazados_no_cuentan(self):
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        encuesta.agregar_voto(Voto(encuesta_id=encuesta.id, usuario="ana", opcion="A"))
+        self.assertEqual(encuesta.agregar_voto(Voto(encuesta_id=encuesta.id, usuario="ana", opcion="B")),
+                         "El usuario ya votó")
+        self.assertEqual(encuesta.agregar_voto(Voto(encuesta_id=encuesta.id, usuario="beto", opcion="C")),
+                         "Opción no válida")
+        self.assertEqual(encuesta.obtener_resultados(), {"A": 1, "B": 0})
+
+    def test_resultados_son_una_copia(self):
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        encuesta.obtener_resultados()["A"] = 10
+        self.assertEqual(encuesta.conteo["A"], 0)
+
+
+class TestRehidratacion(unittest.TestCase):
+
+    def test_no_genera_ids_ni_fechas(self):
+        encuesta_id, ahora = uuid4(), datetime(2025, 5, 16)
+        with patch('src.models.voto.uuid4') as uuid_voto, patch('src.models.token_nft.uuid4') as uuid_token, \
+                patch('src.models.encuesta.uuid4') as uuid_encuesta:
+            votos = [Voto.rehidratar(encuesta_id, u, o, ahora, uuid4(), uuid4())
+                     for u, o in [("ana", "A"), ("beto", "B"), ("caro", "A")]]
+            encuesta = Encuesta.rehidratar(encuesta_id, "¿Juego?", ["A", "B"], 60, 'simple',
+                                           ahora, ahora, False, votos)
+            token = TokenNFT.rehidratar(votos[0].token_id, encuesta_id, "A", "ana", ahora)
+        for generador in (uuid_voto, uuid_token, uuid_encuesta):
+            generador.assert_not_called()
+        # Los votos se restauran aunque la encuesta esté cerrada
+        self.assertEqual(encuesta.obtener_resultados(), {"A": 2, "B": 1})
+        self.assertIs(encuesta.votos["beto"], votos[1])
+        self.assertEqual((token.propietario, token.emitido_en), ("ana", ahora))
+
+    def test_modelos_sin_dict_por_instancia(self):
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        voto = Voto(encuesta_id=encuesta.id, usuario="ana", opcion="A")
+        for objeto in (encuesta, voto, TokenNFT(encuesta.id, "A", "ana")):
+            self.assertFalse(hasattr(objeto, '__dict__'))
+
+
+class TestUsuario(unittest.TestCase):
+
+    def test_tokens_conservan_orden_y_no_se_repiten(self):
+        usuario = Usuario("ana", "hash")
+        ids = [uuid4() for _ in range(5)]
+        for token_id in ids:
+            usuario.agregar_token(token_id)
+        with self.assertRaises(ValueError):
+            usuario.agregar_token(ids[0])
+        usuario.remover_token(ids[2])
+        with self.assertRaises(ValueError):
+            usuario.remover_token(ids[2])
+        self.assertEqual(usuario.listar_tokens(), ids[:2] + ids[3:])
+        self.assertNotIn(ids[2], usuario.tokens)
+
+    def test_sin_dict_por_instancia(self):
+        usuario = Usuario("ana", "hash")
+        self.assertFalse(hasattr(usuario, '__dict__'))
+        self.assertFalse(hasattr(usuario.tokens, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
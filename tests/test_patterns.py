@@ -0,0 +1,151 @@
+import threading
+import unittest
+from src.patterns.observer import DespachadorAsincrono, Observador, SujetoObservable
+
+
+class ObservadorRegistro(Observador):
+    def __init__(self):
+        self.eventos = []
+
+    def actualizar(self, evento, datos):
+        self.eventos.append((evento, datos))
+
+
+class ObservadorBloqueado(Observador):
+    def __init__(self):
+        self.liberar = threading.Event()
+        self.eventos = []
+
+    def actualizar(self, evento, datos):
+        self.liberar.wait(5)
+        self.eventos.append((evento, datos))
+
+
+class ObservadorRoto(Observador):
+    def actualizar(self, evento, datos):
+        raise RuntimeError("fallo")
+
+
+class TestSujetoObservable(unittest.TestCase):
+
+    def test_fallo_de_un_observador_no_afecta_al_resto(self):
+        sujeto = SujetoObservable()
+        registro = ObservadorRegistro()
+        sujeto.agregar_observador(ObservadorRoto())
+        sujeto.agregar_observador(registro)
+        sujeto.agregar_observador(registro)
+        with self.assertLogs('src.patterns.observer', level='ERROR'):
+            sujeto.notificar_observadores('voto_emitido', {'opcion': 'A'})
+        self.assertEqual(registro.eventos, [('voto_emitido', {'opcion': 'A'})])
+        sujeto.eliminar_observador(registro)
+        with self.assertLogs('src.patterns.observer', level='ERROR'):
+            sujeto.notificar_observadores('voto_emitido', {'opcion': 'B'})
+        self.assertEqual(len(registro.eventos), 1)
+
+    def test_suscripciones_concurrentes(self):
+        sujeto = SujetoObservable()
+        observadores = [ObservadorRegistro() for _ in range(50)]
+        hilos = [threading.Thread(target=sujeto.agregar_observador, args=(o,)) for o in observadores]
+        hilos.append(threading.Thread(
+            target=lambda: [sujeto.notificar_observadores('e', {}) for _ in range(100)]))
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(len(sujeto._observadores), 50)
+
+
+class TestDespachadorAsincrono(unittest.TestCase):
+
+    def test_agrupa_votos_pendientes_por_encuesta(self):
+        bloqueado = ObservadorBloqueado()
+        registro = ObservadorRegistro()
+        despachador = DespachadorAsincrono(timeout_observador=5)
+        sujeto = SujetoObservable()
+        sujeto.usar_despachador(despachador)
+        sujeto.agregar_observador(bloqueado)
+        sujeto.agregar_observador(registro)
+        # El primer evento ocupa al trabajador; los siguientes quedan en cola
+        sujeto.notificar_observadores('encuesta_creada', {'encuesta_id': 'e1'})
+        for opcion in ['A', 'B', 'A']:
+            sujeto.notificar_observadores('voto_emitido', {'encuesta_id': 'e1', 'opcion': opcion})
+        bloqueado.liberar.set()
+        despachador.vaciar()
+        despachador.detener()
+        self.assertEqual(len(registro.eventos), 2)
+        evento, datos = registro.eventos[1]
+        self.assertEqual(evento, 'voto_emitido')
+        self.assertEqual(datos['delta'], {'A': 2, 'B': 1})
+        self.assertEqual(datos['coalescidos'], 3)
+        self.assertEqual(despachador.metricas()['coalescidos'], 2)
+
+    def test_cola_llena_descarta(self):
+        bloqueado = ObservadorBloqueado()
+        despachador = DespachadorAsincrono(max_cola=1, timeout_observador=5)
+        despachador.enviar((bloqueado,), 'e', {})
+        while despachador.metricas()['en_cola']:
+            pass
+        self.assertTrue(despachador.enviar((bloqueado,), 'e', {}))
+        self.assertFalse(despachador.enviar((bloqueado,), 'e', {}))
+        bloqueado.liberar.set()
+        despachador.detener()
+        metricas = despachador.metricas()
+        self.assertEqual(metricas['descartados'], 1)
+        self.assertEqual(metricas['despachados'], 2)
+
+    def test_observador_lento_no_retiene_al_resto(self):
+        bloqueado = ObservadorBloqueado()
+        registro = ObservadorRegistro()
+        despachador = DespachadorAsincrono(timeout_observador=0.05)
+        for i in range(3):
+            despachador.enviar((bloqueado, registro), 'e', {'n': i})
+        despachador.vaciar()
+        self.assertEqual([d['n'] for _, d in registro.eventos], [0, 1, 2])
+        metricas = despachador.metricas()
+        self.assertEqual(metricas['timeouts'], 1)
+        # Mientras sigue ocupado, los eventos siguientes para él se descartan
+        self.assertEqual(metricas['descartados'], 2)
+        bloqueado.liberar.set()
+        despachador.detener()
+
+
+    def test_votos_concurrentes_llegan_todos(self):
+        registro = ObservadorRegistro()
+        despachador = DespachadorAsincrono(hilos=1, politica='bloquear', timeout_observador=5)
+
+        def emitir():
+            for i in range(200):
+                despachador.enviar((registro,), 'voto_emitido', {'encuesta_id': 'e1', 'opcion': 'AB'[i % 2]})
+
+        hilos = [threading.Thread(target=emitir) for _ in range(4)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        despachador.vaciar()
+        despachador.detener()
+        self.assertEqual(sum(sum(d['delta'].values()) for _, d in registro.eventos), 800)
+        self.assertEqual(despachador._votos_pendientes, {})
+
+    def test_observador_lento_no_pierde_votos(self):
+        bloqueado = ObservadorBloqueado()
+        despachador = DespachadorAsincrono(timeout_observador=0.01)
+        despachador.enviar((bloqueado,), 'encuesta_creada', {'encuesta_id': 'e1'})
+        despachador.vaciar()
+        for opcion in ['A', 'B', 'A']:
+            despachador.enviar((bloqueado,), 'voto_emitido', {'encuesta_id': 'e1', 'opcion': opcion})
+            despachador.vaciar()
+        despachador.enviar((bloqueado,), 'otro', {})
+        despachador.vaciar()
+        bloqueado.liberar.set()
+        despachador.detener()
+        for _ in range(500):
+            if len(bloqueado.eventos) >= 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual([e for e, _ in bloqueado.eventos], ['encuesta_creada', 'voto_emitido'])
+        self.assertEqual(bloqueado.eventos[1][1]['delta'], {'A': 2, 'B': 1})
+        self.assertEqual(despachador.metricas()['descartados'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,496 @@
+import os
+import json
+import sqlite3
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from src.models.encuesta import Encuesta
+from src.models.voto import Voto
+from src.models.usuario import Usuario
+from src.models.token_nft import TokenNFT
+from src.repositories.encuesta_repo import EncuestaRepository
+from src.repositories.encuesta_journal_repo import EncuestaJournalRepository
+from src.repositories.usuario_repo import UsuarioRepository
+from src.repositories.nft_repo import NFTRepository
+from src.repositories.json_repo import ConflictoDeVersion, iterar_json
+from src.repositories.jsonl_repo import EncuestaJSONLRepository, NFTJSONLRepository, UsuarioJSONLRepository
+from src.repositories.sqlite_repo import (
+    SQLiteDatabase, UsuarioSQLiteRepository, EncuestaSQLiteRepository, NFTSQLiteRepository,
+    migrar_json_a_sqlite
+)
+
+
+class TestEncuestaJournalRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _repo(self, **kwargs):
+        kwargs.setdefault('importar_desde', None)
+        return EncuestaJournalRepository(directorio=self.dir, **kwargs)
+
+    def test_votos_se_anexan_y_sobreviven_reapertura(self):
+        repo = self._repo()
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        repo.agregar(encuesta)
+        for usuario, opcion in [("ana", "A"), ("beto", "B"), ("caro", "A")]:
+            enc = repo.obtener_por_id(encuesta.id)
+            enc.agregar_voto(Voto(encuesta_id=enc.id, usuario=usuario, opcion=opcion))
+            repo.actualizar(enc)
+        repo.cerrar()
+
+        with open(os.path.join(self.dir, 'encuestas.journal'), encoding='utf-8') as f:
+            eventos = [json.loads(linea)['e'] for linea in f]
+        self.assertEqual(eventos, ['encuesta', 'voto', 'voto', 'voto'])
+
+        reabierto = self._repo()
+        enc = reabierto.obtener_por_id(encuesta.id)
+        self.assertEqual(enc.obtener_resultados(), {"A": 2, "B": 1})
+        reabierto.cerrar()
+
+    def test_compactacion_vacia_el_journal(self):
+        repo = self._repo(compactar_cada=3)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60, tipo='multiple')
+        repo.agregar(encuesta)
+        for _ in range(4):
+            enc = repo.obtener_por_id(encuesta.id)
+            enc.agregar_voto(Voto(encuesta_id=enc.id, usuario="ana", opcion="A"))
+            repo.actualizar(enc)
+        repo.cerrar()
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'encuestas.snapshot.json')))
+
+        reabierto = self._repo()
+        self.assertEqual(reabierto.obtener_por_id(encuesta.id).obtener_resultados(), {"A": 4, "B": 0})
+        reabierto.cerrar()
+
+    def test_un_solo_proceso_abre_el_diario(self):
+        repo = self._repo()
+        with self.assertRaisesRegex(RuntimeError, "un solo proceso"):
+            self._repo()
+        repo.cerrar()
+        self._repo().cerrar()
+
+    def test_actualizar_rechaza_version_obsoleta(self):
+        repo = self._repo()
+        self.addCleanup(repo.cerrar)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        repo.agregar(encuesta)
+        cerrada, obsoleta = repo.obtener_por_id(encuesta.id), repo.obtener_por_id(encuesta.id)
+        cerrada.activa = False
+        repo.actualizar(cerrada)
+        self.assertEqual(cerrada.version, 1)
+        obsoleta.agregar_voto(Voto(encuesta_id=obsoleta.id, usuario="ana", opcion="A"))
+        with self.assertRaises(ConflictoDeVersion):
+            repo.actualizar(obsoleta)
+        recargada = repo.obtener_por_id(encuesta.id)
+        self.assertEqual((recargada.activa, recargada.version, recargada.conteo), (False, 1, {"A": 0, "B": 0}))
+
+    def test_importa_encuestas_json(self):
+        ruta_json = os.path.join(self.dir, 'encuestas.json')
+        clasico = EncuestaRepository(file_path=ruta_json)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        encuesta.activa = False
+        clasico.agregar(encuesta)
+
+        repo = self._repo(importar_desde=ruta_json)
+        self.assertEqual([e.id for e in repo.listar()], [encuesta.id])
+        self.assertEqual(repo.listar(activas_solo=True), [])
+        repo.cerrar()
+
+
+class TestEncuestaRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.tmp.name, 'encuestas.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_votos_persisten_y_reconstruyen_conteo(self):
+        repo = EncuestaRepository(file_path=self.ruta)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        repo.agregar(encuesta)
+        enc = repo.obtener_por_id(encuesta.id)
+        enc.agregar_voto(Voto(encuesta_id=enc.id, usuario="ana", opcion="B"))
+        enc.activa = False
+        repo.actualizar(enc)
+
+        recargada = EncuestaRepository(file_path=self.ruta).obtener_por_id(encuesta.id)
+        self.assertFalse(recargada.activa)
+        self.assertEqual(recargada.conteo, {"A": 0, "B": 1})
+        self.assertEqual(recargada.votos["ana"].opcion, "B")
+
+
+    def test_actualizar_rechaza_version_obsoleta(self):
+        for repo, otro in ((EncuestaRepository(file_path=self.ruta), EncuestaRepository(file_path=self.ruta)),
+                           (EncuestaJSONLRepository(self.ruta + 'l'), EncuestaJSONLRepository(self.ruta + 'l'))):
+            encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+            repo.agregar(encuesta)
+            leida, obsoleta = repo.obtener_por_id(encuesta.id), otro.obtener_por_id(encuesta.id)
+            leida.agregar_voto(Voto(encuesta_id=leida.id, usuario="ana", opcion="A"))
+            repo.actualizar(leida)
+            self.assertEqual(leida.version, 1)
+
+            obsoleta.agregar_voto(Voto(encuesta_id=obsoleta.id, usuario="beto", opcion="B"))
+            with self.assertRaises(ConflictoDeVersion):
+                otro.actualizar(obsoleta)
+            recargada = otro.obtener_por_id(encuesta.id)
+            self.assertEqual((recargada.version, recargada.conteo), (1, {"A": 1, "B": 0}))
+
+
+class TestIndiceActivas(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDatabase(os.path.join(self.tmp.name, 'votes.db'))
+
+    def tearDown(self):
+        self.db.cerrar()
+        self.tmp.cleanup()
+
+    def comprobar(self, repo):
+        encuestas = [Encuesta(f"¿{d}?", ["A", "B"], d) for d in (300, 60, 600, 120)]
+        for encuesta in encuestas:
+            repo.agregar(encuesta)
+        cerrada = repo.obtener_por_id(encuestas[2].id)
+        cerrada.activa = False
+        repo.actualizar(cerrada)
+        prorrogada = repo.obtener_por_id(encuestas[1].id)
+        prorrogada.expira_en = prorrogada.expira_en + timedelta(seconds=1000)
+        repo.actualizar(prorrogada)
+
+        with patch.object(repo, '_deserialize_encuesta', wraps=repo._deserialize_encuesta) as deserializar:
+            activas = repo.listar(activas_solo=True)
+        self.assertEqual([e.duracion_segundos for e in activas], [120, 300, 60])
+        self.assertEqual(deserializar.call_count, 3)
+        self.assertEqual(len(repo.listar()), 4)
+
+    def test_json(self):
+        repo = EncuestaRepository(file_path=os.path.join(self.tmp.name, 'encuestas.json'))
+        self.comprobar(repo)
+        # El índice se reconstruye al releer el archivo
+        otro = EncuestaRepository(file_path=repo.file_path)
+        self.assertEqual([e.duracion_segundos for e in otro.listar(activas_solo=True)], [120, 300, 60])
+
+    def test_journal(self):
+        repo = EncuestaJournalRepository(directorio=self.tmp.name, importar_desde=None)
+        self.comprobar(repo)
+        repo.cerrar()
+        reabierto = EncuestaJournalRepository(directorio=self.tmp.name, importar_desde=None)
+        self.assertEqual([e.duracion_segundos for e in reabierto.listar(activas_solo=True)], [120, 300, 60])
+        reabierto.cerrar()
+
+    def test_sqlite(self):
+        self.comprobar(EncuestaSQLiteRepository(self.db))
+
+
+class TestJSONRepositoryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.tmp.name, 'usuarios.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_busquedas_no_releen_el_archivo(self):
+        repo = UsuarioRepository(file_path=self.ruta)
+        repo.agregar(Usuario("ana", "hash"))
+        with patch.object(repo, '_leer_archivo', wraps=repo._leer_archivo) as leer:
+            for _ in range(5):
+                self.assertEqual(repo.obtener_por_nombre("ana").nombre, "ana")
+            self.assertIsNone(repo.obtener_por_nombre("nadie"))
+            leer.assert_not_called()
+
+    def test_ve_escrituras_de_otra_instancia(self):
+        repo = UsuarioRepository(file_path=self.ruta)
+        otro = UsuarioRepository(file_path=self.ruta)
+        self.assertIsNone(repo.obtener_por_nombre("beto"))
+        otro.agregar(Usuario("beto", "hash"))
+        self.assertIsNotNone(repo.obtener_por_nombre("beto"))
+
+    def test_transferir_actualiza_indice(self):
+        repo = NFTRepository(file_path=os.path.join(self.tmp.name, 'nfts.json'))
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        token = TokenNFT(encuesta.id, "A", "ana")
+        repo.agregar(token)
+        repo.transferir(token.token_id, "beto")
+        self.assertEqual(repo.obtener_por_id(token.token_id).propietario, "beto")
+        self.assertEqual(len(repo.listar_por_usuario("beto")), 1)
+
+    def test_listar_por_usuario_paginado_sin_recorrer_todo(self):
+        ruta = os.path.join(self.tmp.name, 'nfts.json')
+        repo = NFTRepository(file_path=ruta)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        tokens = [TokenNFT(encuesta.id, "A", "ana" if i % 10 == 0 else "beto") for i in range(100)]
+        repo.agregar_muchos(tokens)
+        de_ana = [t.token_id for t in tokens[::10]]
+        with patch.object(repo, '_deserialize_token', wraps=repo._deserialize_token) as deserializar:
+            pagina = repo.listar_por_usuario("ana", offset=2, limit=3)
+        self.assertEqual([t.token_id for t in pagina], de_ana[2:5])
+        self.assertEqual(deserializar.call_count, 3)
+        self.assertEqual(repo.contar_por_usuario("ana"), 10)
+
+        repo.transferir(de_ana[0], "caro")
+        self.assertEqual(repo.contar_por_usuario("ana"), 9)
+        self.assertEqual([t.token_id for t in repo.listar_por_usuario("caro")], [de_ana[0]])
+        # Otra instancia reconstruye el mismo índice desde el archivo
+        self.assertEqual(NFTRepository(file_path=ruta).contar_por_usuario("ana"), 9)
+
+
+class TestTokensCompactos(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.tmp.name, 'usuarios.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_guarda_16_bytes_por_token_y_lee_formato_antiguo(self):
+        repo = UsuarioRepository(self.ruta)
+        usuario = Usuario("ana", "hash")
+        ids = [TokenNFT(Encuesta("¿?", ["A"], 60).id, "A", "ana").token_id for _ in range(3)]
+        for token_id in ids:
+            usuario.agregar_token(token_id)
+        repo.agregar(usuario)
+        with open(self.ruta, encoding='utf-8') as f:
+            guardado = json.load(f)['usuarios'][0]['tokens']
+        self.assertIsInstance(guardado, str)
+        self.assertEqual(len(guardado), 64)  # base64 de 48 bytes
+        self.assertEqual(list(UsuarioRepository(self.ruta).obtener_por_nombre("ana").tokens), ids)
+
+        with open(self.ruta, 'w', encoding='utf-8') as f:
+            json.dump({'usuarios': [dict(nombre="beto", password_hash="hash", id=str(usuario.id),
+                                         tokens=[str(t) for t in ids])]}, f)
+        self.assertEqual(list(UsuarioRepository(self.ruta).obtener_por_nombre("beto").tokens), ids)
+
+    def test_sqlite_blob_y_lista_json_antigua(self):
+        db = SQLiteDatabase(os.path.join(self.tmp.name, 'votes.db'))
+        repo = UsuarioSQLiteRepository(db)
+        usuario = Usuario("ana", "hash")
+        token_id = TokenNFT(Encuesta("¿?", ["A"], 60).id, "A", "ana").token_id
+        usuario.agregar_token(token_id)
+        repo.agregar(usuario)
+        blob = db.conexion.execute('SELECT tokens FROM usuarios').fetchone()[0]
+        self.assertEqual(blob, token_id.bytes)
+        db.conexion.execute('UPDATE usuarios SET tokens = ?', (json.dumps([str(token_id)]),))
+        self.assertEqual(list(repo.obtener_por_nombre("ana").tokens), [token_id])
+        db.cerrar()
+
+
+class TestLecturaEnStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iterar_json_con_bloques_pequenos(self):
+        ruta = os.path.join(self.tmp.name, 'nfts.json')
+        registros = [{'token_id': str(i), 'opcion': '[{"x"}]' * (i % 4)} for i in range(200)]
+        for indent in (None, 2):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump({'tokens': registros}, f, indent=indent)
+            for tam_bloque in (1, 16, 1 << 16):
+                self.assertEqual(list(iterar_json(ruta, 'tokens', tam_bloque)), registros)
+
+    def test_importa_json_y_para_en_la_primera_coincidencia(self):
+        clasico = NFTRepository(os.path.join(self.tmp.name, 'nfts.json'))
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        tokens = [TokenNFT(encuesta.id, "A", "ana" if i % 2 else "beto") for i in range(10)]
+        clasico.agregar_muchos(tokens)
+
+        ruta = os.path.join(self.tmp.name, 'nfts.jsonl')
+        repo = NFTJSONLRepository(ruta, importar_desde=clasico.file_path)
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write('{no es json\n')
+        # Ni la búsqueda del primero ni una página corta llegan a la línea rota
+        self.assertEqual(repo.obtener_por_id(tokens[0].token_id).propietario, "beto")
+        self.assertEqual([t.token_id for t in repo.listar_por_usuario("ana", offset=1, limit=2)],
+                         [tokens[3].token_id, tokens[5].token_id])
+
+    def test_nft_jsonl_transferencias(self):
+        repo = NFTJSONLRepository(os.path.join(self.tmp.name, 'nfts.jsonl'))
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        tokens = [TokenNFT(encuesta.id, "A", "ana") for _ in range(3)]
+        repo.agregar_muchos(tokens)
+        repo.transferir_muchos([(tokens[0].token_id, "beto"), (tokens[2].token_id, "beto")])
+        self.assertEqual(repo.contar_por_usuario("beto"), 2)
+        with self.assertRaises(KeyError):
+            repo.transferir_muchos([(tokens[1].token_id, "caro"), (encuesta.id, "caro")])
+        self.assertEqual(repo.obtener_por_id(tokens[1].token_id).propietario, "ana")
+
+    def test_encuestas_activas_jsonl_sin_recorrer_el_archivo(self):
+        ruta = os.path.join(self.tmp.name, 'encuestas.jsonl')
+        repo = EncuestaJSONLRepository(ruta)
+        cerrada, activa = Encuesta("¿Cerrada?", ["A", "B"], 60), Encuesta("¿Activa?", ["A", "B"], 60)
+        repo.agregar(cerrada)
+        repo.agregar(activa)
+        self.assertEqual([e.id for e in repo.listar(activas_solo=True)], [cerrada.id, activa.id])
+
+        with patch.object(repo.archivo, 'iterar', wraps=repo.archivo.iterar) as iterar:
+            cerrada.activa = False
+            repo.actualizar(cerrada)
+            repo.agregar(Encuesta("¿Otra?", ["A", "B"], 600))
+            self.assertEqual(len(repo.listar(activas_solo=True)), 2)
+            # Las escrituras propias mantienen el índice: solo la reescritura recorre el archivo
+            self.assertEqual(iterar.call_count, 1)
+
+            # Otro escritor (como otro proceso) invalida el índice
+            ajeno = EncuestaJSONLRepository(ruta)
+            ajena = ajeno.obtener_por_id(activa.id)
+            ajena.activa = False
+            ajeno.actualizar(ajena)
+            self.assertNotIn(activa.id, [e.id for e in repo.listar(activas_solo=True)])
+
+    def test_encuestas_y_usuarios_jsonl(self):
+        encuestas = EncuestaJSONLRepository(os.path.join(self.tmp.name, 'encuestas.jsonl'))
+        larga, corta = Encuesta("¿Larga?", ["A", "B"], 600), Encuesta("¿Corta?", ["A", "B"], 60)
+        encuestas.agregar(larga)
+        encuestas.agregar(corta)
+        enc = encuestas.obtener_por_id(larga.id)
+        enc.agregar_voto(Voto(encuesta_id=enc.id, usuario="ana", opcion="B"))
+        encuestas.actualizar(enc)
+        self.assertEqual(encuestas.obtener_por_id(larga.id).obtener_resultados(), {"A": 0, "B": 1})
+        self.assertEqual([e.id for e in encuestas.listar(activas_solo=True)], [corta.id, larga.id])
+
+        usuarios = UsuarioJSONLRepository(os.path.join(self.tmp.name, 'usuarios.jsonl'))
+        usuarios.agregar(Usuario("ana", "hash"))
+        usuario = usuarios.obtener_por_nombre("ana")
+        usuario.agregar_token(larga.id)
+        usuarios.actualizar(usuario)
+        self.assertEqual(list(usuarios.obtener_por_nombre("ana").tokens), [larga.id])
+        with self.assertRaises(KeyError):
+            usuarios.actualizar(Usuario("nadie", "hash"))
+
+
+class TestSQLiteRepositories(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDatabase(os.path.join(self.tmp.name, 'votes.db'))
+
+    def tearDown(self):
+        self.db.cerrar()
+        self.tmp.cleanup()
+
+    def test_modo_wal(self):
+        modo = self.db.conexion.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(modo, 'wal')
+
+    def test_encuesta_con_votos(self):
+        repo = EncuestaSQLiteRepository(self.db)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        repo.agregar(encuesta)
+        for usuario, opcion in [("ana", "A"), ("beto", "B")]:
+            enc = repo.obtener_por_id(encuesta.id)
+            enc.agregar_voto(Voto(encuesta_id=enc.id, usuario=usuario, opcion=opcion))
+            repo.actualizar(enc)
+        enc = EncuestaSQLiteRepository(self.db).obtener_por_id(encuesta.id)
+        self.assertEqual(enc.obtener_resultados(), {"A": 1, "B": 1})
+        enc.activa = False
+        repo.actualizar(enc)
+        self.assertEqual(repo.listar(activas_solo=True), [])
+
+    def test_actualizar_rechaza_version_obsoleta(self):
+        repo = EncuestaSQLiteRepository(self.db)
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        repo.agregar(encuesta)
+        cerrada, obsoleta = repo.obtener_por_id(encuesta.id), repo.obtener_por_id(encuesta.id)
+        cerrada.activa = False
+        repo.actualizar(cerrada)
+        obsoleta.agregar_voto(Voto(encuesta_id=obsoleta.id, usuario="ana", opcion="A"))
+        with self.assertRaises(ConflictoDeVersion):
+            repo.actualizar(obsoleta)
+        recargada = repo.obtener_por_id(encuesta.id)
+        self.assertEqual((recargada.activa, recargada.version, recargada.conteo), (False, 1, {"A": 0, "B": 0}))
+
+    def test_un_voto_por_usuario_en_encuesta_simple(self):
+        repo = EncuestaSQLiteRepository(self.db)
+        simple, multiple = Encuesta("¿Juego?", ["A", "B"], 60), Encuesta("¿Juego?", ["A", "B"], 60, tipo='multiple')
+        for encuesta in (simple, multiple):
+            repo.agregar(encuesta)
+        for opcion in ("A", "B"):
+            enc = EncuestaSQLiteRepository(self.db).obtener_por_id(simple.id)
+            enc.votos.pop("ana", None)
+            enc.agregar_voto(Voto(encuesta_id=enc.id, usuario="ana", opcion=opcion))
+            if opcion == "A":
+                repo.actualizar(enc)
+            else:
+                with self.assertRaises(ValueError):
+                    repo.actualizar(enc)
+            enc = repo.obtener_por_id(multiple.id)
+            enc.agregar_voto(Voto(encuesta_id=enc.id, usuario="ana", opcion=opcion))
+            repo.actualizar(enc)
+        self.assertEqual(repo.obtener_por_id(simple.id).conteo, {"A": 1, "B": 0})
+        self.assertEqual(repo.obtener_por_id(multiple.id).conteo, {"A": 1, "B": 1})
+
+    def test_actualiza_esquema_antiguo(self):
+        ruta = os.path.join(self.tmp.name, 'antigua.db')
+        conn = sqlite3.connect(ruta)
+        conn.executescript(
+            "CREATE TABLE encuestas (id TEXT PRIMARY KEY, pregunta TEXT NOT NULL, opciones TEXT NOT NULL, "
+            "duracion_segundos INTEGER NOT NULL, tipo TEXT NOT NULL, creado_en TEXT NOT NULL, "
+            "expira_en TEXT NOT NULL, activa INTEGER NOT NULL);"
+            "CREATE TABLE votos (id TEXT PRIMARY KEY, encuesta_id TEXT NOT NULL, usuario TEXT NOT NULL, "
+            "opcion TEXT NOT NULL, realizado_en TEXT NOT NULL, token_id TEXT NOT NULL);")
+        conn.close()
+        db = SQLiteDatabase(ruta)
+        try:
+            repo = EncuestaSQLiteRepository(db)
+            encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+            repo.agregar(encuesta)
+            self.assertEqual(repo.obtener_por_id(encuesta.id).version, 0)
+        finally:
+            db.cerrar()
+
+    def test_usuarios_y_tokens(self):
+        usuarios = UsuarioSQLiteRepository(self.db)
+        nfts = NFTSQLiteRepository(self.db)
+        usuario = Usuario("ana", "hash")
+        usuarios.agregar(usuario)
+        token = TokenNFT(Encuesta("¿Juego?", ["A", "B"], 60).id, "A", "ana")
+        nfts.agregar(token)
+        usuario.tokens.add(token.token_id)
+        usuarios.actualizar(usuario)
+
+        self.assertEqual(list(usuarios.obtener_por_nombre("ana").tokens), [token.token_id])
+        nfts.transferir(token.token_id, "beto")
+        self.assertEqual(nfts.listar_por_usuario("ana"), [])
+        self.assertEqual(nfts.listar_por_usuario("beto")[0].token_id, token.token_id)
+        nfts.agregar_muchos([TokenNFT(token.encuesta_id, "B", "beto") for _ in range(3)])
+        self.assertEqual(nfts.contar_por_usuario("beto"), 4)
+        self.assertEqual(len(nfts.listar_por_usuario("beto", offset=1, limit=2)), 2)
+        self.assertEqual(len(nfts.listar_por_usuario("beto", offset=3)), 1)
+        with self.assertRaises(KeyError):
+            usuarios.actualizar(Usuario("nadie", "hash"))
+
+    def test_migracion_desde_json(self):
+        usuarios = UsuarioRepository(os.path.join(self.tmp.name, 'usuarios.json'))
+        encuestas = EncuestaRepository(os.path.join(self.tmp.name, 'encuestas.json'))
+        nfts = NFTRepository(os.path.join(self.tmp.name, 'nfts.json'))
+        encuesta = Encuesta("¿Juego?", ["A", "B"], 60)
+        usuarios.agregar(Usuario("ana", "hash"))
+        encuestas.agregar(encuesta)
+        nfts.agregar(TokenNFT(encuesta.id, "A", "ana"))
+
+        conteo = migrar_json_a_sqlite(self.db, self.tmp.name)
+        self.assertEqual(conteo['usuarios'], 1)
+        self.assertEqual(conteo['tokens'], 1)
+        self.assertIsNotNone(EncuestaSQLiteRepository(self.db).obtener_por_id(encuesta.id))
+        self.assertEqual(len(NFTSQLiteRepository(self.db).listar_por_usuario("ana")), 1)
+        # Repetir la migración no duplica registros
+        migrar_json_a_sqlite(self.db, self.tmp.name)
+        self.assertEqual(len(UsuarioSQLiteRepository(self.db).listar()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,786 @@
+import os
+import json
+import asyncio
+import multiprocessing
+import sys
+import threading
+import types
+import tempfile
+import unittest
+from datetime import timedelta
+from uuid import UUID
+from unittest.mock import MagicMock, patch
+from src.config import Config
+from src.container import ServiceContainer
+from src.models.usuario import Usuario
+from src.services.poll_service import PollService
+from src.services import chatbot_service
+from src.services.chatbot_service import ChatbotService
+from src.services.conversation_history import HistorialConversaciones
+from src.services.inference_worker import BatchInferenceWorker
+from src.services.live_results import LiveResultsService
+from src.services.nft_service import NFTService
+from src.services.expiry_scheduler import PlanificadorExpiracion
+from src.patterns.observer import Observador
+from src.patterns.strategy import AlfabéticoStrategy, ProrrogaStrategy
+from src.services.user_service import UserService, InvalidPasswordError, HashingQueueFullError
+from src.repositories.sqlite_repo import EncuestaSQLiteRepository, UsuarioSQLiteRepository
+
+
+def crear_config(directorio, **parametros):
+    """Crea un config.json temporal que apunta los datos a `directorio`."""
+    parametros.setdefault('data_dir', directorio)
+    ruta = os.path.join(directorio, 'config.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(parametros, f)
+    return Config(ruta)
+
+
+class TestBackendConfigurable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backend_sqlite_desde_config(self):
+        config = crear_config(self.tmp.name, backend='sqlite')
+        service = PollService(config=config)
+        self.assertIsInstance(service.repo, EncuestaSQLiteRepository)
+        self.assertIsInstance(service.nft_service.usuario_repo, UsuarioSQLiteRepository)
+
+        encuesta = service.create_poll("¿Juego?", ["A", "B"], 60)
+        self.assertEqual([e.id for e in service.list_polls(active_only=True)], [encuesta.id])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'streamer_votes.db')))
+
+    def test_formato_jsonl_desde_config(self):
+        config = crear_config(self.tmp.name, json_format='jsonl')
+        service = PollService(config=config)
+        service.nft_service.usuario_repo.agregar(Usuario("ana", "hash"))
+        service.nft_service.usuario_repo.agregar(Usuario("beto", "hash"))
+        encuesta = service.create_poll("¿Juego?", ["A", "B"], 60)
+        voto = service.vote(encuesta.id, "ana", ["A"])
+        service.nft_service.transfer_token(voto.token_id, "ana", "beto")
+        self.assertEqual(service.get_partial_results(encuesta.id), {"A": 1, "B": 0})
+        self.assertEqual([t.token_id for t in service.nft_service.list_tokens("beto")], [voto.token_id])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'nfts.jsonl')))
+
+
+class TestPollService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = PollService(config=crear_config(self.tmp.name))
+        for nombre in ("ana", "beto", "caro"):
+            self.service.nft_service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        self.encuesta = self.service.create_poll("¿Juego?", ["A", "B"], 60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_vote(self):
+        voto = self.service.vote(self.encuesta.id, "ana", ["A"])
+        self.assertEqual(self.service.get_partial_results(self.encuesta.id), {"A": 1, "B": 0})
+        self.assertIsNotNone(self.service.nft_service.get_token(voto.token_id))
+        with self.assertRaises(ValueError):
+            self.service.vote(self.encuesta.id, "ana", ["B"])
+
+    def test_vote_persiste_el_token_acunado(self):
+        voto = self.service.vote(self.encuesta.id, "ana", ["A"])
+        guardado = self.service.repo.obtener_por_id(self.encuesta.id).votos["ana"]
+        self.assertEqual(guardado.token_id, voto.token_id)
+        token = self.service.nft_service.get_token(guardado.token_id)
+        self.assertEqual((token.propietario, token.opcion), ("ana", "A"))
+
+    def test_vote_de_usuario_inexistente_no_cuenta(self):
+        with self.assertRaisesRegex(ValueError, "Usuario no encontrado"):
+            self.service.vote(self.encuesta.id, "fantasma", ["A"])
+        self.assertEqual(self.service.get_partial_results(self.encuesta.id), {"A": 0, "B": 0})
+
+    def test_vote_many_una_escritura_por_repositorio(self):
+        nft_service = self.service.nft_service
+        with patch.object(self.service.repo, '_save', wraps=self.service.repo._save) as save_enc, \
+                patch.object(nft_service.nft_repo, '_save', wraps=nft_service.nft_repo._save) as save_nft, \
+                patch.object(nft_service.usuario_repo, '_save', wraps=nft_service.usuario_repo._save) as save_usr:
+            resultados = self.service.vote_many(self.encuesta.id, [
+                ("ana", "A"), ("beto", "B"), ("ana", "B"), ("nadie", "A"), ("caro", "Z"), ("caro", "A"),
+            ])
+        self.assertEqual((save_enc.call_count, save_nft.call_count, save_usr.call_count), (1, 1, 1))
+
+        errores = [r['error'] for r in resultados]
+        self.assertEqual(errores, [None, None, "El usuario ya votó", "Usuario no encontrado: nadie",
+                                   "Opción no válida", None])
+        self.assertEqual(self.service.get_partial_results(self.encuesta.id), {"A": 2, "B": 1})
+
+        voto_ana = resultados[0]['voto']
+        token = nft_service.get_token(voto_ana.token_id)
+        self.assertEqual((token.propietario, token.opcion), ("ana", "A"))
+        self.assertIn(voto_ana.token_id, nft_service.usuario_repo.obtener_por_nombre("ana").tokens)
+
+
+class TestLiveResultsService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = PollService(config=crear_config(self.tmp.name))
+        for nombre in ("ana", "beto"):
+            self.service.nft_service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        self.encuesta = self.service.create_poll("¿Juego?", ["A", "B"], 60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_transmite_votos_y_cierre(self):
+        live = LiveResultsService(self.service)
+        flujo = live.transmitir(self.encuesta.id, timeout=5)
+        self.assertEqual(next(flujo), ({"A": 0, "B": 0}, False))
+
+        def votar():
+            self.service.vote(self.encuesta.id, "ana", ["A"])
+            self.service.vote_many(self.encuesta.id, [("beto", "B")])
+            self.service.close_poll(self.encuesta.id)
+
+        with patch.object(self.service.repo, 'obtener_por_id', wraps=self.service.repo.obtener_por_id) as obtener:
+            hilo = threading.Thread(target=votar)
+            hilo.start()
+            estados = list(flujo)
+            hilo.join()
+        self.assertEqual(estados[-1], ({"A": 1, "B": 1}, True))
+        # Solo las operaciones de PollService leen el repositorio, no la transmisión
+        self.assertEqual(obtener.call_count, 3)
+
+    def test_sin_cambios_termina_por_timeout(self):
+        live = LiveResultsService(self.service)
+        self.assertEqual(list(live.transmitir(self.encuesta.id, timeout=0.01)), [({"A": 0, "B": 0}, False)])
+
+    def test_transmite_en_el_event_loop(self):
+        live = LiveResultsService(self.service)
+
+        async def seguir():
+            estados = []
+            async for estado in live.transmitir_async(self.encuesta.id):
+                estados.append(estado)
+                if len(estados) == 1:
+                    hilo = threading.Thread(target=lambda: (
+                        self.service.vote(self.encuesta.id, "ana", ["A"]),
+                        self.service.close_poll(self.encuesta.id)))
+                    hilo.start()
+            hilo.join()
+            return estados
+
+        estados = asyncio.run(seguir())
+        self.assertEqual(estados[0], ({"A": 0, "B": 0}, False))
+        self.assertEqual(estados[-1], ({"A": 1, "B": 0}, True))
+        # Sin suscriptores, la encuesta deja de seguirse
+        self.assertNotIn(str(self.encuesta.id), live._conteos)
+        self.assertNotIn(str(self.encuesta.id), live._avisos)
+
+    def test_transmision_async_sin_cambios_repite_latido_hasta_el_cierre(self):
+        live = LiveResultsService(self.service)
+
+        async def seguir():
+            estados = []
+            async for estado in live.transmitir_async(self.encuesta.id, latido=0.01):
+                estados.append(estado)
+                if len(estados) == 3:
+                    await asyncio.to_thread(self.service.close_poll, self.encuesta.id)
+            return estados
+
+        estados = asyncio.run(seguir())
+        self.assertEqual(estados[:3], [({"A": 0, "B": 0}, False)] * 3)
+        self.assertEqual(estados[-1], ({"A": 0, "B": 0}, True))
+
+    def test_desconexion_deja_de_seguir_la_encuesta(self):
+        live = LiveResultsService(self.service)
+        clave = str(self.encuesta.id)
+
+        async def seguir():
+            flujos = [live.transmitir_async(self.encuesta.id) for _ in range(2)]
+            for flujo in flujos:
+                await flujo.__anext__()
+            await flujos[0].aclose()
+            self.assertEqual(live._suscriptores[clave], 1)
+            await flujos[1].aclose()
+
+        asyncio.run(seguir())
+        self.assertNotIn(clave, live._conteos)
+        self.assertNotIn(clave, live._versiones)
+        self.assertNotIn(clave, live._suscriptores)
+
+    def test_cierre_olvida_encuestas_sin_suscriptores(self):
+        live = LiveResultsService(self.service)
+        live.resultados(self.encuesta.id)
+        self.service.close_poll(self.encuesta.id)
+        self.assertNotIn(str(self.encuesta.id), live._conteos)
+
+
+class ObservadorEventos(Observador):
+    def __init__(self, esperado):
+        self.esperado = esperado
+        self.datos = None
+        self.recibido = threading.Event()
+
+    def actualizar(self, evento, datos):
+        if evento == self.esperado:
+            self.datos = datos
+            self.recibido.set()
+
+
+class TestPlanificadorExpiracion(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = PollService(desempate_strategy=AlfabéticoStrategy(),
+                                   config=crear_config(self.tmp.name))
+        for nombre in ("ana", "beto"):
+            self.service.nft_service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        self.planificador = PlanificadorExpiracion(self.service)
+
+    def tearDown(self):
+        self.planificador.detener()
+        self.tmp.cleanup()
+
+    def vencer_en(self, encuesta, segundos):
+        encuesta = self.service.repo.obtener_por_id(encuesta.id)
+        encuesta.expira_en = self.service.now() + timedelta(seconds=segundos)
+        self.service.repo.actualizar(encuesta)
+        self.planificador.programar(encuesta.id, encuesta.expira_en)
+
+    def test_cierra_al_vencer_y_aplica_desempate(self):
+        lejana = self.service.create_poll("¿Lejana?", ["A", "B"], 3600)
+        self.planificador.iniciar()
+        encuesta = self.service.create_poll("¿Juego?", ["B", "A"], 3600)
+        self.service.vote_many(encuesta.id, [("ana", "B"), ("beto", "A")])
+        cerrada = ObservadorEventos('encuesta_cerrada')
+        self.service.agregar_observador(cerrada)
+        # Un plazo más próximo despierta al hilo, que dormía hasta la lejana
+        self.vencer_en(encuesta, 0.05)
+        self.assertTrue(cerrada.recibido.wait(5))
+        self.assertEqual(cerrada.datos, {'encuesta_id': str(encuesta.id), 'ganador': 'A'})
+        self.assertFalse(self.service.repo.obtener_por_id(encuesta.id).activa)
+        self.assertEqual([e.id for e in self.service.list_polls(active_only=True)], [lejana.id])
+
+    def test_prorroga_reprograma_la_encuesta(self):
+        self.service.desempate_strategy = ProrrogaStrategy(segundos=60)
+        encuesta = self.service.create_poll("¿Juego?", ["A", "B"], 3600)
+        self.service.vote_many(encuesta.id, [("ana", "A"), ("beto", "B")])
+        prorrogada = ObservadorEventos('encuesta_prorrogada')
+        self.service.agregar_observador(prorrogada)
+        self.planificador.iniciar()
+        self.vencer_en(encuesta, 0)
+        self.assertTrue(prorrogada.recibido.wait(5))
+        self.assertEqual(prorrogada.datos['opciones_empate'], ["A", "B"])
+        encuesta = self.service.repo.obtener_por_id(encuesta.id)
+        self.assertTrue(encuesta.activa)
+        self.assertGreater(encuesta.expira_en, self.service.now() + timedelta(seconds=30))
+
+    def test_cierra_encuestas_creadas_por_otro_proceso(self):
+        planificador = PlanificadorExpiracion(self.service, intervalo_repaso=0.05)
+        self.addCleanup(planificador.detener)
+        planificador.iniciar()
+        cerrada = ObservadorEventos('encuesta_cerrada')
+        self.service.agregar_observador(cerrada)
+        # Otra instancia del servicio sobre los mismos datos: no emite eventos a este
+        otro = PollService(config=Config(os.path.join(self.tmp.name, 'config.json')))
+        encuesta = otro.create_poll("¿Juego?", ["A", "B"], 3600)
+        encuesta = otro.repo.obtener_por_id(encuesta.id)
+        encuesta.expira_en = otro.now() + timedelta(seconds=0.1)
+        otro.repo.actualizar(encuesta)
+        self.assertTrue(cerrada.recibido.wait(5))
+        self.assertEqual(cerrada.datos['encuesta_id'], str(encuesta.id))
+        self.assertFalse(self.service.repo.obtener_por_id(encuesta.id).activa)
+        # Repasar no duplica los plazos ya programados
+        planificador._repasar()
+        planificador._repasar()
+        self.assertLessEqual(planificador.pendientes(), 1)
+
+
+def votar_desde_proceso(ruta_config, encuesta_id, nombres, tam_lote):
+    """Vota con cada nombre desde un proceso aparte: casi todo en lotes y el resto de uno en uno."""
+    service = PollService(config=Config(ruta_config))
+    corte = len(nombres) - len(nombres) // 40
+    for i in range(0, corte, tam_lote):
+        lote = [(nombre, "A" if j % 2 else "B") for j, nombre in enumerate(nombres[i:min(i + tam_lote, corte)], i)]
+        resultados = service.vote_many(UUID(encuesta_id), lote)
+        assert all(r['error'] is None for r in resultados), resultados
+    for nombre in nombres[corte:]:
+        service.vote(UUID(encuesta_id), nombre, ["A"])
+
+
+class TestConcurrenciaEntreProcesos(unittest.TestCase):
+
+    PROCESOS = 4
+    VOTANTES = 2000
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = crear_config(self.tmp.name)
+        self.service = PollService(config=self.config)
+        repo = self.service.nft_service.usuario_repo
+        self.nombres = [f"u{i}" for i in range(self.VOTANTES)]
+        repo._save({'usuarios': [repo._serialize_usuario(Usuario(n, "hash")) for n in self.nombres]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_votos_desde_varios_procesos_no_se_pierden(self):
+        encuesta = self.service.create_poll("¿Juego?", ["A", "B"], 600)
+        contexto = multiprocessing.get_context('spawn')
+        procesos = [
+            contexto.Process(target=votar_desde_proceso,
+                             args=(self.config.ruta, str(encuesta.id), self.nombres[i::self.PROCESOS], 25))
+            for i in range(self.PROCESOS)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join(timeout=240)
+        self.assertEqual([p.exitcode for p in procesos], [0] * self.PROCESOS)
+
+        recargada = PollService(config=self.config).repo.obtener_por_id(encuesta.id)
+        self.assertEqual(len(recargada.votos), self.VOTANTES)
+        self.assertEqual(sum(recargada.conteo.values()), self.VOTANTES)
+        nft_service = NFTService(self.config)
+        sin_token = [n for n in self.nombres if len(nft_service.usuario_repo.obtener_por_nombre(n).tokens) != 1]
+        self.assertEqual(sin_token, [])
+        self.assertEqual(sum(nft_service.nft_repo.contar_por_usuario(n) for n in self.nombres[:50]), 50)
+
+
+class TestServiceContainer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.contenedor = ServiceContainer(crear_config(self.tmp.name))
+
+    def tearDown(self):
+        self.contenedor.cerrar()
+        self.tmp.cleanup()
+
+    def test_comparte_repositorios_y_servicios(self):
+        c = self.contenedor
+        self.assertIs(c.poll_service, c.poll_service)
+        self.assertIs(c.poll_service.repo, c.encuesta_repo)
+        self.assertIs(c.poll_service.nft_service, c.nft_service)
+        self.assertIs(c.nft_service.usuario_repo, c.usuario_repo)
+        self.assertIs(c.user_service.repo, c.usuario_repo)
+        self.assertIs(c.live_results.poll_service, c.poll_service)
+
+    def test_construccion_perezosa(self):
+        with patch('src.services.nft_service.NFTService.__init__', side_effect=AssertionError) as init:
+            self.contenedor.user_service
+        init.assert_not_called()
+        self.assertNotIn('nft_service', self.contenedor._instancias)
+
+    def test_cache_con_nombre(self):
+        cache = self.contenedor.cache('resultados', ttl_segundos=5)
+        self.assertIs(self.contenedor.cache('resultados'), cache)
+        self.assertIsNot(self.contenedor.cache('otra'), cache)
+
+    def test_cerrar_detiene_el_planificador(self):
+        planificador = self.contenedor.planificador
+        self.assertIs(self.contenedor.planificador, planificador)
+        self.contenedor.cerrar()
+        self.assertIsNone(planificador._hilo)
+
+    def test_cerrar_entrega_los_eventos_y_libera_el_diario(self):
+        contenedor = ServiceContainer(crear_config(self.tmp.name, backend='journal', observer_async=True))
+        poll_service = contenedor.poll_service
+        despachador = poll_service._despachador
+        observador = MagicMock(spec=Observador)
+        observador.actualizar.side_effect = lambda *_: threading.Event().wait(0.05)
+        poll_service.agregar_observador(observador)
+        encuesta = poll_service.create_poll("¿Juego?", ["A", "B"], 60)
+
+        contenedor.cerrar()
+        observador.actualizar.assert_called_once()
+        self.assertEqual(despachador.metricas()['en_cola'], 0)
+        self.assertIsNone(poll_service._despachador)
+        # El diario quedó liberado: otro contenedor puede abrirlo y ve la encuesta
+        otro = ServiceContainer(crear_config(self.tmp.name, backend='journal'))
+        try:
+            self.assertEqual(otro.encuesta_repo.obtener_por_id(encuesta.id).pregunta, "¿Juego?")
+        finally:
+            otro.cerrar()
+
+    def test_cerrar_cierra_la_base_sqlite(self):
+        contenedor = ServiceContainer(crear_config(self.tmp.name, backend='sqlite'))
+        db = contenedor.encuesta_repo.db
+        contenedor.cerrar()
+        self.assertIsNone(db._local.conexion)
+        otro = ServiceContainer(crear_config(self.tmp.name, backend='sqlite'))
+        try:
+            self.assertIsNot(otro.encuesta_repo.db, db)
+        finally:
+            otro.cerrar()
+
+
+class TestServiciosAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.contenedor = ServiceContainer(crear_config(self.tmp.name, hash_workers=0))
+        self.poll_service = self.contenedor.poll_service
+        self.nft_service = self.contenedor.nft_service
+        self.nombres = [f"u{i}" for i in range(40)]
+        for nombre in self.nombres:
+            self.contenedor.usuario_repo.agregar(Usuario(nombre, "hash"))
+
+    def tearDown(self):
+        self.contenedor.cerrar()
+        self.tmp.cleanup()
+
+    def test_votos_concurrentes_no_se_pierden(self):
+        encuesta = self.poll_service.create_poll("¿Juego?", ["A", "B"], 60)
+
+        async def votar_todos():
+            return await asyncio.gather(*(
+                self.poll_service.vote_async(encuesta.id, nombre, ["A" if i % 2 else "B"])
+                for i, nombre in enumerate(self.nombres)
+            ))
+
+        votos = asyncio.run(votar_todos())
+        self.assertEqual(len({v.token_id for v in votos}), len(self.nombres))
+        self.assertEqual(self.poll_service.get_partial_results(encuesta.id), {"A": 20, "B": 20})
+        activas = asyncio.run(self.poll_service.list_polls_async(active_only=True))
+        self.assertEqual([e.id for e in activas], [encuesta.id])
+
+    def test_tokens_async(self):
+        encuesta = self.poll_service.create_poll("¿Juego?", ["A", "B"], 60)
+        voto = self.poll_service.vote(encuesta.id, "u0", ["A"])
+        asyncio.run(self.nft_service.transfer_token_async(voto.token_id, "u0", "u1"))
+        tokens = asyncio.run(self.nft_service.list_tokens_async("u1", limit=10))
+        self.assertEqual([t.token_id for t in tokens], [voto.token_id])
+        token = asyncio.run(self.nft_service.get_token_async(voto.token_id))
+        self.assertEqual(token.propietario, "u1")
+
+
+class TestNFTTransferencias(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def preparar(self, **parametros):
+        config = crear_config(self.tmp.name, **parametros)
+        service = NFTService(config)
+        poll_service = PollService(config=config)
+        for nombre in ("ana", "beto", "caro"):
+            service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        encuesta = poll_service.create_poll("¿Juego?", ["A", "B"], 60, tipo='multiple')
+        votos = poll_service.vote_many(encuesta.id, [("ana", "A")] * 3)
+        return config, service, [r['voto'].token_id for r in votos]
+
+    def propietarios(self, service, tokens):
+        return [service.get_token(t).propietario for t in tokens]
+
+    def test_transfer_many_una_escritura_por_repositorio(self):
+        _, service, tokens = self.preparar()
+        with patch.object(service.nft_repo, '_save', wraps=service.nft_repo._save) as save_nft, \
+                patch.object(service.usuario_repo, '_save', wraps=service.usuario_repo._save) as save_usr:
+            service.transfer_many([(tokens[0], "ana", "beto"), (tokens[1], "ana", "caro"),
+                                   (tokens[0], "beto", "caro")])
+        self.assertEqual((save_nft.call_count, save_usr.call_count), (1, 1))
+        self.assertEqual(self.propietarios(service, tokens), ["caro", "caro", "ana"])
+        self.assertEqual(list(service.usuario_repo.obtener_por_nombre("beto").tokens), [])
+        self.assertEqual(set(service.usuario_repo.obtener_por_nombre("caro").tokens), set(tokens[:2]))
+        self.assertFalse(os.path.exists(service.diario.ruta))
+
+    def test_lote_invalido_no_aplica_nada(self):
+        _, service, tokens = self.preparar()
+        with self.assertRaises(ValueError):
+            service.transfer_many([(tokens[0], "ana", "beto"), (tokens[1], "beto", "caro")])
+        self.assertEqual(self.propietarios(service, tokens), ["ana"] * 3)
+        self.assertEqual(len(service.usuario_repo.obtener_por_nombre("ana").tokens), 3)
+
+    def test_caida_a_mitad_se_recupera_al_arrancar(self):
+        config, service, tokens = self.preparar()
+        with patch.object(service.usuario_repo, 'actualizar_muchos', side_effect=RuntimeError("caída")):
+            with self.assertRaises(RuntimeError):
+                service.transfer_token(tokens[0], "ana", "beto")
+        # Los tokens ya cambiaron de dueño pero los usuarios no
+        self.assertEqual(self.propietarios(service, tokens)[0], "beto")
+        self.assertIn(tokens[0], service.usuario_repo.obtener_por_nombre("ana").tokens)
+
+        recuperado = NFTService(config)
+        self.assertEqual(self.propietarios(recuperado, tokens), ["beto", "ana", "ana"])
+        self.assertNotIn(tokens[0], recuperado.usuario_repo.obtener_por_nombre("ana").tokens)
+        self.assertEqual(list(recuperado.usuario_repo.obtener_por_nombre("beto").tokens), [tokens[0]])
+        self.assertFalse(os.path.exists(recuperado.diario.ruta))
+
+    def test_caida_en_otro_proceso_se_recupera_antes_del_siguiente_lote(self):
+        config, service, tokens = self.preparar()
+        en_marcha = NFTService(config)
+        with patch.object(service.usuario_repo, 'actualizar_muchos', side_effect=RuntimeError("caída")):
+            with self.assertRaises(RuntimeError):
+                service.transfer_token(tokens[0], "ana", "beto")
+
+        # Un servicio arrancado antes de la caída hace otra transferencia
+        en_marcha.transfer_token(tokens[1], "ana", "caro")
+        self.assertEqual(self.propietarios(en_marcha, tokens), ["beto", "caro", "ana"])
+        usuarios = en_marcha.usuario_repo
+        self.assertEqual(list(usuarios.obtener_por_nombre("ana").tokens), [tokens[2]])
+        self.assertEqual(list(usuarios.obtener_por_nombre("beto").tokens), [tokens[0]])
+        self.assertEqual(list(usuarios.obtener_por_nombre("caro").tokens), [tokens[1]])
+        self.assertFalse(os.path.exists(en_marcha.diario.ruta))
+
+    def test_sqlite_revierte_el_lote(self):
+        _, service, tokens = self.preparar(backend='sqlite')
+        with patch.object(service.usuario_repo, 'actualizar_muchos', side_effect=RuntimeError("caída")):
+            with self.assertRaises(RuntimeError):
+                service.transfer_many([(tokens[0], "ana", "beto")])
+        self.assertEqual(self.propietarios(service, tokens), ["ana"] * 3)
+        service.transfer_many([(str(tokens[0]), "ana", "beto")])
+        self.assertEqual(self.propietarios(service, tokens)[0], "beto")
+
+
+class TestUserService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_login_y_sesion(self):
+        service = UserService(crear_config(self.tmp.name, hash_workers=0))
+        service.register("ana", "secreta")
+        with self.assertRaises(InvalidPasswordError):
+            service.login("ana", "otra")
+        token = service.login("ana", "secreta")
+        with patch.object(service, 'hash_password') as hash_password:
+            self.assertEqual(service.usuario_de_sesion(token), "ana")
+            self.assertTrue(service.verificar_sesion("ana", token))
+            hash_password.assert_not_called()
+        service.cerrar_sesion("ana")
+        self.assertIsNone(service.usuario_de_sesion(token))
+
+    def test_sesion_expira(self):
+        service = UserService(crear_config(self.tmp.name, session_ttl=60))
+        token = service._crear_sesion("ana")
+        with patch('src.services.user_service.time.time', return_value=service.sesiones[token][1]):
+            self.assertIsNone(service.usuario_de_sesion(token))
+        self.assertNotIn(token, service.sesiones)
+
+    def test_hashing_en_pool_y_async(self):
+        service = UserService(crear_config(self.tmp.name, hash_workers=2))
+        self.addCleanup(service.cerrar)
+        asyncio.run(service.register_async("ana", "secreta"))
+        token = service.login("ana", "secreta")
+        self.assertIsNotNone(service._pool)
+        self.assertEqual(service.usuario_de_sesion(token), "ana")
+        token = asyncio.run(service.login_async("ana", "secreta"))
+        self.assertEqual(service.usuario_de_sesion(token), "ana")
+        with self.assertRaises(InvalidPasswordError):
+            asyncio.run(service.login_async("ana", "otra"))
+
+    def test_cola_de_hashing_llena(self):
+        service = UserService(crear_config(self.tmp.name, hash_workers=0, hash_max_pending=1, hash_timeout=0.01))
+        service._cupos_hash.acquire()
+        with self.assertRaises(HashingQueueFullError):
+            service.hash_password("secreta", b"sal")
+        with self.assertRaises(HashingQueueFullError):
+            asyncio.run(service.hash_password_async("secreta", b"sal"))
+        service._cupos_hash.release()
+        self.assertEqual(len(service.hash_password("secreta", b"sal")), 64)
+
+    def test_token_firmado_valido_en_otra_instancia(self):
+        config = crear_config(self.tmp.name, session_format='signed', session_secret='s3cr3t')
+        token = UserService(config)._crear_sesion("ana")
+        otra = UserService(config)
+        self.assertEqual(otra.usuario_de_sesion(token), "ana")
+        self.assertIsNone(otra.usuario_de_sesion(token[:-1] + ('0' if token[-1] != '0' else '1')))
+        ajena = UserService(crear_config(self.tmp.name, session_format='signed', session_secret='otro'))
+        self.assertIsNone(ajena.usuario_de_sesion(token))
+
+    def test_token_firmado_con_firma_no_ascii(self):
+        config = crear_config(self.tmp.name, session_format='signed', session_secret='s3cr3t')
+        token = UserService(config)._crear_sesion("ana")
+        falsificado = token.rsplit('.', 1)[0] + '.ñ' + 'a' * 63
+        self.assertIsNone(UserService(config).usuario_de_sesion(falsificado))
+
+
+class TestChatbotService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = crear_config(self.tmp.name, chatbot_model='modelo-prueba')
+        self.poll_service = PollService(config=self.config)
+        self.addCleanup(chatbot_service._modelos.pop, 'modelo-prueba', None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_preguntas_de_encuestas_no_cargan_el_modelo(self):
+        self.poll_service.nft_service.usuario_repo.agregar(Usuario("ana", "hash"))
+        encuesta = self.poll_service.create_poll("¿Juego?", ["A", "B"], 60)
+        self.poll_service.vote(encuesta.id, "ana", ["B"])
+        with patch.object(chatbot_service, '_crear_pipeline') as crear:
+            bot = ChatbotService(poll_service=self.poll_service, config=self.config)
+            self.assertEqual(bot.ask("ana", "¿Quién va ganando?"), "La opción que va ganando es 'B' con 1 voto(s).")
+            self.assertIn("Faltan", bot.ask("ana", "¿cuánto falta?"))
+            crear.assert_not_called()
+
+    def test_cache_de_encuestas_invalidada_por_votos(self):
+        for nombre in ("ana", "beto"):
+            self.poll_service.nft_service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        encuesta = self.poll_service.create_poll("¿Juego?", ["A", "B"], 60, tipo='multiple')
+        bot = ChatbotService(poll_service=self.poll_service, config=self.config)
+        self.poll_service.vote(encuesta.id, "ana", ["B"])
+        with patch.object(self.poll_service, 'list_polls', wraps=self.poll_service.list_polls) as list_polls, \
+                patch.object(self.poll_service, 'get_partial_results',
+                             wraps=self.poll_service.get_partial_results) as parciales:
+            for _ in range(5):
+                self.assertIn("'B' con 1", bot.ask("beto", "¿Quién va ganando?"))
+            self.assertEqual((list_polls.call_count, parciales.call_count), (1, 1))
+            self.poll_service.vote(encuesta.id, "beto", ["A"])
+            self.poll_service.vote(encuesta.id, "ana", ["A"])
+            self.assertIn("'A' con 2", bot.ask("beto", "quien va ganando"))
+            self.assertEqual((list_polls.call_count, parciales.call_count), (1, 2))
+
+    def test_cache_de_encuestas_invalidada_por_prorroga(self):
+        self.poll_service.desempate_strategy = ProrrogaStrategy(segundos=60)
+        for nombre in ("ana", "beto"):
+            self.poll_service.nft_service.usuario_repo.agregar(Usuario(nombre, "hash"))
+        encuesta = self.poll_service.create_poll("¿Juego?", ["A", "B"], 3600)
+        self.poll_service.vote_many(encuesta.id, [("ana", "A"), ("beto", "B")])
+        bot = ChatbotService(poll_service=self.poll_service, config=self.config)
+        self.assertIn("Faltan 59 minuto(s)", bot.ask("ana", "¿cuánto falta?"))
+
+        vencida = self.poll_service.repo.obtener_por_id(encuesta.id)
+        vencida.expira_en = self.poll_service.now()
+        self.poll_service.repo.actualizar(vencida)
+        self.assertIsNotNone(self.poll_service.expire_poll(encuesta.id))
+        self.assertIn("Faltan 0 minuto(s)", bot.ask("ana", "¿cuánto falta?"))
+
+    def test_cache_de_prompts_evita_inferencia(self):
+        config = crear_config(self.tmp.name, chatbot_model='modelo-prueba', chatbot_max_batch=1,
+                              chatbot_prompt_cache_size=10)
+        pipeline = MagicMock(side_effect=lambda conv: conv.append_response("¡Hola!") or conv)
+        with patch.dict(sys.modules, {'transformers': types.SimpleNamespace(Conversation=ConversacionFalsa)}), \
+                patch.object(chatbot_service, '_crear_pipeline', return_value=pipeline):
+            bot = ChatbotService(poll_service=self.poll_service, config=config)
+            respuestas = [bot.ask(u, m) for u, m in [("ana", "Hola!!"), ("beto", "hola"), ("caro", " HOLA ")]]
+        self.assertEqual(respuestas, ["¡Hola!"] * 3)
+        self.assertEqual(pipeline.call_count, 1)
+
+    def test_modelo_compartido_y_precalentado(self):
+        with patch.object(chatbot_service, '_crear_pipeline', return_value=MagicMock()) as crear:
+            bots = [ChatbotService(poll_service=self.poll_service, config=self.config) for _ in range(3)]
+            hilos = [threading.Thread(target=lambda b=b: b.chatbot) for b in bots]
+            hilos.append(bots[0].precalentar())
+            for h in hilos[:-1]:
+                h.start()
+            for h in hilos:
+                h.join()
+            crear.assert_called_once_with('modelo-prueba')
+            self.assertIs(bots[1].chatbot, bots[2].chatbot)
+
+
+class ConversacionFalsa:
+    """Sustituto mínimo de transformers.Conversation para las pruebas."""
+    def __init__(self):
+        self.inputs, self.generated_responses = [], []
+
+    def add_user_input(self, texto):
+        self.inputs.append(texto)
+
+    def mark_processed(self):
+        pass
+
+    def append_response(self, texto):
+        self.generated_responses.append(texto)
+
+
+class TestHistorialConversaciones(unittest.TestCase):
+
+    def test_presupuesto_de_tokens(self):
+        historial = HistorialConversaciones(max_tokens=6)
+        historial.agregar("ana", "uno dos", "tres")
+        historial.agregar("ana", "cuatro cinco", "seis")
+        historial.agregar("ana", "siete", "ocho")
+        self.assertEqual(historial.turnos("ana"), [("cuatro cinco", "seis"), ("siete", "ocho")])
+        stats = historial.estadisticas()
+        self.assertEqual((stats['tokens'], stats['turnos_truncados']), (5, 1))
+
+    def test_lru_y_ttl(self):
+        ahora = [0.0]
+        with patch('src.services.conversation_history.time.monotonic', side_effect=lambda: ahora[0]):
+            historial = HistorialConversaciones(max_usuarios=2, ttl_segundos=10)
+            historial.agregar("ana", "hola", "hola")
+            historial.agregar("beto", "hola", "hola")
+            historial.turnos("ana")
+            historial.agregar("caro", "hola", "hola")
+            self.assertNotIn("beto", historial)
+            ahora[0] = 11.0
+            self.assertEqual(historial.turnos("ana"), [])
+            stats = historial.estadisticas()
+        self.assertEqual((stats['usuarios'], stats['tokens']), (0, 0))
+        self.assertEqual((stats['desalojados_lru'], stats['desalojados_ttl']), (1, 2))
+
+    def test_chatbot_reenvia_solo_el_historial_acotado(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        config = crear_config(tmp.name, chatbot_model='modelo-historial', chatbot_max_batch=1,
+                              chatbot_history_tokens=4)
+        self.addCleanup(chatbot_service._modelos.pop, 'modelo-historial', None)
+        recibidas = []
+
+        def pipeline(conv):
+            recibidas.append(list(conv.inputs))
+            conv.append_response(f"r{len(recibidas)}")
+            return conv
+
+        with patch.dict(sys.modules, {'transformers': types.SimpleNamespace(Conversation=ConversacionFalsa)}), \
+                patch.object(chatbot_service, '_crear_pipeline', return_value=pipeline):
+            bot = ChatbotService(poll_service=PollService(config=config), config=config)
+            for mensaje in ["hola", "qué tal", "adiós"]:
+                bot.ask("ana", mensaje)
+        self.assertEqual(recibidas, [["hola"], ["hola", "qué tal"], ["qué tal", "adiós"]])
+        self.assertEqual(bot.estadisticas_historial()['usuarios'], 1)
+
+
+class TestBatchInferenceWorker(unittest.TestCase):
+
+    def test_agrupa_peticiones_concurrentes(self):
+        llamadas = []
+
+        def pipeline(entradas, batch_size=None):
+            llamadas.append((len(entradas), batch_size))
+            return [e.upper() for e in entradas] if len(entradas) > 1 else entradas[0].upper()
+
+        worker = BatchInferenceWorker(lambda: pipeline, max_batch=4, max_espera_ms=200)
+        self.addCleanup(worker.detener)
+        futuros = [worker.enviar(f"msg{i}") for i in range(8)]
+        self.assertEqual([f.result(timeout=5) for f in futuros], [f"MSG{i}" for i in range(8)])
+        # Una llamada por lote, con batch_size para que el pipeline lo procese junto
+        self.assertEqual(llamadas, [(4, 4), (4, 4)])
+
+        metricas = worker.metricas()
+        self.assertEqual(metricas['lotes'], 2)
+        self.assertEqual(metricas['peticiones'], 8)
+        self.assertEqual(metricas['histograma_lotes'], {4: 2})
+        self.assertGreaterEqual(metricas['espera_max_ms'], 0.0)
+
+    def test_pipeline_con_token_de_relleno(self):
+        tokenizador = types.SimpleNamespace(pad_token=None, eos_token="</s>")
+        falso = types.SimpleNamespace(pipeline=MagicMock(return_value=types.SimpleNamespace(tokenizer=tokenizador)))
+        with patch.dict(sys.modules, {'transformers': falso}):
+            chatbot_service._crear_pipeline('modelo-prueba')
+        falso.pipeline.assert_called_once_with("conversational", model='modelo-prueba')
+        self.assertEqual(tokenizador.pad_token, "</s>")
+
+    def test_error_se_propaga_a_todo_el_lote(self):
+        def pipeline(entradas, batch_size=None):
+            raise RuntimeError("sin memoria")
+
+        worker = BatchInferenceWorker(lambda: pipeline, max_batch=2, max_espera_ms=1)
+        self.addCleanup(worker.detener)
+        with self.assertRaises(RuntimeError):
+            worker.enviar("hola").result(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
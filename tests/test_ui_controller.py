@@ -1,31 +1,84 @@
+import asyncio
+import json
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock, patch
+from uuid import UUID, uuid4
+from unittest.mock import AsyncMock, MagicMock
+from src.config import Config
+from src.container import ServiceContainer
 from src.controllers.ui_controller import UIController
 
+
+def crear_controlador(caso):
+    """UIController con su propio contenedor y datos en un directorio temporal."""
+    tmp = tempfile.TemporaryDirectory()
+    caso.addCleanup(tmp.cleanup)
+    ruta = os.path.join(tmp.name, 'config.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'data_dir': tmp.name, 'hash_workers': 0}, f)
+    contenedor = ServiceContainer(Config(ruta))
+    caso.addCleanup(contenedor.cerrar)
+    return UIController(contenedor)
+
 class TestUIController(unittest.TestCase):
 
     def setUp(self):
-        self.ui = UIController()
+        self.ui = crear_controlador(self)
+        self.poll_id = uuid4()
+
+    def test_login_fn(self):
+        self.ui.user_service.login_async = AsyncMock(return_value="mock_token")
+
+        result, token = self.ui.login_fn("username", "password")
+        self.assertEqual(result, "Sesión iniciada como username.")
+        self.assertEqual(token, "mock_token")
 
     def test_vote_fn(self):
-        self.ui.user_service.login = MagicMock(return_value="mock_token")
-        self.ui.poll_service.vote = MagicMock(return_value=MagicMock(token_id="mock_token_id"))
-        self.ui.nft_service.get_token = MagicMock(return_value=MagicMock(metadata=lambda: {"key": "value"}))
+        self.ui.user_service.login_async = AsyncMock()
+        self.ui.user_service.usuario_de_sesion = MagicMock(return_value="username")
+        self.ui.poll_service.vote_async = AsyncMock(return_value=MagicMock(token_id="mock_token_id"))
+        self.ui.nft_service.get_token_async = AsyncMock(return_value=MagicMock(metadatos=lambda: {"key": "value"}))
 
-        result, metadata = self.ui.vote_fn("poll_id", ["option1"], "username", "password")
+        result, metadata = self.ui.vote_fn(f"{self.poll_id} - Pregunta", ["option1"], "mock_token")
         self.assertEqual(result, "Voto registrado.")
         self.assertEqual(metadata, {"key": "value"})
+        self.ui.poll_service.vote_async.assert_awaited_once_with(
+            poll_id=self.poll_id, username="username", options=["option1"])
+        self.ui.user_service.login_async.assert_not_called()
+
+    def test_vote_fn_sin_sesion(self):
+        self.ui.user_service.usuario_de_sesion = MagicMock(return_value=None)
+
+        result, metadata = self.ui.vote_fn(f"{self.poll_id} - Pregunta", ["option1"], "expired_token")
+        self.assertEqual(result, "Error: Debes iniciar sesión primero.")
+        self.assertIsNone(metadata)
 
     def test_get_active_polls(self):
-        self.ui.poll_service.list_polls = MagicMock(return_value=[
-            MagicMock(id="poll1", question="Question 1", options=["Option 1", "Option 2"]),
-            MagicMock(id="poll2", question="Question 2", options=["Option A", "Option B"]),
+        self.ui.poll_service.list_polls_async = AsyncMock(return_value=[
+            MagicMock(id="poll1", pregunta="Question 1", opciones=["Option 1", "Option 2"]),
+            MagicMock(id="poll2", pregunta="Question 2", opciones=["Option A", "Option B"]),
         ])
 
         polls = self.ui.get_active_polls()
         self.assertEqual(len(polls), 2)
         self.assertEqual(polls[0]["id"], "poll1")
         self.assertEqual(polls[1]["question"], "Question 2")
+        self.assertEqual(polls[1]["options"], ["Option A", "Option B"])
+
+    def test_live_results_fn(self):
+        async def transmitir(poll_id, latido=None):
+            self.assertEqual((poll_id, latido), (self.poll_id, UIController.LIVE_HEARTBEAT))
+            for estado in [({"A": 1}, False), ({"A": 2}, True)]:
+                yield estado
+
+        self.ui.live_results.transmitir_async = transmitir
+
+        async def recoger():
+            return [u async for u in self.ui.live_results_fn(f"{self.poll_id} - Question")]
+
+        updates = asyncio.run(recoger())
+        self.assertEqual(updates, ["A: 1 voto(s)", "A: 2 voto(s)\n(Encuesta cerrada)"])
 
     def test_chatbot_fn(self):
         self.ui.chatbot_service.ask = MagicMock(return_value="Mock response")
@@ -34,22 +87,64 @@ class TestUIController(unittest.TestCase):
         self.assertEqual(response, "Mock response")
 
     def test_list_tokens_fn(self):
-        self.ui.user_service.login = MagicMock(return_value="mock_token")
-        self.ui.nft_service.list_tokens = MagicMock(return_value=[
-            MagicMock(token_id="token1", poll_id="poll1", option="option1", issued_at="2025-05-16T00:00:00"),
-            MagicMock(token_id="token2", poll_id="poll2", option="option2", issued_at="2025-05-16T01:00:00"),
+        self.ui.user_service.usuario_de_sesion = MagicMock(return_value="username")
+        self.ui.nft_service.list_tokens_async = AsyncMock(return_value=[
+            MagicMock(token_id="token1", encuesta_id="poll1", opcion="option1", emitido_en="2025-05-16T00:00:00"),
+            MagicMock(token_id="token2", encuesta_id="poll2", opcion="option2", emitido_en="2025-05-16T01:00:00"),
         ])
 
-        tokens = self.ui.list_tokens_fn("username", "password")
+        tokens = self.ui.list_tokens_fn("mock_token")
         self.assertEqual(len(tokens), 2)
         self.assertEqual(tokens[0]["token_id"], "token1")
+        self.assertEqual(tokens[1]["option"], "option2")
 
     def test_transfer_fn(self):
-        self.ui.user_service.login = MagicMock(return_value="mock_token")
-        self.ui.nft_service.transfer_token = MagicMock()
+        self.ui.user_service.usuario_de_sesion = MagicMock(return_value="current_owner")
+        self.ui.nft_service.transfer_token_async = AsyncMock()
 
-        result = self.ui.transfer_fn("token_id", "current_owner", "password", "new_owner")
+        token_id = uuid4()
+        result = self.ui.transfer_fn(str(token_id), "mock_token", "new_owner")
         self.assertEqual(result, "Transferencia completada.")
+        self.ui.nft_service.transfer_token_async.assert_awaited_once_with(
+            token_id=token_id, current_owner="current_owner", new_owner="new_owner")
+
+
+class TestUIControllerAsync(unittest.TestCase):
+    """Los manejadores que registra la UI, contra servicios reales."""
+
+    def setUp(self):
+        self.ui = crear_controlador(self)
+        self.nombre = "ana"
+        self.ui.user_service.register(self.nombre, "Secreta123!")
+        self.encuesta = self.ui.poll_service.create_poll("¿Juego?", ["A", "B"], 60)
+
+    def test_login_y_voto(self):
+        mensaje, sesion = asyncio.run(self.ui.login_fn_async(self.nombre, "Secreta123!"))
+        self.assertEqual(mensaje, f"Sesión iniciada como {self.nombre}.")
+
+        mensaje, metadatos = asyncio.run(
+            self.ui.vote_fn_async(f"{self.encuesta.id} - ¿Juego?", ["A"], sesion))
+        self.assertEqual(mensaje, "Voto registrado.")
+        self.assertEqual(metadatos["opcion"], "A")
+        mensaje, _ = asyncio.run(self.ui.vote_fn_async(f"{self.encuesta.id} - ¿Juego?", ["B"], sesion))
+        self.assertTrue(mensaje.startswith("Error al votar"))
+
+        filas = asyncio.run(self.ui.list_tokens_fn_async(sesion))
+        self.assertEqual([f["poll_id"] for f in filas], [str(self.encuesta.id)])
+
+    def test_encuestas_activas(self):
+        polls = asyncio.run(self.ui.get_active_polls_async())
+        self.assertEqual(polls, [{"id": self.encuesta.id, "question": "¿Juego?", "options": ["A", "B"]}])
+
+    def test_transferencia(self):
+        _, sesion = asyncio.run(self.ui.login_fn_async(self.nombre, "Secreta123!"))
+        _, metadatos = asyncio.run(self.ui.vote_fn_async(f"{self.encuesta.id} - ¿Juego?", ["B"], sesion))
+        destino = "beto"
+        self.ui.user_service.register(destino, "Secreta123!")
+
+        resultado = asyncio.run(self.ui.transfer_fn_async(metadatos["token_id"], sesion, destino))
+        self.assertEqual(resultado, "Transferencia completada.")
+        self.assertEqual(self.ui.nft_service.get_token(UUID(metadatos["token_id"])).propietario, destino)
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()